@@ -0,0 +1,52 @@
+"""
+Benchmark of the kernels calculating advantages and returns of rollouts, across numbers of steps and environments.
+
+Compares the straightforward python loop over time steps with the numpy and TorchScript scans from vel.math.returns.
+"""
+import timeit
+
+import torch
+
+import vel.math.returns as returns_util
+
+
+def loop_gae(rewards, dones, values, last_values, discount_factor, gae_lambda):
+    """ Reference implementation - loop over time steps with a few small tensor operations each """
+    advantages = torch.zeros_like(rewards)
+    dones = dones.to(dtype=torch.float32)
+    accumulator = 0
+
+    for i in reversed(range(rewards.size(0))):
+        next_value = last_values if i == rewards.size(0) - 1 else values[i + 1]
+        delta = rewards[i] + discount_factor * next_value * (1.0 - dones[i]) - values[i]
+        advantages[i] = accumulator = delta + discount_factor * gae_lambda * accumulator * (1.0 - dones[i])
+
+    return advantages
+
+
+def benchmark(number, device):
+    print(f"{'steps':>6} {'envs':>6} {'loop ms':>10} {'numpy ms':>10} {'script ms':>10}")
+
+    for number_of_steps in [5, 32, 128, 512]:
+        for num_envs in [1, 16, 128]:
+            rewards = torch.randn(number_of_steps, num_envs, device=device)
+            dones = (torch.rand(number_of_steps, num_envs, device=device) < 0.01).to(torch.uint8)
+            values = torch.randn(number_of_steps, num_envs, device=device)
+            last_values = torch.randn(num_envs, device=device)
+
+            coefficients = 0.99 * 0.95 * (1.0 - dones.to(torch.float32))
+            numpy_args = [x.cpu().numpy() for x in [rewards, coefficients, last_values]]
+
+            timings = [
+                timeit.timeit(lambda: loop_gae(rewards, dones, values, last_values, 0.99, 0.95), number=number),
+                timeit.timeit(lambda: returns_util._numpy_linear_scan(*numpy_args), number=number),
+                timeit.timeit(
+                    lambda: returns_util._torch_linear_scan(rewards, coefficients, last_values), number=number
+                ),
+            ]
+
+            print(f"{number_of_steps:>6} {num_envs:>6} " + " ".join(f"{x / number * 1000:>10.3f}" for x in timings))
+
+
+if __name__ == '__main__':
+    benchmark(number=50, device=torch.device('cuda' if torch.cuda.is_available() else 'cpu'))
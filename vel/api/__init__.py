@@ -1,3 +1,4 @@
 from .info import BatchInfo, EpochInfo, TrainingInfo
 from .learner import Learner
 from .model_config import ModelConfig
+from .precision import Precision
@@ -1,5 +1,7 @@
 from .model import Model
 
+from vel.util.compilation import compile_model
+
 
 class ModelFactory:
     """ Factory class for models """
@@ -8,14 +10,15 @@ class ModelFactory:
         raise NotImplementedError
 
     @staticmethod
-    def generic(closure):
-        return GenericModelFactory(closure)
+    def generic(closure, compilation: str=None):
+        return GenericModelFactory(closure, compilation=compilation)
 
 
 class GenericModelFactory(ModelFactory):
-    """ Create model from a lambda function """
-    def __init__(self, closure):
+    """ Create model from a lambda function, optionally compiling its hot methods """
+    def __init__(self, closure, compilation: str=None):
         self.closure = closure
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
-        return self.closure(**extra_args)
+        return compile_model(self.closure(**extra_args), self.compilation)
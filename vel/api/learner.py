@@ -3,13 +3,20 @@ import tqdm
 import sys
 
 from .info import BatchInfo, EpochInfo
+from .precision import Precision
 
 
 class Learner:
-    """ Manages training process of a single model """
-    def __init__(self, device: torch.device, model):
+    """
+    Manages training process of a single model.
+    Gradient of each training batch may be accumulated over a number of micro-batches to limit the memory used.
+    Model is evaluated under the autocast of the supplied precision policy.
+    """
+    def __init__(self, device: torch.device, model, micro_batches: int=1, precision: str='fp32'):
         self.device = device
         self.model = model.to(device)
+        self.micro_batches = micro_batches
+        self.precision = Precision(precision)
 
     def metrics(self):
         """ Return metrics for given learner/model """
@@ -82,7 +89,9 @@ class Learner:
     def feed_batch(self, batch_info, data, target):
         """ Run single batch of data """
         data, target = data.to(self.device), target.to(self.device)
-        output, loss = self.model.loss(data, target)
+
+        with self.precision.autocast(self.device):
+            output, loss = self.model.loss(data, target)
 
         # Store extra batch information for calculation of the statistics
         batch_info['data'] = data
@@ -92,9 +101,41 @@ class Learner:
 
         return loss
 
+    def feed_micro_batches(self, batch_info, data, target):
+        """ Run single batch of data in parts, accumulating the gradient weighted by the sizes of the parts """
+        data, target = data.to(self.device), target.to(self.device)
+        batch_size = data.size(0)
+
+        outputs = []
+        loss = 0.0
+
+        for data_part, target_part in zip(data.chunk(self.micro_batches), target.chunk(self.micro_batches)):
+            with self.precision.autocast(self.device):
+                output_part, loss_part = self.model.loss(data_part, target_part)
+
+            # Loss is an average over the micro-batch, weight it by its share in the whole batch
+            loss_part = loss_part * (data_part.size(0) / batch_size)
+            loss_part.backward()
+
+            outputs.append(output_part.detach())
+            loss = loss + loss_part.detach()
+
+        # Store extra batch information for calculation of the statistics
+        batch_info['data'] = data
+        batch_info['target'] = target
+        batch_info['output'] = torch.cat(outputs)
+        batch_info['loss'] = loss
+
+        return loss
+
     def train_batch(self, batch_info, data, target):
         """ Train single batch of data """
         batch_info.optimizer.zero_grad()
-        loss = self.feed_batch(batch_info, data, target)
-        loss.backward()
+
+        if self.micro_batches > 1:
+            self.feed_micro_batches(batch_info, data, target)
+        else:
+            loss = self.feed_batch(batch_info, data, target)
+            loss.backward()
+
         batch_info.optimizer.step()
@@ -0,0 +1,41 @@
+import torch
+
+from vel.exceptions import VelException
+
+
+class Precision:
+    """
+    Numerical precision policy of the training computations.
+
+    With 'fp32' everything runs in single precision. With 'bf16' forward passes of the models run under bfloat16
+    autocast, while the model heads return single precision outputs, so that log-probabilities, losses and value
+    targets are computed in fp32. Parameters and gradients stay in fp32 as well. Because bfloat16 has the exponent
+    range of single precision, gradients do not underflow and no loss scaling is required.
+    """
+
+    POLICIES = {
+        'fp32': None,
+        'bf16': torch.bfloat16,
+    }
+
+    def __init__(self, policy: str='fp32'):
+        if policy not in self.POLICIES:
+            raise VelException("Unknown precision policy '{}', available: {}".format(
+                policy, ', '.join(self.POLICIES)
+            ))
+
+        self.policy = policy
+        self.dtype = self.POLICIES[policy]
+
+    @property
+    def enabled(self) -> bool:
+        """ If computations run in reduced precision """
+        return self.dtype is not None
+
+    def autocast(self, device):
+        """ Context manager running forward passes on given device in the precision of this policy """
+        return torch.autocast(device_type=torch.device(device).type, dtype=self.dtype, enabled=self.enabled)
+
+    def __repr__(self):
+        return "Precision({})".format(self.policy)
+
@@ -2,10 +2,11 @@ import time
 
 from vel.api import BatchInfo, TrainingInfo
 from vel.api.base import Callback
+from vel.util.compilation import pop_warmup_seconds
 
 
 class TimeTracker(Callback):
-    """ Track training time - in seconds """
+    """ Track training time - in seconds. Time spent warming up compiled models is not counted """
     def __init__(self):
         self.start_time = None
 
@@ -13,9 +14,12 @@ class TimeTracker(Callback):
         self.start_time = time.time()
         training_info['time'] = 0.0
 
+        # Warm-up that happened before the training does not concern it
+        pop_warmup_seconds()
+
     def on_batch_end(self, batch_info: BatchInfo):
         current_time = time.time()
-        batch_time = current_time - self.start_time
+        batch_time = max(current_time - self.start_time - pop_warmup_seconds(), 0.0)
         self.start_time = current_time
 
         batch_info['time'] = batch_time
@@ -11,7 +11,7 @@ class PhaseTrainCommand:
     """ Training  command - learn according to a set of phases """
 
     def __init__(self, model_config, model_factory, source, storage, phases: typing.List[TrainPhase],
-                 callbacks=None, restart=True):
+                 callbacks=None, restart=True, micro_batches=1, precision='fp32'):
         self.model_config = model_config
         self.model_factory = model_factory
         self.source = source
@@ -21,6 +21,8 @@ class PhaseTrainCommand:
         self.full_number_of_epochs = sum(p.number_of_epochs for p in phases)
         self.callbacks = callbacks if callbacks is not None else []
         self.restart = restart
+        self.micro_batches = micro_batches
+        self.precision = precision
 
     @staticmethod
     def _build_phase_ladder(phases):
@@ -51,7 +53,8 @@ class PhaseTrainCommand:
     def run(self):
         """ Run the command with supplied configuration """
         device = torch.device(self.model_config.device)
-        learner = Learner(device, self.model_factory.instantiate())
+        learner = Learner(device, self.model_factory.instantiate(), micro_batches=self.micro_batches,
+                          precision=self.precision)
 
         # All callbacks useful for learning
         callbacks = self.gather_callbacks()
@@ -133,7 +136,8 @@ class PhaseTrainCommand:
         return training_info, hidden_state
 
 
-def create(model_config, model, source, storage, phases, callbacks=None, restart=True):
+def create(model_config, model, source, storage, phases, callbacks=None, restart=True, micro_batches=1,
+           precision='fp32'):
     """ Vel creation function """
     return PhaseTrainCommand(
         model_config=model_config,
@@ -142,5 +146,7 @@ def create(model_config, model, source, storage, phases, callbacks=None, restart
         storage=storage,
         phases=phases,
         callbacks=callbacks,
-        restart=restart
+        restart=restart,
+        micro_batches=micro_batches,
+        precision=precision
     )
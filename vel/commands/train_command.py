@@ -7,7 +7,7 @@ class SimpleTrainCommand:
     """ Very simple training command - just run the supplied generators """
 
     def __init__(self, model_config: ModelConfig, model_factory, epochs, optimizer_factory, scheduler_factory,
-                 callbacks, source, storage):
+                 callbacks, source, storage, micro_batches=1, precision='fp32'):
         self.epochs = epochs
         self.callbacks = callbacks if callbacks is not None else []
         self.optimizer_factory = optimizer_factory
@@ -16,11 +16,14 @@ class SimpleTrainCommand:
         self.source = source
         self.model_config = model_config
         self.storage = storage
+        self.micro_batches = micro_batches
+        self.precision = precision
 
     def run(self):
         """ Run the command with supplied configuration """
         device = torch.device(self.model_config.device)
-        learner = Learner(device, self.model_factory.instantiate())
+        learner = Learner(device, self.model_factory.instantiate(), micro_batches=self.micro_batches,
+                          precision=self.precision)
         optimizer = self.optimizer_factory.instantiate(learner.model)
 
         # All callbacks used for learning
@@ -86,7 +89,8 @@ class SimpleTrainCommand:
             callback.load_state_dict(hidden_state)
 
 
-def create(model_config, epochs, optimizer, model, source, storage, scheduler=None, callbacks=None):
+def create(model_config, epochs, optimizer, model, source, storage, scheduler=None, callbacks=None, micro_batches=1,
+           precision='fp32'):
     """ Simply train the model """
     return SimpleTrainCommand(
         model_config=model_config,
@@ -97,4 +101,6 @@ def create(model_config, epochs, optimizer, model, source, storage, scheduler=No
         callbacks=callbacks,
         source=source,
         storage=storage,
+        micro_batches=micro_batches,
+        precision=precision
     )
@@ -0,0 +1,80 @@
+import numpy as np
+
+from vel.openai.baselines.common.running_mean_std import RunningMeanStd
+
+
+class RunningNormalizer:
+    """
+    Normalize data using running estimates of its mean and variance.
+
+    Statistics are accumulated in float64, but the normalization itself runs in float32 using cached mean and
+    reciprocal of the standard deviation, which are recalculated only when the statistics change.
+    Statistics may be updated every `update_frequency` calls to `update`, batching samples in between.
+    """
+
+    def __init__(self, shape=(), clip=10.0, epsilon=1e-8, update_frequency=1):
+        self.shape = tuple(shape)
+        self.clip = clip
+        self.epsilon = epsilon
+        self.update_frequency = update_frequency
+
+        self.rms = RunningMeanStd(shape=self.shape)
+        self.pending = []
+
+        self.mean = np.zeros(self.shape, dtype=np.float32)
+        self.inv_std = np.ones(self.shape, dtype=np.float32)
+
+        self._refresh()
+
+    def update(self, x):
+        """ Update statistics with a batch of samples, first axis being the batch axis """
+        if self.update_frequency <= 1:
+            self.rms.update(x)
+            self._refresh()
+        else:
+            # Caller may reuse its array for the next batch
+            self.pending.append(np.array(x, copy=True))
+
+            if len(self.pending) >= self.update_frequency:
+                self.rms.update(np.concatenate(self.pending, axis=0))
+                self.pending.clear()
+                self._refresh()
+
+    def normalize(self, x):
+        """ Center and scale the data, clipping the result """
+        out = np.subtract(x, self.mean, dtype=np.float32)
+        out *= self.inv_std
+        return self._clip(out)
+
+    def scale(self, x):
+        """ Scale the data by the standard deviation without centering, clipping the result """
+        out = np.multiply(x, self.inv_std, dtype=np.float32)
+        return self._clip(out)
+
+    def state_dict(self) -> dict:
+        """ Current statistics to be stored in the checkpoint """
+        return {
+            'mean': self.rms.mean.tolist(),
+            'var': self.rms.var.tolist(),
+            'count': float(self.rms.count)
+        }
+
+    def load_state_dict(self, state_dict: dict):
+        """ Restore statistics from the checkpoint """
+        self.rms.mean = np.array(state_dict['mean'], dtype=np.float64)
+        self.rms.var = np.array(state_dict['var'], dtype=np.float64)
+        self.rms.count = state_dict['count']
+        self.pending.clear()
+        self._refresh()
+
+    def _clip(self, out):
+        """ Clip the values, in place where possible """
+        if isinstance(out, np.ndarray):
+            return np.clip(out, -self.clip, self.clip, out=out)
+        else:
+            return np.clip(out, -self.clip, self.clip)
+
+    def _refresh(self):
+        """ Recalculate cached float32 normalization coefficients """
+        self.mean[...] = self.rms.mean
+        self.inv_std[...] = 1.0 / np.sqrt(self.rms.var + self.epsilon)
@@ -19,8 +19,15 @@ class OrnsteinUhlenbeckNoiseProcess:
         self.x_prev = x
         return x
 
-    def reset(self):
-        self.x_prev = self.x0 if self.x0 is not None else np.zeros_like(self.mu)
+    def reset(self, indices=None):
+        """ Reset the process state - for batched processes optionally only for given rows """
+        initial = self.x0 if self.x0 is not None else np.zeros_like(self.mu)
+
+        if indices is None:
+            self.x_prev = initial
+        else:
+            self.x_prev = self.x_prev.copy()
+            self.x_prev[indices] = initial[indices]
 
     def __repr__(self):
         return 'OrnsteinUhlenbeckActionNoise(mu={}, sigma={})'.format(self.mu, self.sigma)
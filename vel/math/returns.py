@@ -0,0 +1,189 @@
+"""
+Kernels calculating discounted returns, advantages, retrace and V-trace targets of [number_of_steps, num_envs] rollouts.
+
+Each kernel accepts either torch tensors or numpy arrays and returns the result of the same kind.
+Everything that does not depend on the previous step is calculated in a vectorized way up front and only
+the remaining linear recurrence is scanned backwards in time. Tensors on the CPU are processed by the numpy
+implementation, as it has much lower per-operation overhead, while accelerator tensors use TorchScript-compiled
+scans (or plain torch, if TorchScript is not available).
+"""
+import warnings
+
+import numpy as np
+import torch
+
+
+def _script(fn):
+    """ Compile function with TorchScript if possible """
+    try:
+        with warnings.catch_warnings():
+            # Newer versions of pytorch deprecate TorchScript in favor of torch.compile
+            warnings.simplefilter('ignore', FutureWarning)
+            return torch.jit.script(fn)
+    except Exception:
+        return fn
+
+
+########################################################################################################################
+# Torch kernels
+def _torch_linear_scan(inputs, coefficients, initial):
+    # type: (Tensor, Tensor, Tensor) -> Tensor
+    """ Calculate out[i] = inputs[i] + coefficients[i] * out[i+1], with out[n] = initial """
+    result = torch.empty_like(inputs)
+    accumulator = initial
+
+    for i in range(inputs.size(0) - 1, -1, -1):
+        accumulator = torch.addcmul(inputs[i], coefficients[i], accumulator)
+        result[i] = accumulator
+
+    return result
+
+
+def _torch_retrace_scan(rewards, discounts, q_values, state_values, rho_bar, final_values):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tensor
+    """ Backward recurrence of the retrace targets """
+    result = torch.empty_like(rewards)
+    next_value = final_values
+
+    for i in range(rewards.size(0) - 1, -1, -1):
+        q_retraced = torch.addcmul(rewards[i], discounts[i], next_value)
+        result[i] = q_retraced
+        next_value = torch.addcmul(state_values[i], rho_bar[i], q_retraced - q_values[i])
+
+    return result
+
+
+_torch_linear_scan = _script(_torch_linear_scan)
+_torch_retrace_scan = _script(_torch_retrace_scan)
+
+
+########################################################################################################################
+# Numpy kernels
+def _numpy_linear_scan(inputs, coefficients, initial):
+    """ Calculate out[i] = inputs[i] + coefficients[i] * out[i+1], with out[n] = initial """
+    result = np.empty_like(inputs)
+    accumulator = initial
+
+    for i in reversed(range(inputs.shape[0])):
+        np.multiply(coefficients[i], accumulator, out=result[i])
+        result[i] += inputs[i]
+        accumulator = result[i]
+
+    return result
+
+
+def _numpy_retrace_scan(rewards, discounts, q_values, state_values, rho_bar, final_values):
+    """ Backward recurrence of the retrace targets """
+    result = np.empty_like(rewards)
+    next_value = final_values.copy()
+
+    for i in reversed(range(rewards.shape[0])):
+        np.multiply(discounts[i], next_value, out=result[i])
+        result[i] += rewards[i]
+
+        np.subtract(result[i], q_values[i], out=next_value)
+        next_value *= rho_bar[i]
+        next_value += state_values[i]
+
+    return result
+
+
+########################################################################################################################
+# Dispatch
+def _dispatch(torch_kernel, numpy_kernel, *arrays):
+    """ Run the kernel suitable for the inputs, converting all of them to the type of the first one """
+    first = arrays[0]
+
+    if isinstance(first, np.ndarray):
+        return numpy_kernel(*[np.asarray(a, dtype=first.dtype) for a in arrays])
+
+    arrays = [a.detach().to(dtype=first.dtype) for a in arrays]
+
+    if first.device.type == 'cpu':
+        return torch.from_numpy(numpy_kernel(*[a.numpy() for a in arrays]))
+    else:
+        return torch_kernel(*arrays)
+
+
+def _not_done(dones, like):
+    """ Float mask of the steps at which the episode continues """
+    if isinstance(like, np.ndarray):
+        return 1.0 - np.asarray(dones, dtype=like.dtype)
+    else:
+        return 1.0 - dones.to(dtype=like.dtype)
+
+
+def _shift_values(values, last_values):
+    """ Values of the next states - values shifted by one step and bootstrapped with the last values """
+    if isinstance(values, np.ndarray):
+        return np.concatenate([values[1:], np.asarray(last_values, dtype=values.dtype)[None]], axis=0)
+    else:
+        return torch.cat([values[1:], last_values.to(dtype=values.dtype).unsqueeze(0)], dim=0)
+
+
+def _zeros_like(array):
+    """ Zeros of the same shape and type """
+    if isinstance(array, np.ndarray):
+        return np.zeros_like(array)
+    else:
+        return torch.zeros_like(array)
+
+
+def _minimum(array, cap):
+    """ Elementwise minimum of the array and a constant """
+    if isinstance(array, np.ndarray):
+        return np.minimum(array, cap)
+    else:
+        return array.clamp(max=cap)
+
+
+def discount_bootstrap(rewards, dones, last_values, discount_factor):
+    """ Calculate discounted returns, bootstrapping off the values of states following the rollout """
+    discounts = discount_factor * _not_done(dones, rewards)
+    return _dispatch(_torch_linear_scan, _numpy_linear_scan, rewards, discounts, last_values)
+
+
+def discount_bootstrap_gae(rewards, dones, values, last_values, discount_factor, gae_lambda):
+    """
+    Calculate advantages using Generalized Advantage Estimation
+    https://arxiv.org/abs/1506.02438
+    """
+    not_done = _not_done(dones, rewards)
+
+    bellman_deltas = rewards + discount_factor * _shift_values(values, last_values) * not_done - values
+    coefficients = (discount_factor * gae_lambda) * not_done
+
+    return _dispatch(_torch_linear_scan, _numpy_linear_scan, bellman_deltas, coefficients, _zeros_like(last_values))
+
+
+def retrace(rewards, dones, q_values, state_values, rho_bar, final_values, discount_factor):
+    """
+    Calculate Q retrace targets using truncated importance weights rho_bar
+    https://arxiv.org/abs/1606.02647
+    """
+    discounts = discount_factor * _not_done(dones, rewards)
+
+    return _dispatch(
+        _torch_retrace_scan, _numpy_retrace_scan, rewards, discounts, q_values, state_values, rho_bar, final_values
+    )
+
+
+def vtrace(rewards, dones, values, last_values, rhos, discount_factor, rho_cap=1.0, c_cap=1.0, pg_rho_cap=1.0):
+    """
+    Calculate V-trace value targets and policy gradient advantages for importance weights rhos
+    https://arxiv.org/abs/1802.01561
+    """
+    discounts = discount_factor * _not_done(dones, rewards)
+    next_values = _shift_values(values, last_values)
+
+    bellman_deltas = _minimum(rhos, rho_cap) * (rewards + discounts * next_values - values)
+
+    vs_minus_values = _dispatch(
+        _torch_linear_scan, _numpy_linear_scan, bellman_deltas, discounts * _minimum(rhos, c_cap),
+        _zeros_like(last_values)
+    )
+
+    vs = values + vs_minus_values
+    pg_advantages = _minimum(rhos, pg_rho_cap) * (rewards + discounts * _shift_values(vs, last_values) - values)
+
+    return vs, pg_advantages
@@ -0,0 +1,58 @@
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+
+from vel.math.normalization import RunningNormalizer
+from vel.openai.baselines.common.running_mean_std import RunningMeanStd
+
+
+def test_normalize_matches_reference():
+    """ Check normalization against the straightforward float64 implementation """
+    rng = np.random.RandomState(0)
+    normalizer = RunningNormalizer(shape=(3,), clip=5.0)
+    reference = RunningMeanStd(shape=(3,))
+
+    for _ in range(20):
+        batch = rng.normal(loc=2.0, scale=3.0, size=(4, 3))
+
+        normalizer.update(batch)
+        reference.update(batch)
+
+        expected = np.clip((batch - reference.mean) / np.sqrt(reference.var + 1e-8), -5.0, 5.0)
+        result = normalizer.normalize(batch)
+
+        t.assert_equal(result.dtype, np.float32)
+        nt.assert_allclose(result, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_update_frequency():
+    """ Check that batched updates produce the same statistics as updates every step """
+    rng = np.random.RandomState(0)
+    every_step = RunningNormalizer(shape=(2,))
+    batched = RunningNormalizer(shape=(2,), update_frequency=5)
+
+    for i in range(10):
+        batch = rng.normal(size=(3, 2))
+        every_step.update(batch)
+        batched.update(batch)
+
+        if i == 2:
+            # Statistics not updated yet
+            nt.assert_array_equal(batched.mean, np.zeros(2, dtype=np.float32))
+
+    nt.assert_allclose(batched.mean, every_step.mean, rtol=1e-5)
+    nt.assert_allclose(batched.inv_std, every_step.inv_std, rtol=1e-5)
+
+
+def test_state_dict_roundtrip():
+    """ Check that restored normalizer normalizes the same way """
+    rng = np.random.RandomState(0)
+    normalizer = RunningNormalizer(shape=(2,))
+    normalizer.update(rng.normal(loc=1.0, size=(10, 2)))
+
+    restored = RunningNormalizer(shape=(2,))
+    restored.load_state_dict(normalizer.state_dict())
+
+    batch = rng.normal(size=(5, 2))
+    nt.assert_array_equal(restored.normalize(batch), normalizer.normalize(batch))
+    nt.assert_array_equal(restored.scale(batch), normalizer.scale(batch))
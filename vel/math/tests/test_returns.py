@@ -0,0 +1,152 @@
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+import vel.math.returns as returns_util
+
+
+def _rollout(number_of_steps=20, num_envs=5, seed=0):
+    """ Random rollout of float32 arrays with occasional episode ends """
+    rng = np.random.RandomState(seed)
+
+    def normal(*shape):
+        return rng.normal(size=shape).astype(np.float32)
+
+    return {
+        'rewards': normal(number_of_steps, num_envs),
+        'dones': (rng.uniform(size=(number_of_steps, num_envs)) < 0.1).astype(np.uint8),
+        'values': normal(number_of_steps, num_envs),
+        'last_values': normal(num_envs),
+        'q_values': normal(number_of_steps, num_envs),
+        'rho_bar': np.minimum(rng.uniform(0.0, 2.0, size=(number_of_steps, num_envs)), 1.0).astype(np.float32),
+    }
+
+
+def _reference_gae(rollout, discount_factor, gae_lambda):
+    """ Straightforward loop implementation of Generalized Advantage Estimation """
+    rewards, dones, values = rollout['rewards'], rollout['dones'].astype(np.float64), rollout['values']
+    advantages = np.zeros(rewards.shape)
+    accumulator = 0.0
+
+    for i in reversed(range(rewards.shape[0])):
+        next_value = rollout['last_values'] if i == rewards.shape[0] - 1 else values[i + 1]
+        delta = rewards[i] + discount_factor * next_value * (1.0 - dones[i]) - values[i]
+        advantages[i] = accumulator = delta + discount_factor * gae_lambda * accumulator * (1.0 - dones[i])
+
+    return advantages
+
+
+def _reference_retrace(rollout, discount_factor):
+    """ Straightforward loop implementation of the retrace targets """
+    rewards, dones = rollout['rewards'], rollout['dones'].astype(np.float64)
+    result = np.zeros(rewards.shape)
+    next_value = rollout['last_values']
+
+    for i in reversed(range(rewards.shape[0])):
+        result[i] = rewards[i] + discount_factor * next_value * (1.0 - dones[i])
+        next_value = rollout['rho_bar'][i] * (result[i] - rollout['q_values'][i]) + rollout['values'][i]
+
+    return result
+
+
+def test_gae_matches_reference():
+    """ Check GAE for numpy arrays and torch tensors against the loop implementation """
+    rollout = _rollout()
+    expected = _reference_gae(rollout, 0.99, 0.95)
+
+    args = [rollout[k] for k in ['rewards', 'dones', 'values', 'last_values']]
+
+    numpy_result = returns_util.discount_bootstrap_gae(*args, 0.99, 0.95)
+    torch_result = returns_util.discount_bootstrap_gae(*[torch.from_numpy(x) for x in args], 0.99, 0.95)
+
+    t.assert_equal(numpy_result.dtype, np.float32)
+    t.assert_equal(torch_result.dtype, torch.float32)
+
+    nt.assert_allclose(numpy_result, expected, rtol=1e-5, atol=1e-5)
+    nt.assert_allclose(torch_result.numpy(), expected, rtol=1e-5, atol=1e-5)
+
+
+def test_discount_bootstrap_matches_gae():
+    """ Discounted returns are GAE advantages with lambda = 1 plus the values """
+    rollout = _rollout(seed=1)
+
+    returns = returns_util.discount_bootstrap(rollout['rewards'], rollout['dones'], rollout['last_values'], 0.9)
+    advantages = returns_util.discount_bootstrap_gae(
+        rollout['rewards'], rollout['dones'], rollout['values'], rollout['last_values'], 0.9, 1.0
+    )
+
+    nt.assert_allclose(returns, advantages + rollout['values'], rtol=1e-5, atol=1e-5)
+
+
+def test_retrace_matches_reference():
+    """ Check retrace targets for numpy arrays and torch tensors against the loop implementation """
+    rollout = _rollout(seed=2)
+    expected = _reference_retrace(rollout, 0.99)
+
+    args = [rollout[k] for k in ['rewards', 'dones', 'q_values', 'values', 'rho_bar', 'last_values']]
+
+    numpy_result = returns_util.retrace(*args, 0.99)
+    torch_result = returns_util.retrace(*[torch.from_numpy(x) for x in args], 0.99)
+
+    nt.assert_allclose(numpy_result, expected, rtol=1e-5, atol=1e-5)
+    nt.assert_allclose(torch_result.numpy(), expected, rtol=1e-5, atol=1e-5)
+
+
+def test_torch_kernels_match_numpy_kernels():
+    """ Kernels used for accelerator tensors produce the same results as the numpy ones """
+    rollout = _rollout(seed=3)
+    tensors = {k: torch.from_numpy(v.astype(np.float32)) for k, v in rollout.items()}
+
+    nt.assert_allclose(
+        returns_util._torch_linear_scan(tensors['rewards'], tensors['rho_bar'], tensors['last_values']).numpy(),
+        returns_util._numpy_linear_scan(rollout['rewards'], rollout['rho_bar'], rollout['last_values']),
+        rtol=1e-6, atol=1e-6
+    )
+
+    retrace_keys = ['rewards', 'rho_bar', 'q_values', 'values', 'rho_bar', 'last_values']
+
+    nt.assert_allclose(
+        returns_util._torch_retrace_scan(*[tensors[k] for k in retrace_keys]).numpy(),
+        returns_util._numpy_retrace_scan(*[rollout[k].astype(np.float32) for k in retrace_keys]),
+        rtol=1e-6, atol=1e-6
+    )
+
+
+def _reference_vtrace(rollout, rhos, discount_factor):
+    """ Straightforward loop implementation of V-trace with all the truncation levels equal to one """
+    rewards, dones, values = rollout['rewards'], rollout['dones'].astype(np.float64), rollout['values']
+    vs = np.zeros(rewards.shape)
+    next_vs = next_values = rollout['last_values']
+
+    for i in reversed(range(rewards.shape[0])):
+        discount = discount_factor * (1.0 - dones[i])
+        delta = np.minimum(rhos[i], 1.0) * (rewards[i] + discount * next_values - values[i])
+        vs[i] = values[i] + delta + discount * np.minimum(rhos[i], 1.0) * (next_vs - next_values)
+        next_vs, next_values = vs[i], values[i]
+
+    next_vs = np.concatenate([vs[1:], rollout['last_values'][None]])
+    pg_advantages = np.minimum(rhos, 1.0) * (rewards + discount_factor * (1.0 - dones) * next_vs - values)
+
+    return vs, pg_advantages
+
+
+def test_vtrace_matches_reference():
+    """ Check V-trace targets against the loop implementation and the on-policy n-step returns """
+    rollout = _rollout(number_of_steps=12, num_envs=3, seed=4)
+
+    rng = np.random.RandomState(5)
+    rhos = rng.uniform(0.0, 2.0, size=rollout['rewards'].shape).astype(np.float32)
+
+    args = [rollout[k] for k in ['rewards', 'dones', 'values', 'last_values']]
+
+    expected_vs, expected_advantages = _reference_vtrace(rollout, rhos, 0.99)
+    vs, pg_advantages = returns_util.vtrace(*[torch.from_numpy(x) for x in args + [rhos]], 0.99)
+
+    nt.assert_allclose(vs.numpy(), expected_vs, rtol=1e-5, atol=1e-5)
+    nt.assert_allclose(pg_advantages.numpy(), expected_advantages, rtol=1e-5, atol=1e-5)
+
+    on_policy_vs, _ = returns_util.vtrace(*args, np.ones_like(rhos), 0.99)
+    returns = returns_util.discount_bootstrap(rollout['rewards'], rollout['dones'], rollout['last_values'], 0.99)
+
+    nt.assert_allclose(on_policy_vs, returns, rtol=1e-5, atol=1e-5)
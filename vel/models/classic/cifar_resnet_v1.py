@@ -79,7 +79,7 @@ class ResNetV1(SupervisedModel):
         return [Loss(), Accuracy()]
 
 
-def create(blocks, mode='basic', inplanes=16, divisor=4, num_classes=1000):
+def create(blocks, mode='basic', inplanes=16, divisor=4, num_classes=1000, compilation=None):
     """
     Create a ResNetV1 model
     """
@@ -91,4 +91,4 @@ def create(blocks, mode='basic', inplanes=16, divisor=4, num_classes=1000):
     def instantiate(**_):
         return ResNetV1(block_dict[mode], blocks, inplanes=inplanes, divisor=divisor, num_classes=num_classes)
 
-    return ModelFactory.generic(instantiate)
+    return ModelFactory.generic(instantiate, compilation=compilation)
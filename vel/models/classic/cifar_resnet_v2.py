@@ -87,7 +87,7 @@ class ResNetV2(SupervisedModel):
         print(self)
 
 
-def create(blocks, mode='basic', inplanes=16, divisor=4, num_classes=1000):
+def create(blocks, mode='basic', inplanes=16, divisor=4, num_classes=1000, compilation=None):
     """
     Create a ResNetV1 model
     """
@@ -99,4 +99,4 @@ def create(blocks, mode='basic', inplanes=16, divisor=4, num_classes=1000):
     def instantiate(**_):
         return ResNetV2(block_dict[mode], blocks, inplanes=inplanes, divisor=divisor, num_classes=num_classes)
 
-    return ModelFactory.generic(instantiate)
+    return ModelFactory.generic(instantiate, compilation=compilation)
@@ -86,7 +86,8 @@ class ResNeXt(SupervisedModel):
         # torchsummary.summary(self, input_size=(3, 32, 32))
 
 
-def create(blocks, mode='basic', inplanes=64, cardinality=4, image_features=64, divisor=4, num_classes=1000):
+def create(blocks, mode='basic', inplanes=64, cardinality=4, image_features=64, divisor=4, num_classes=1000,
+           compilation=None):
     """
     Create a ResNetV1 model
     """
@@ -98,4 +99,4 @@ def create(blocks, mode='basic', inplanes=64, cardinality=4, image_features=64,
     def instantiate(**_):
         return ResNeXt(block_dict[mode], blocks, inplanes=inplanes, image_features=image_features, cardinality=cardinality, divisor=divisor, num_classes=num_classes)
 
-    return ModelFactory.generic(instantiate)
+    return ModelFactory.generic(instantiate, compilation=compilation)
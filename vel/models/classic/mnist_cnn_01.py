@@ -71,9 +71,9 @@ class Net(SupervisedModel):
         return [Loss(), Accuracy()]
 
 
-def create(img_rows, img_cols, img_channels, num_classes):
+def create(img_rows, img_cols, img_channels, num_classes, compilation=None):
     """ Create the model matching specified image dimensions """
     def instantiate(**_):
         return Net(img_rows, img_cols, img_channels, num_classes)
 
-    return ModelFactory.generic(instantiate)
+    return ModelFactory.generic(instantiate, compilation=compilation)
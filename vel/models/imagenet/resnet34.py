@@ -99,9 +99,9 @@ class Resnet34(SupervisedModel):
         return [Loss(), Accuracy()]
 
 
-def create(fc_layers=None, dropout=None, pretrained=True):
+def create(fc_layers=None, dropout=None, pretrained=True, compilation=None):
     """ Create a Resnet-34 model with a custom head """
     def instantiate(**_):
         return Resnet34(fc_layers, dropout, pretrained)
 
-    return ModelFactory.generic(instantiate)
+    return ModelFactory.generic(instantiate, compilation=compilation)
@@ -34,7 +34,8 @@ class Monitor(Wrapper):
         self.reset_keywords = reset_keywords
         self.info_keywords = info_keywords
         self.allow_early_resets = allow_early_resets
-        self.rewards = None
+        self.episode_reward = 0.0
+        self.episode_length = 0
         self.needs_reset = True
         self.episode_rewards = []
         self.episode_lengths = []
@@ -45,7 +46,8 @@ class Monitor(Wrapper):
     def reset(self, **kwargs):
         if not self.allow_early_resets and not self.needs_reset:
             raise RuntimeError("Tried to reset an environment before done. If you want to allow early resets, wrap your env with Monitor(env, path, allow_early_resets=True)")
-        self.rewards = []
+        self.episode_reward = 0.0
+        self.episode_length = 0
         self.needs_reset = False
         for k in self.reset_keywords:
             v = kwargs.get(k)
@@ -58,11 +60,12 @@ class Monitor(Wrapper):
         if self.needs_reset:
             raise RuntimeError("Tried to step environment that needs reset")
         ob, rew, done, info = self.env.step(action)
-        self.rewards.append(rew)
+        self.episode_reward += rew
+        self.episode_length += 1
         if done:
             self.needs_reset = True
-            eprew = sum(self.rewards)
-            eplen = len(self.rewards)
+            eprew = self.episode_reward
+            eplen = self.episode_length
             epinfo = {"r": round(eprew, 6), "l": eplen, "t": round(time.time() - self.tstart, 6)}
             for k in self.info_keywords:
                 epinfo[k] = info[k]
@@ -165,22 +165,25 @@ class ClipRewardEnv(gym.RewardWrapper):
         return np.sign(reward)
 
 class WarpFrame(gym.ObservationWrapper):
-    def __init__(self, env):
-        """Warp frames to 84x84 as done in the Nature paper and later work."""
+    def __init__(self, env, channels_first=False):
+        """Warp frames to 84x84 as done in the Nature paper and later work.
+
+        With channels_first frames have shape (1, 84, 84) instead of (84, 84, 1)."""
         gym.ObservationWrapper.__init__(self, env)
         self.width = 84
         self.height = 84
-        self.observation_space = spaces.Box(low=0, high=255,
-                                            shape=(self.height, self.width, 1), dtype=np.uint8)
+        self.channels_first = channels_first
+        shape = (1, self.height, self.width) if channels_first else (self.height, self.width, 1)
+        self.observation_space = spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8)
 
     def observation(self, frame):
         frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
         frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
-        return frame[:, :, None]
+        return frame[None] if self.channels_first else frame[:, :, None]
 
 class FrameStack(gym.Wrapper):
-    def __init__(self, env, k):
-        """Stack k last frames.
+    def __init__(self, env, k, channels_first=False):
+        """Stack k last frames, along the first axis if channels_first is set, otherwise along the last one.
 
         Returns lazy array, which is much more memory efficient.
 
@@ -191,9 +194,11 @@ class FrameStack(gym.Wrapper):
         gym.Wrapper.__init__(self, env)
         self.k = k
         self.frames = deque([], maxlen=k)
-        shp = env.observation_space.shape
+        self.axis = 0 if channels_first else 2
+        shp = list(env.observation_space.shape)
+        shp[self.axis] *= k
         # self.observation_space = spaces.Box(low=0, high=255, shape=(shp[0], shp[1], shp[2] * k), dtype=np.uint8)
-        self.observation_space = spaces.Box(low=0, high=255, shape=(shp[0], shp[1], shp[2] * k), dtype=env.observation_space.dtype)
+        self.observation_space = spaces.Box(low=0, high=255, shape=tuple(shp), dtype=env.observation_space.dtype)
 
     def reset(self):
         ob = self.env.reset()
@@ -208,7 +213,7 @@ class FrameStack(gym.Wrapper):
 
     def _get_ob(self):
         assert len(self.frames) == self.k
-        return LazyFrames(list(self.frames))
+        return LazyFrames(list(self.frames), axis=self.axis)
 
 class ScaledFloatFrame(gym.ObservationWrapper):
     def __init__(self, env):
@@ -221,7 +226,7 @@ class ScaledFloatFrame(gym.ObservationWrapper):
         return np.array(observation).astype(np.float32) / 255.0
 
 class LazyFrames(object):
-    def __init__(self, frames):
+    def __init__(self, frames, axis=2):
         """This object ensures that common frames between the observations are only stored once.
         It exists purely to optimize memory usage which can be huge for DQN's 1M frames replay
         buffers.
@@ -230,11 +235,12 @@ class LazyFrames(object):
 
         You'd not believe how complex the previous solution was."""
         self._frames = frames
+        self._axis = axis
         self._out = None
 
     def _force(self):
         if self._out is None:
-            self._out = np.concatenate(self._frames, axis=2)
+            self._out = np.concatenate(self._frames, axis=self._axis)
             self._frames = None
         return self._out
 
@@ -23,6 +23,9 @@ class VecEnv(ABC):
     """
     An abstract asynchronous, vectorized environment.
     """
+    # Optional VecEnvStatistics object environment records step latencies into
+    statistics = None
+
     def __init__(self, num_envs, observation_space, action_space):
         self.num_envs = num_envs
         self.observation_space = observation_space
@@ -98,6 +101,10 @@ class VecEnvWrapper(VecEnv):
     def step_async(self, actions):
         self.venv.step_async(actions)
 
+    @property
+    def statistics(self):
+        return self.venv.statistics
+
     @abstractmethod
     def reset(self):
         pass
@@ -1,11 +1,17 @@
+import time
 import numpy as np
 from gym import spaces
 from collections import OrderedDict
 from . import VecEnv
 
 class DummyVecEnv(VecEnv):
-    def __init__(self, env_fns):
+    def __init__(self, env_fns, statistics=None):
+        """
+        envs: list of gym environments to run in the current process
+        statistics: optional VecEnvStatistics object to record environment latencies into
+        """
         self.envs = [fn() for fn in env_fns]
+        self.statistics = statistics
         env = self.envs[0]
         VecEnv.__init__(self, len(env_fns), env.observation_space, env.action_space)
         shapes, dtypes = {}, {}
@@ -24,7 +30,7 @@ class DummyVecEnv(VecEnv):
             self.keys.append(key)
 
         self.buf_obs = { k: np.zeros((self.num_envs,) + tuple(shapes[k]), dtype=dtypes[k]) for k in self.keys }
-        self.buf_dones = np.zeros((self.num_envs,), dtype=np.bool)
+        self.buf_dones = np.zeros((self.num_envs,), dtype=bool)
         self.buf_rews  = np.zeros((self.num_envs,), dtype=np.float32)
         self.buf_infos = [{} for _ in range(self.num_envs)]
         self.actions = None
@@ -33,17 +39,51 @@ class DummyVecEnv(VecEnv):
         self.actions = actions
 
     def step_wait(self):
+        if self.statistics is not None:
+            return self._step_wait_instrumented()
+
+        for e in range(self.num_envs):
+            obs, self.buf_rews[e], self.buf_dones[e], self.buf_infos[e] = self.envs[e].step(self.actions[e])
+            if self.buf_dones[e]:
+                obs = self.envs[e].reset()
+            self._save_obs(e, obs)
+        return (self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones),
+                self.buf_infos.copy())
+
+    def _step_wait_instrumented(self):
+        """ Step the environments, recording latencies of each of them """
+        wait_start = time.perf_counter()
+
         for e in range(self.num_envs):
+            start = time.perf_counter()
             obs, self.buf_rews[e], self.buf_dones[e], self.buf_infos[e] = self.envs[e].step(self.actions[e])
+            self.statistics.record_step(e, time.perf_counter() - start)
             if self.buf_dones[e]:
+                start = time.perf_counter()
                 obs = self.envs[e].reset()
+                self.statistics.record_reset(e, time.perf_counter() - start)
             self._save_obs(e, obs)
+
+        self.statistics.record_wait(time.perf_counter() - wait_start)
+
         return (self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones),
                 self.buf_infos.copy())
 
     def reset(self):
+        if self.statistics is not None:
+            return self._reset_instrumented()
+
+        for e in range(self.num_envs):
+            obs = self.envs[e].reset()
+            self._save_obs(e, obs)
+        return self._obs_from_buf()
+
+    def _reset_instrumented(self):
+        """ Reset the environments, recording latencies of each of them """
         for e in range(self.num_envs):
+            start = time.perf_counter()
             obs = self.envs[e].reset()
+            self.statistics.record_reset(e, time.perf_counter() - start)
             self._save_obs(e, obs)
         return self._obs_from_buf()
 
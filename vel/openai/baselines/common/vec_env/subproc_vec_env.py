@@ -1,19 +1,35 @@
+import time
 import numpy as np
 from multiprocessing import Process, Pipe
+from multiprocessing.reduction import ForkingPickler
 from vel.openai.baselines.common.vec_env import VecEnv, CloudpickleWrapper
 from vel.openai.baselines.common.tile_images import tile_images
 
 
-def worker(remote, parent_remote, env_fn_wrapper):
+def worker(remote, parent_remote, env_fn_wrapper, instrument=False):
     parent_remote.close()
     env = env_fn_wrapper.x()
     while True:
         cmd, data = remote.recv()
-        if cmd == 'step':
+        if cmd == 'step' and instrument:
+            start = time.perf_counter()
+            ob, reward, done, info = env.step(data)
+            step_time = time.perf_counter() - start
+            reset_time = None
+            if done:
+                start = time.perf_counter()
+                ob = env.reset()
+                reset_time = time.perf_counter() - start
+            remote.send((ob, reward, done, info, step_time, reset_time))
+        elif cmd == 'step':
             ob, reward, done, info = env.step(data)
             if done:
                 ob = env.reset()
             remote.send((ob, reward, done, info))
+        elif cmd == 'reset' and instrument:
+            start = time.perf_counter()
+            ob = env.reset()
+            remote.send((ob, time.perf_counter() - start))
         elif cmd == 'reset':
             ob = env.reset()
             remote.send(ob)
@@ -29,15 +45,19 @@ def worker(remote, parent_remote, env_fn_wrapper):
 
 
 class SubprocVecEnv(VecEnv):
-    def __init__(self, env_fns, spaces=None):
+    def __init__(self, env_fns, spaces=None, statistics=None):
         """
         envs: list of gym environments to run in subprocesses
+        statistics: optional VecEnvStatistics object to record worker latencies and pipe traffic into
         """
         self.waiting = False
         self.closed = False
+        self.statistics = statistics
+        self.sent_bytes = 0
         nenvs = len(env_fns)
+        instrument = statistics is not None
         self.remotes, self.work_remotes = zip(*[Pipe() for _ in range(nenvs)])
-        self.ps = [Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn)))
+        self.ps = [Process(target=worker, args=(work_remote, remote, CloudpickleWrapper(env_fn), instrument))
                    for (work_remote, remote, env_fn) in zip(self.work_remotes, self.remotes, env_fns)]
         for p in self.ps:
             p.daemon = True # if the main process crashes, we should not cause things to hang
@@ -50,19 +70,62 @@ class SubprocVecEnv(VecEnv):
         VecEnv.__init__(self, len(env_fns), observation_space, action_space)
 
     def step_async(self, actions):
+        if self.statistics is not None:
+            return self._step_async_instrumented(actions)
+
         for remote, action in zip(self.remotes, actions):
             remote.send(('step', action))
         self.waiting = True
 
     def step_wait(self):
+        if self.statistics is not None:
+            return self._step_wait_instrumented()
+
         results = [remote.recv() for remote in self.remotes]
         self.waiting = False
         obs, rews, dones, infos = zip(*results)
         return np.stack(obs), np.stack(rews), np.stack(dones), infos
 
+    def _step_async_instrumented(self, actions):
+        """ Send actions to the workers pickling them by hand to count the bytes """
+        self.sent_bytes = 0
+        for remote, action in zip(self.remotes, actions):
+            buffer = ForkingPickler.dumps(('step', action))
+            self.sent_bytes += len(buffer)
+            remote.send_bytes(buffer)
+        self.waiting = True
+
+    def _step_wait_instrumented(self):
+        """ Receive step results from the workers, recording latencies and the traffic """
+        start = time.perf_counter()
+        buffers = [remote.recv_bytes() for remote in self.remotes]
+        self.statistics.record_wait(time.perf_counter() - start)
+        self.statistics.record_bytes(self.sent_bytes + sum(len(x) for x in buffers))
+        self.waiting = False
+
+        results = [ForkingPickler.loads(x) for x in buffers]
+        obs, rews, dones, infos, step_times, reset_times = zip(*results)
+
+        for idx, (step_time, reset_time) in enumerate(zip(step_times, reset_times)):
+            self.statistics.record_step(idx, step_time)
+
+            if reset_time is not None:
+                self.statistics.record_reset(idx, reset_time)
+
+        return np.stack(obs), np.stack(rews), np.stack(dones), infos
+
     def reset(self):
         for remote in self.remotes:
             remote.send(('reset', None))
+
+        if self.statistics is not None:
+            results = [remote.recv() for remote in self.remotes]
+
+            for idx, (_, reset_time) in enumerate(results):
+                self.statistics.record_reset(idx, reset_time)
+
+            return np.stack([ob for ob, _ in results])
+
         return np.stack([remote.recv() for remote in self.remotes])
 
     def reset_task(self):
@@ -6,23 +6,27 @@ class VecFrameStack(VecEnvWrapper):
     """
     Vectorized environment base class
     """
-    def __init__(self, venv, nstack):
+    def __init__(self, venv, nstack, channels_first=False):
         self.venv = venv
         self.nstack = nstack
+        self.channels_first = channels_first
         wos = venv.observation_space # wrapped ob space
-        low = np.repeat(wos.low, self.nstack, axis=-1)
-        high = np.repeat(wos.high, self.nstack, axis=-1)
+        # Frames are stacked along the channel axis, which is the first axis of the observation if channels_first
+        axis = 0 if channels_first else -1
+        self.channels = wos.shape[axis]
+        low = np.repeat(wos.low, self.nstack, axis=axis)
+        high = np.repeat(wos.high, self.nstack, axis=axis)
         self.stackedobs = np.zeros((venv.num_envs,)+low.shape, low.dtype)
         observation_space = spaces.Box(low=low, high=high, dtype=venv.observation_space.dtype)
         VecEnvWrapper.__init__(self, venv, observation_space=observation_space)
 
     def step_wait(self):
         obs, rews, news, infos = self.venv.step_wait()
-        self.stackedobs = np.roll(self.stackedobs, shift=-1, axis=-1)
+        self.stackedobs = np.roll(self.stackedobs, shift=-self.channels, axis=1 if self.channels_first else -1)
         for (i, new) in enumerate(news):
             if new:
                 self.stackedobs[i] = 0
-        self.stackedobs[..., -obs.shape[-1]:] = obs
+        self._last_frame()[...] = obs
         return self.stackedobs, rews, news, infos
 
     def reset(self):
@@ -31,8 +35,15 @@ class VecFrameStack(VecEnvWrapper):
         """
         obs = self.venv.reset()
         self.stackedobs[...] = 0
-        self.stackedobs[..., -obs.shape[-1]:] = obs
+        self._last_frame()[...] = obs
         return self.stackedobs
 
+    def _last_frame(self):
+        """ View of the stacked observations where the most recent frame goes """
+        if self.channels_first:
+            return self.stackedobs[:, -self.channels:]
+        else:
+            return self.stackedobs[..., -self.channels:]
+
     def close(self):
         self.venv.close()
@@ -0,0 +1,146 @@
+import atexit
+import csv
+import json
+import os.path as osp
+import queue
+import threading
+import time
+
+import numpy as np
+
+from vel.openai.baselines.bench.monitor import Monitor
+from vel.openai.baselines.common.vec_env import VecEnvWrapper
+
+
+class BatchedEpisodeWriter(threading.Thread):
+    """
+    Background thread writing batches of episode records to a monitor CSV file
+    """
+    def __init__(self, filename, header):
+        super().__init__(daemon=True)
+
+        self.queue = queue.Queue()
+
+        self.f = open(filename, "wt")
+        self.f.write('#%s\n' % json.dumps(header))
+        self.logger = csv.writer(self.f)
+        self.logger.writerow(('r', 'l', 't', 'env'))
+        self.f.flush()
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+
+            if batch is None:
+                break
+
+            rewards, lengths, times, envs = batch
+            self.logger.writerows(zip(rewards.tolist(), lengths.tolist(), times.tolist(), envs.tolist()))
+            self.f.flush()
+
+        self.f.close()
+
+    def write(self, batch):
+        """ Queue batch of episode records to be written """
+        self.queue.put(batch)
+
+    def close(self):
+        """ Write out all queued batches and close the file """
+        self.queue.put(None)
+        self.join()
+
+
+class VecMonitor(VecEnvWrapper):
+    """
+    Aggregate episode statistics of all the environments centrally and flush them to disk in batches.
+
+    Episode information is produced by Monitor wrappers of the underlying environments, which should not write
+    files themselves. Records are gathered into preallocated arrays and handed over to a background thread
+    when `batch_size` of them accumulate or `flush_interval` seconds pass since the last flush.
+    """
+    def __init__(self, venv, filename, batch_size=256, flush_interval=10.0):
+        VecEnvWrapper.__init__(self, venv)
+
+        self.tstart = time.time()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_flush = self.tstart
+
+        self.rewards = np.zeros(batch_size, dtype=np.float64)
+        self.lengths = np.zeros(batch_size, dtype=np.int64)
+        self.times = np.zeros(batch_size, dtype=np.float64)
+        self.envs = np.zeros(batch_size, dtype=np.int64)
+        self.count = 0
+
+        self.total_episodes = 0
+
+        if filename is None:
+            self.writer = None
+        else:
+            if not filename.endswith(Monitor.EXT):
+                if osp.isdir(filename):
+                    filename = osp.join(filename, Monitor.EXT)
+                else:
+                    filename = filename + "." + Monitor.EXT
+
+            self.writer = BatchedEpisodeWriter(filename, {"t_start": self.tstart, "num_envs": self.num_envs})
+            self.writer.start()
+
+            # Make sure records of the last episodes are not lost
+            atexit.register(self._close_writer)
+
+    def reset(self):
+        return self.venv.reset()
+
+    def step_wait(self):
+        obs, rews, dones, infos = self.venv.step_wait()
+
+        # Episodes may only end on a step that is done
+        for idx in np.flatnonzero(dones):
+            episode = infos[idx].get('episode')
+
+            if episode is not None:
+                self._record(idx, episode)
+
+        if self.count > 0 and time.time() - self.last_flush > self.flush_interval:
+            self.flush()
+
+        return obs, rews, dones, infos
+
+    def _record(self, idx, episode):
+        """ Store episode record in the pending batch """
+        self.rewards[self.count] = episode['r']
+        self.lengths[self.count] = episode['l']
+        self.times[self.count] = episode['t']
+        self.envs[self.count] = idx
+
+        self.count += 1
+        self.total_episodes += 1
+
+        if self.count == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Hand over pending episode records to the writer thread """
+        if self.writer is not None and self.count > 0:
+            self.writer.write((
+                self.rewards[:self.count].copy(), self.lengths[:self.count].copy(),
+                self.times[:self.count].copy(), self.envs[:self.count].copy()
+            ))
+
+        self.count = 0
+        self.last_flush = time.time()
+
+    def close(self):
+        self._close_writer()
+        return self.venv.close()
+
+    def _close_writer(self):
+        """ Write out all pending records and stop the writer thread """
+        self.flush()
+
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+            atexit.unregister(self._close_writer)
@@ -1,20 +1,23 @@
 from vel.openai.baselines.common.vec_env import VecEnvWrapper
-from vel.openai.baselines.common.running_mean_std import RunningMeanStd
+from vel.math.normalization import RunningNormalizer
 import numpy as np
 
 class VecNormalize(VecEnvWrapper):
     """
     Vectorized environment base class
     """
-    def __init__(self, venv, ob=True, ret=True, clipob=10., cliprew=10., gamma=0.99, epsilon=1e-8):
+    def __init__(self, venv, ob=True, ret=True, clipob=10., cliprew=10., gamma=0.99, epsilon=1e-8,
+                 update_frequency=1):
         VecEnvWrapper.__init__(self, venv)
-        self.ob_rms = RunningMeanStd(shape=self.observation_space.shape) if ob else None
-        self.ret_rms = RunningMeanStd(shape=()) if ret else None
-        self.clipob = clipob
-        self.cliprew = cliprew
+        self.ob_rms = RunningNormalizer(
+            shape=self.observation_space.shape, clip=clipob, epsilon=epsilon, update_frequency=update_frequency
+        ) if ob else None
+        self.ret_rms = RunningNormalizer(
+            shape=(), clip=cliprew, epsilon=epsilon, update_frequency=update_frequency
+        ) if ret else None
         self.ret = np.zeros(self.num_envs)
         self.gamma = gamma
-        self.epsilon = epsilon
+        self.training = True
 
     def step_wait(self):
         """
@@ -24,18 +27,20 @@ class VecNormalize(VecEnvWrapper):
         where 'news' is a boolean vector indicating whether each element is new.
         """
         obs, rews, news, infos = self.venv.step_wait()
-        self.ret = self.ret * self.gamma + rews
+        self.ret *= self.gamma
+        self.ret += rews
         obs = self._obfilt(obs)
         if self.ret_rms:
-            self.ret_rms.update(self.ret)
-            rews = np.clip(rews / np.sqrt(self.ret_rms.var + self.epsilon), -self.cliprew, self.cliprew)
+            if self.training:
+                self.ret_rms.update(self.ret)
+            rews = self.ret_rms.scale(rews)
         return obs, rews, news, infos
 
     def _obfilt(self, obs):
         if self.ob_rms:
-            self.ob_rms.update(obs)
-            obs = np.clip((obs - self.ob_rms.mean) / np.sqrt(self.ob_rms.var + self.epsilon), -self.clipob, self.clipob)
-            return obs.astype(np.float32)
+            if self.training:
+                self.ob_rms.update(obs)
+            return self.ob_rms.normalize(obs)
         else:
             return obs
 
@@ -45,3 +50,21 @@ class VecNormalize(VecEnvWrapper):
         """
         obs = self.venv.reset()
         return self._obfilt(obs)
+
+    def state_dict(self):
+        """
+        Normalization statistics to be stored in the checkpoint
+        """
+        return {
+            'ob_rms': self.ob_rms.state_dict() if self.ob_rms else None,
+            'ret_rms': self.ret_rms.state_dict() if self.ret_rms else None,
+        }
+
+    def load_state_dict(self, state_dict):
+        """
+        Restore normalization statistics from the checkpoint
+        """
+        if self.ob_rms and state_dict.get('ob_rms') is not None:
+            self.ob_rms.load_state_dict(state_dict['ob_rms'])
+        if self.ret_rms and state_dict.get('ret_rms') is not None:
+            self.ret_rms.load_state_dict(state_dict['ret_rms'])
@@ -5,18 +5,24 @@ import torch.nn.utils
 from vel.api.base import ModelFactory
 from vel.api.metrics.averaging_metric import AveragingNamedMetric
 from vel.rl.api.base import OptimizerAlgoBase
+from vel.util.stacked_models import stacked_forward
+from vel.util.target_update import hard_update
 
 
 class DeepQLearning(OptimizerAlgoBase):
     """ Deep Q-Learning algorithm """
 
     def __init__(self, model_factory: ModelFactory, double_dqn: bool,
-                 target_update_frequency: int, max_grad_norm: float):
-        super().__init__(max_grad_norm)
+                 target_update_frequency: int, max_grad_norm: float, stacked_evaluation: bool=False,
+                 precision: str='fp32'):
+        super().__init__(max_grad_norm, precision=precision)
 
         self.model_factory = model_factory
 
         self.double_dqn = double_dqn
+        # Online and target networks in a single call - only for networks without batch norm, dropout and the like,
+        # as the target network is kept in the eval mode
+        self.stacked_evaluation = stacked_evaluation
         self.target_update_frequency = target_update_frequency
 
         self.discount_factor = None
@@ -25,7 +31,7 @@ class DeepQLearning(OptimizerAlgoBase):
     def initialize(self, settings, model, environment, device):
         """ Initialize policy gradient from reinforcer settings """
         self.target_model = self.model_factory.instantiate(action_space=environment.action_space).to(device)
-        self.target_model.load_state_dict(model.state_dict())
+        hard_update(self.target_model, model)
         self.target_model.eval()
 
         self.discount_factor = settings.discount_factor
@@ -38,20 +44,14 @@ class DeepQLearning(OptimizerAlgoBase):
         rewards_tensor = rollout['rewards']
         actions_tensor = rollout['actions']
 
-        with torch.no_grad():
-            if self.double_dqn:
-                # DOUBLE DQN
-                target_values = self.target_model(observation_tensor_tplus1)
-                model_values = model(observation_tensor_tplus1)
-                # Select largest 'target' value based on action that 'model' selects
-                values = target_values.gather(1, model_values.argmax(dim=1, keepdim=True)).squeeze(1)
-            else:
-                # REGULAR DQN
-                values = self.target_model(observation_tensor_tplus1).max(dim=1)[0]
+        if self.stacked_evaluation:
+            q, values = self._evaluate_stacked(model, observation_tensor, observation_tensor_tplus1)
+        else:
+            q, values = self._evaluate(model, observation_tensor, observation_tensor_tplus1)
 
+        with torch.no_grad():
             expected_q = rewards_tensor + self.discount_factor * values * (1 - dones_tensor.float())
 
-        q = model(observation_tensor)
         q_selected = q.gather(1, actions_tensor.unsqueeze(1)).squeeze(1)
 
         original_losses = F.smooth_l1_loss(q_selected, expected_q.detach(), reduction='none')
@@ -69,10 +69,54 @@ class DeepQLearning(OptimizerAlgoBase):
             'average_q_target': torch.mean(expected_q).item()
         }
 
+    def _evaluate(self, model, observation_tensor, observation_tensor_tplus1):
+        """ Q values of the observations and bootstrap values of the next observations, each network run separately """
+        with torch.no_grad():
+            if self.double_dqn:
+                # DOUBLE DQN
+                target_values = self.target_model(observation_tensor_tplus1)
+                model_values = model(observation_tensor_tplus1)
+                # Select largest 'target' value based on action that 'model' selects
+                values = target_values.gather(1, model_values.argmax(dim=1, keepdim=True)).squeeze(1)
+            else:
+                # REGULAR DQN
+                values = self.target_model(observation_tensor_tplus1).max(dim=1)[0]
+
+        q = model(observation_tensor)
+
+        return q, values
+
+    def _evaluate_stacked(self, model, observation_tensor, observation_tensor_tplus1):
+        """ Same as `_evaluate`, but with online and target networks run in a single call over stacked weights """
+        models = [model, self.target_model]
+
+        if self.double_dqn:
+            # Both networks see current and next observations, target values of the current ones are discarded
+            batch_size = observation_tensor.size(0)
+            all_observations = torch.cat([observation_tensor, observation_tensor_tplus1], dim=0)
+
+            stacked_q = stacked_forward(models, all_observations, shared_input=True, trainable=[True, False])
+
+            q = stacked_q[0, :batch_size]
+            model_values = stacked_q[0, batch_size:].detach()
+            target_values = stacked_q[1, batch_size:].detach()
+
+            # Select largest 'target' value based on action that 'model' selects
+            values = target_values.gather(1, model_values.argmax(dim=1, keepdim=True)).squeeze(1)
+        else:
+            stacked_q = stacked_forward(
+                models, torch.stack([observation_tensor, observation_tensor_tplus1]), trainable=[True, False]
+            )
+
+            q = stacked_q[0]
+            values = stacked_q[1].detach().max(dim=1)[0]
+
+        return q, values
+
     def post_optimization_step(self, batch_info, device, model, rollout):
         """ Steps to take after optimization has been done"""
         if batch_info.aggregate_batch_number % self.target_update_frequency == 0:
-            self.target_model.load_state_dict(model.state_dict())
+            hard_update(self.target_model, model)
             self.target_model.eval()
 
     def metrics(self) -> list:
@@ -86,10 +130,12 @@ class DeepQLearning(OptimizerAlgoBase):
 
 
 def create(model: ModelFactory, target_update_frequency: int,
-           max_grad_norm: float, double_dqn: bool=False):
+           max_grad_norm: float, double_dqn: bool=False, stacked_evaluation: bool=False, precision: str='fp32'):
     return DeepQLearning(
         model_factory=model,
         double_dqn=double_dqn,
         target_update_frequency=target_update_frequency,
-        max_grad_norm=max_grad_norm
+        max_grad_norm=max_grad_norm,
+        stacked_evaluation=stacked_evaluation,
+        precision=precision
     )
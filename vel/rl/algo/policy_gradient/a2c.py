@@ -8,8 +8,8 @@ from vel.math.functions import explained_variance
 
 class A2CPolicyGradient(OptimizerAlgoBase):
     """ Simplest policy gradient - calculate loss as an advantage of an actor versus value function """
-    def __init__(self, entropy_coefficient, value_coefficient, max_grad_norm):
-        super().__init__(max_grad_norm)
+    def __init__(self, entropy_coefficient, value_coefficient, max_grad_norm, micro_batches=1, precision='fp32'):
+        super().__init__(max_grad_norm, micro_batches=micro_batches, precision=precision)
 
         self.entropy_coefficient = entropy_coefficient
         self.value_coefficient = value_coefficient
@@ -43,6 +43,13 @@ class A2CPolicyGradient(OptimizerAlgoBase):
             'explained_variance': explained_variance(returns, values)
         }
 
+    def batch_statistics(self, rollout) -> dict:
+        """ Statistics of the whole rollout, that cannot be averaged over its micro-batches """
+        return {
+            'advantage_norm': torch.norm(rollout['advantages']).item(),
+            'explained_variance': explained_variance(rollout['returns'], rollout['values'])
+        }
+
     def metrics(self) -> list:
         """ List of metrics to track for this learning process """
         return [
@@ -55,5 +62,7 @@ class A2CPolicyGradient(OptimizerAlgoBase):
         ]
 
 
-def create(entropy_coefficient, value_coefficient, max_grad_norm):
-    return A2CPolicyGradient(entropy_coefficient, value_coefficient, max_grad_norm)
+def create(entropy_coefficient, value_coefficient, max_grad_norm, micro_batches=1, precision='fp32'):
+    return A2CPolicyGradient(
+        entropy_coefficient, value_coefficient, max_grad_norm, micro_batches=micro_batches, precision=precision
+    )
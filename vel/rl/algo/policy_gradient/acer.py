@@ -1,8 +1,12 @@
 import torch
 import torch.nn.functional as F
 
+import vel.math.returns as returns_util
+
 from vel.api.metrics.averaging_metric import AveragingNamedMetric
 from vel.rl.api.base import OptimizerAlgoBase
+from vel.util.stacked_models import stacked_forward
+from vel.util.target_update import hard_update, polyak_update
 
 
 def select_indices(tensor, indices):
@@ -15,8 +19,9 @@ class AcerPolicyGradient(OptimizerAlgoBase):
 
     def __init__(self, model_factory, trust_region: bool=True, entropy_coefficient: float=0.01,
                  q_coefficient: float=0.5, rho_cap: float=10.0, retrace_rho_cap: float=1.0, max_grad_norm: float=None,
-                 average_model_alpha=0.99, trust_region_delta=1.0):
-        super().__init__(max_grad_norm)
+                 average_model_alpha=0.99, trust_region_delta=1.0, stacked_evaluation: bool=False,
+                 precision: str='fp32'):
+        super().__init__(max_grad_norm, precision=precision)
 
         self.discount_factor = None
         self.number_of_steps = None
@@ -36,6 +41,9 @@ class AcerPolicyGradient(OptimizerAlgoBase):
         self.average_model_alpha = average_model_alpha
         self.trust_region_delta = trust_region_delta
 
+        # Evaluate the model and the average model in a single call - not supported for models with batch norm
+        self.stacked_evaluation = stacked_evaluation
+
     def initialize(self, settings, model, environment, device):
         """ Initialize policy gradient from reinforcer settings """
         self.discount_factor = settings.discount_factor
@@ -48,12 +56,11 @@ class AcerPolicyGradient(OptimizerAlgoBase):
         """ Update weights of the average model with new model observation """
         if not self.average_model_initialized:
             # Initialize average model to have the same weights as the main model
-            self.average_model.load_state_dict(model.state_dict())
+            hard_update(self.average_model, model)
             self.average_model_initialized = True
         else:
-            for model_param, average_param in zip(model.parameters(), self.average_model.parameters()):
-                # EWMA average model update
-                average_param.data.mul_(self.average_model_alpha).add_(model_param.data * (1 - self.average_model_alpha))
+            # EWMA average model update
+            polyak_update(self.average_model, model, 1.0 - self.average_model_alpha)
 
     def calculate_gradient(self, batch_info, device, model, rollout):
         """ Calculate loss of the supplied rollout """
@@ -70,7 +77,17 @@ class AcerPolicyGradient(OptimizerAlgoBase):
         if self.trust_region:
             self.update_average_model(model)
 
-        action_logits, q_outputs = model(observations)
+        if self.trust_region and self.stacked_evaluation:
+            stacked_logits, stacked_q = stacked_forward(
+                [model, self.average_model], observations, shared_input=True, trainable=[True, False]
+            )
+
+            action_logits, q_outputs = stacked_logits[0], stacked_q[0]
+            average_action_logits = stacked_logits[1].detach()
+        else:
+            action_logits, q_outputs = model(observations)
+            average_action_logits = None
+
         q_selected = select_indices(q_outputs, actions)
 
         # We only want to propagate gradients through specific variables
@@ -117,8 +134,9 @@ class AcerPolicyGradient(OptimizerAlgoBase):
         q_function_loss = 0.5 * F.mse_loss(q_selected, q_retraced)
 
         if self.trust_region:
-            with torch.no_grad():
-                average_action_logits, _ = self.average_model(observations)
+            if average_action_logits is None:
+                with torch.no_grad():
+                    average_action_logits, _ = self.average_model(observations)
 
             actor_loss = policy_loss - self.entropy_coefficient * policy_entropy
             q_loss = self.q_coefficient * q_function_loss
@@ -176,17 +194,9 @@ class AcerPolicyGradient(OptimizerAlgoBase):
 
         rho_bar = torch.min(torch.ones_like(rho) * self.retrace_rho_cap, rho)
 
-        q_retraced_buffer = torch.zeros_like(rewards)
-
-        next_value = final_values
-
-        for i in reversed(range(self.number_of_steps)):
-            q_retraced = rewards[i] + self.discount_factor * next_value * (1.0 - dones[i])
-
-            # Next iteration
-            next_value = rho_bar[i] * (q_retraced - q_values[i]) + state_values[i]
-
-            q_retraced_buffer[i] = q_retraced
+        q_retraced_buffer = returns_util.retrace(
+            rewards, dones, q_values, state_values, rho_bar, final_values, self.discount_factor
+        )
 
         return q_retraced_buffer.flatten()
 
@@ -213,7 +223,7 @@ class AcerPolicyGradient(OptimizerAlgoBase):
 
 
 def create(model, trust_region, entropy_coefficient, q_coefficient, max_grad_norm, rho_cap=10.0, retrace_rho_cap=1.0,
-           average_model_alpha=0.99, trust_region_delta=1.0):
+           average_model_alpha=0.99, trust_region_delta=1.0, stacked_evaluation=False, precision='fp32'):
     return AcerPolicyGradient(
         trust_region=trust_region,
         model_factory=model,
@@ -223,5 +233,7 @@ def create(model, trust_region, entropy_coefficient, q_coefficient, max_grad_nor
         retrace_rho_cap=retrace_rho_cap,
         max_grad_norm=max_grad_norm,
         average_model_alpha=average_model_alpha,
-        trust_region_delta=trust_region_delta
+        trust_region_delta=trust_region_delta,
+        stacked_evaluation=stacked_evaluation,
+        precision=precision
     )
@@ -4,13 +4,14 @@ import torch.nn.functional as F
 
 from vel.rl.api.base import OptimizerAlgoBase
 from vel.api.metrics.averaging_metric import AveragingNamedMetric
+from vel.util.target_update import hard_update, polyak_update
 
 
 class DeepDeterministicPolicyGradient(OptimizerAlgoBase):
     """ Deep Deterministic Policy Gradient (DDPG) - policy gradient calculations """
 
-    def __init__(self, model_factory, tau, max_grad_norm):
-        super().__init__(max_grad_norm)
+    def __init__(self, model_factory, tau, max_grad_norm, precision='fp32'):
+        super().__init__(max_grad_norm, precision=precision)
 
         self.model_factory = model_factory
         self.tau = tau
@@ -23,7 +24,7 @@ class DeepDeterministicPolicyGradient(OptimizerAlgoBase):
         self.discount_factor = settings.discount_factor
 
         self.target_model = self.model_factory.instantiate(action_space=environment.action_space).to(device)
-        self.target_model.load_state_dict(model.state_dict())
+        hard_update(self.target_model, model)
 
     def calculate_gradient(self, batch_info, device, model, rollout):
         """ Calculate loss of the supplied rollout """
@@ -63,10 +64,8 @@ class DeepDeterministicPolicyGradient(OptimizerAlgoBase):
 
     def post_optimization_step(self, batch_info, device, model, rollout):
         """ Steps to take after optimization has been done"""
-        # Update target model
-        for model_param, target_param in zip(model.parameters(), self.target_model.parameters()):
-            # EWMA average model update
-            target_param.data.mul_(1 - self.tau).add_(model_param.data * self.tau)
+        # EWMA target model update
+        polyak_update(self.target_model, model, self.tau)
 
     def metrics(self) -> list:
         """ List of metrics to track for this learning process """
@@ -76,9 +75,10 @@ class DeepDeterministicPolicyGradient(OptimizerAlgoBase):
         ]
 
 
-def create(model, tau: float, max_grad_norm: float=None):
+def create(model, tau: float, max_grad_norm: float=None, precision: str='fp32'):
     return DeepDeterministicPolicyGradient(
         tau=tau,
         model_factory=model,
-        max_grad_norm=max_grad_norm
+        max_grad_norm=max_grad_norm,
+        precision=precision
     )
@@ -10,8 +10,9 @@ from vel.schedules.constant import ConstantSchedule
 
 class PpoPolicyGradient(OptimizerAlgoBase):
     """ Proximal Policy Optimization - https://arxiv.org/abs/1707.06347 """
-    def __init__(self, entropy_coefficient, value_coefficient, cliprange, max_grad_norm):
-        super().__init__(max_grad_norm)
+    def __init__(self, entropy_coefficient, value_coefficient, cliprange, max_grad_norm, micro_batches=1,
+                 precision='fp32'):
+        super().__init__(max_grad_norm, micro_batches=micro_batches, precision=precision)
 
         self.entropy_coefficient = entropy_coefficient
         self.value_coefficient = value_coefficient
@@ -33,8 +34,11 @@ class PpoPolicyGradient(OptimizerAlgoBase):
         # Select the cliprange
         current_cliprange = self.cliprange.value(batch_info['progress'])
 
-        # Normalize the advantages?
-        advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
+        if 'normalized_advantages' in rollout:
+            # Rollout is a micro-batch, advantages have been normalized over the whole rollout
+            advantages = rollout['normalized_advantages']
+        else:
+            advantages = self.normalize_advantages(advantages)
 
         # PART 0 - model_evaluation
         eval_action_pd_params, eval_value_outputs = model(observations)
@@ -76,6 +80,23 @@ class PpoPolicyGradient(OptimizerAlgoBase):
             'explained_variance': explained_variance(returns, rollout_values)
         }
 
+    def accumulate_gradient(self, batch_info, device, model, rollout):
+        """ Normalize advantages over the whole rollout, before it is split into micro-batches """
+        rollout = dict(rollout, normalized_advantages=self.normalize_advantages(rollout['advantages']))
+        return super().accumulate_gradient(batch_info, device, model, rollout)
+
+    def batch_statistics(self, rollout) -> dict:
+        """ Statistics of the whole rollout, that cannot be averaged over its micro-batches """
+        return {
+            'advantage_norm': torch.norm(rollout['normalized_advantages']).item(),
+            'explained_variance': explained_variance(rollout['returns'], rollout['values'])
+        }
+
+    @staticmethod
+    def normalize_advantages(advantages):
+        """ Normalize advantages to zero mean and unit variance """
+        return (advantages - advantages.mean()) / (advantages.std() + 1e-8)
+
     def metrics(self) -> list:
         """ List of metrics to track for this learning process """
         return [
@@ -90,5 +111,8 @@ class PpoPolicyGradient(OptimizerAlgoBase):
         ]
 
 
-def create(entropy_coefficient, value_coefficient, cliprange, max_grad_norm):
-    return PpoPolicyGradient(entropy_coefficient, value_coefficient, cliprange, max_grad_norm)
+def create(entropy_coefficient, value_coefficient, cliprange, max_grad_norm, micro_batches=1, precision='fp32'):
+    return PpoPolicyGradient(
+        entropy_coefficient, value_coefficient, cliprange, max_grad_norm, micro_batches=micro_batches,
+        precision=precision
+    )
@@ -1,10 +1,18 @@
 import numpy as np
+import time
 import torch
 import torch.autograd as autograd
 import torch.nn.functional as F
 import torch.nn.utils
 
+try:
+    import torch.func as torch_func
+except ImportError:
+    # Older versions of pytorch do not support functional calls
+    torch_func = None
+
 from vel.api.metrics.averaging_metric import AveragingNamedMetric
+from vel.api.precision import Precision
 from vel.math.functions import explained_variance
 from vel.rl.api.base import AlgoBase
 
@@ -46,11 +54,34 @@ def conjugate_gradient_method(matrix_vector_operator, loss_gradient, nsteps, rdo
     return x
 
 
+class _PolicyForward(torch.nn.Module):
+    """ Module evaluating only the policy part of the model, so that it can be called functionally """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, observations):
+        return self.model.policy(observations)
+
+
 class TrpoPolicyGradient(AlgoBase):
-    """ Trust Region Policy Optimization - https://arxiv.org/abs/1502.05477 """
+    """
+    Trust Region Policy Optimization - https://arxiv.org/abs/1502.05477
+
+    If `fvp_subsample` is set, Fisher-vector products are calculated on that fraction of the batch,
+    while the policy gradient uses the full batch, as in the original paper.
+
+    If `line_search_batch_size` is set, line search evaluates that many candidate step sizes in a single vectorized
+    pass and writes the model parameters only once. Setting it to `line_search_iters` evaluates all of them at once.
+
+    Forward passes run under the autocast of the supplied precision policy, except the one differentiated twice
+    for the Fisher-vector products, so that the conjugate gradient method works entirely in fp32.
+    """
 
     def __init__(self, max_kl, cg_iters, line_search_iters, cg_damping, entropy_coef, vf_iters,
-                 improvement_acceptance_ratio, max_grad_norm):
+                 improvement_acceptance_ratio, max_grad_norm, fvp_subsample=None, line_search_batch_size=None,
+                 precision='fp32'):
         self.mak_kl = max_kl
         self.cg_iters = cg_iters
         self.line_search_iters = line_search_iters
@@ -59,23 +90,30 @@ class TrpoPolicyGradient(AlgoBase):
         self.vf_iters = vf_iters
         self.improvement_acceptance_ratio = improvement_acceptance_ratio
         self.max_grad_norm = max_grad_norm
+        self.fvp_subsample = fvp_subsample
+        self.line_search_batch_size = line_search_batch_size if torch_func is not None else None
+        self.precision = Precision(precision)
 
     def optimizer_step(self, batch_info, device, model, rollout):
         """ Single optimization step for a model """
+        policy_update_start = time.perf_counter()
+
         observations = rollout['observations']
         returns = rollout['returns']
 
         # Evaluate model on the observations
-        action_pd_params = model.policy(observations)
+        with self.precision.autocast(device):
+            action_pd_params = model.policy(observations)
+
         policy_entropy = torch.mean(model.entropy(action_pd_params))
 
         policy_loss = self.calc_policy_loss(model, action_pd_params, policy_entropy, rollout)
         policy_grad = p2v(autograd.grad(policy_loss, model.policy_parameters(), retain_graph=True)).detach()
 
-        # Calculate gradient of KL divergence of model with fixed version of itself
-        # Value of kl_divergence will be 0, but what we need is the gradient, actually the 2nd derivarive
-        kl_divergence = torch.mean(model.kl_divergence(action_pd_params.detach(), action_pd_params))
-        kl_divergence_gradient = p2v(torch.autograd.grad(kl_divergence, model.policy_parameters(), create_graph=True))
+        cg_start = time.perf_counter()
+
+        # Graph of the KL divergence gradient is built once and shared by all the Fisher-vector products
+        kl_divergence_gradient = self.kl_divergence_gradient(model, observations, action_pd_params)
 
         step_direction = conjugate_gradient_method(
             matrix_vector_operator=lambda x: self.fisher_vector_product(x, kl_divergence_gradient, model),
@@ -84,7 +122,13 @@ class TrpoPolicyGradient(AlgoBase):
             nsteps=self.cg_iters
         )
 
-        shs = 0.5 * step_direction @ self.fisher_vector_product(step_direction, kl_divergence_gradient, model)
+        fisher_step = self.fisher_vector_product(step_direction, kl_divergence_gradient, model)
+
+        # Relative residual of the linear system solved by the conjugate gradient method
+        cg_residual = torch.norm(fisher_step + policy_grad) / torch.norm(policy_grad)
+        cg_time = time.perf_counter() - cg_start
+
+        shs = 0.5 * step_direction @ fisher_step
         lm = torch.sqrt(shs / self.mak_kl)
         full_step = step_direction / lm
 
@@ -92,15 +136,28 @@ class TrpoPolicyGradient(AlgoBase):
         expected_improvement = (-policy_grad) @ full_step
         original_parameter_vec = p2v(model.policy_parameters()).detach_()
 
-        policy_optimization_success, ratio, policy_loss_improvement, new_policy_loss, kl_divergence_step = self.line_search(
+        if self.line_search_batch_size is not None:
+            line_search = self.line_search_batched
+        else:
+            line_search = self.line_search
+
+        line_search_start = time.perf_counter()
+
+        policy_optimization_success, ratio, policy_loss_improvement, new_policy_loss, kl_divergence_step = line_search(
             model, rollout, policy_loss, action_pd_params, original_parameter_vec, full_step, expected_improvement
         )
 
+        line_search_time = time.perf_counter() - line_search_start
+
+        policy_update_time = time.perf_counter() - policy_update_start
+
         gradient_norms = []
 
         for i in range(self.vf_iters):
             batch_info.optimizer.zero_grad()
-            value_loss = self.value_loss(model, observations, returns)
+
+            with self.precision.autocast(device):
+                value_loss = self.value_loss(model, observations, returns)
 
             value_loss.backward()
 
@@ -131,7 +188,11 @@ class TrpoPolicyGradient(AlgoBase):
             'policy_loss_improvement': policy_loss_improvement.item(),
             'grad_norm': gradient_norm,
             'advantage_norm': torch.norm(rollout['advantages']).item(),
-            'explained_variance': explained_variance(returns, rollout['values'])
+            'explained_variance': explained_variance(returns, rollout['values']),
+            'cg_residual': cg_residual.item(),
+            'cg_time': cg_time,
+            'line_search_time': line_search_time,
+            'policy_update_time': policy_update_time
         }
 
     def line_search(self, model, rollout, original_policy_loss, original_action_pd_params, original_parameter_vec,
@@ -149,7 +210,9 @@ class TrpoPolicyGradient(AlgoBase):
 
             # Calculate new loss
             with torch.no_grad():
-                action_pd_params = model.policy(rollout['observations'])
+                with self.precision.autocast(original_parameter_vec.device):
+                    action_pd_params = model.policy(rollout['observations'])
+
                 policy_entropy = torch.mean(model.entropy(action_pd_params))
                 kl_divergence = torch.mean(model.kl_divergence(original_action_pd_params, action_pd_params))
 
@@ -174,6 +237,80 @@ class TrpoPolicyGradient(AlgoBase):
         v2p(original_parameter_vec, model.policy_parameters())
         return False, torch.tensor(0.0), torch.tensor(0.0), torch.tensor(0.0), torch.tensor(0.0)
 
+    def line_search_batched(self, model, rollout, original_policy_loss, original_action_pd_params,
+                            original_parameter_vec, full_step, expected_improvement_full):
+        """
+        Find the right stepsize to make sure policy improves, evaluating `line_search_batch_size` candidates at once
+        """
+        all_stepsizes = 0.5 ** torch.arange(self.line_search_iters, dtype=full_step.dtype, device=full_step.device)
+
+        for start in range(0, self.line_search_iters, self.line_search_batch_size):
+            stepsizes = all_stepsizes[start:start + self.line_search_batch_size]
+            candidate_vecs = original_parameter_vec.unsqueeze(0) + stepsizes.unsqueeze(1) * full_step.unsqueeze(0)
+
+            with torch.no_grad():
+                new_losses, kl_divergences = self._evaluate_candidates(
+                    model, rollout, original_action_pd_params, candidate_vecs
+                )
+
+                actual_improvements = original_policy_loss - new_losses
+                expected_improvements = expected_improvement_full * stepsizes
+
+                ratios = actual_improvements / expected_improvements
+
+            # The same acceptance criteria as in the sequential line search, the largest step that satisfies them wins
+            accepted = ((kl_divergences <= self.mak_kl * 1.5) & (ratios >= expected_improvements)).nonzero()
+
+            if accepted.numel() > 0:
+                idx = accepted[0, 0]
+                v2p(candidate_vecs[idx], model.policy_parameters())
+                return True, ratios[idx], actual_improvements[idx], new_losses[idx], kl_divergences[idx]
+
+        return False, torch.tensor(0.0), torch.tensor(0.0), torch.tensor(0.0), torch.tensor(0.0)
+
+    def _evaluate_candidates(self, model, rollout, original_action_pd_params, candidate_vecs):
+        """ Policy losses and KL divergences for a stack of candidate policy parameter vectors """
+        policy_forward = _PolicyForward(model)
+        parameter_names = {parameter: name for name, parameter in policy_forward.named_parameters()}
+
+        stacked_parameters = {}
+        offset = 0
+
+        for parameter in model.policy_parameters():
+            stacked_parameters[parameter_names[parameter]] = candidate_vecs[:, offset:offset + parameter.numel()].view(
+                (-1,) + parameter.shape
+            )
+            offset += parameter.numel()
+
+        def evaluate(parameters):
+            with self.precision.autocast(candidate_vecs.device):
+                action_pd_params = torch_func.functional_call(policy_forward, parameters, (rollout['observations'],))
+
+            policy_entropy = torch.mean(model.entropy(action_pd_params))
+            kl_divergence = torch.mean(model.kl_divergence(original_action_pd_params, action_pd_params))
+
+            return self.calc_policy_loss(model, action_pd_params, policy_entropy, rollout), kl_divergence
+
+        return torch_func.vmap(evaluate)(stacked_parameters)
+
+    def kl_divergence_gradient(self, model, observations, action_pd_params):
+        """
+        Gradient of KL divergence of model with fixed version of itself, with the graph kept to differentiate it again.
+        Value of kl_divergence will be 0, but what we need is the gradient, actually the 2nd derivarive
+        """
+        if self.fvp_subsample is not None and self.fvp_subsample < 1.0:
+            sample_size = max(1, int(observations.size(0) * self.fvp_subsample))
+            indexes = torch.randperm(observations.size(0), device=observations.device)[:sample_size]
+
+            # Separate forward pass, so that the second derivatives do not go through the whole batch
+            action_pd_params = model.policy(observations[indexes])
+        elif self.precision.enabled:
+            # Separate forward pass in fp32, so that the second derivatives are not calculated in reduced precision
+            action_pd_params = model.policy(observations)
+
+        kl_divergence = torch.mean(model.kl_divergence(action_pd_params.detach(), action_pd_params))
+        return p2v(torch.autograd.grad(kl_divergence, model.policy_parameters(), create_graph=True))
+
     def fisher_vector_product(self, vector, kl_divergence_gradient, model):
         """ Calculate product Hessian @ vector """
         assert not vector.requires_grad, "Vector must not propagate gradient"
@@ -234,13 +371,18 @@ class TrpoPolicyGradient(AlgoBase):
             AveragingNamedMetric("policy_loss_improvement"),
             AveragingNamedMetric("grad_norm"),
             AveragingNamedMetric("advantage_norm"),
-            AveragingNamedMetric("explained_variance")
+            AveragingNamedMetric("explained_variance"),
+            AveragingNamedMetric("cg_residual"),
+            AveragingNamedMetric("cg_time"),
+            AveragingNamedMetric("line_search_time"),
+            AveragingNamedMetric("policy_update_time")
         ]
 
 
 def create(max_kl, cg_iters, line_search_iters, cg_damping, entropy_coef, vf_iters, improvement_acceptance_ratio=0.1,
-           max_grad_norm=0.5):
+           max_grad_norm=0.5, fvp_subsample=None, line_search_batch_size=None, precision='fp32'):
     return TrpoPolicyGradient(
         max_kl, int(cg_iters), int(line_search_iters), cg_damping, entropy_coef, vf_iters, improvement_acceptance_ratio,
-        max_grad_norm=max_grad_norm
+        max_grad_norm=max_grad_norm, fvp_subsample=fvp_subsample,
+        line_search_batch_size=line_search_batch_size, precision=precision
     )
@@ -0,0 +1,104 @@
+import torch
+import torch.nn.functional as F
+
+import vel.math.returns as returns_util
+
+from vel.api.metrics.averaging_metric import AveragingNamedMetric
+from vel.rl.api.base import OptimizerAlgoBase
+from vel.math.functions import explained_variance
+
+
+class VTracePolicyGradient(OptimizerAlgoBase):
+    """
+    Actor-critic policy gradient with V-trace off-policy correction, as in IMPALA
+    https://arxiv.org/abs/1802.01561
+    """
+    def __init__(self, entropy_coefficient, value_coefficient, max_grad_norm, rho_cap=1.0, c_cap=1.0,
+                 pg_rho_cap=1.0, precision='fp32'):
+        super().__init__(max_grad_norm, precision=precision)
+
+        self.discount_factor = None
+        self.number_of_steps = None
+
+        self.entropy_coefficient = entropy_coefficient
+        self.value_coefficient = value_coefficient
+
+        self.rho_cap = rho_cap
+        self.c_cap = c_cap
+        self.pg_rho_cap = pg_rho_cap
+
+    def initialize(self, settings, model, environment, device):
+        """ Initialize policy gradient from reinforcer settings """
+        self.discount_factor = settings.discount_factor
+        self.number_of_steps = settings.number_of_steps
+
+    def calculate_gradient(self, batch_info, device, model, rollout):
+        """ Calculate loss of the supplied rollout """
+        observations = rollout['observations']
+        actions = rollout['actions']
+        rewards = rollout['rewards']
+        dones = rollout['dones']
+        behaviour_logprobs = rollout['logprobs']
+        final_values = rollout['final_values']
+
+        action_pd_params, value_outputs = model(observations)
+        log_prob = model.logprob(actions, action_pd_params)
+
+        with torch.no_grad():
+            rhos = torch.exp(log_prob - behaviour_logprobs)
+
+            vs, pg_advantages = returns_util.vtrace(
+                self._reshape_to_episodes(rewards), self._reshape_to_episodes(dones),
+                self._reshape_to_episodes(value_outputs), final_values, self._reshape_to_episodes(rhos),
+                self.discount_factor, rho_cap=self.rho_cap, c_cap=self.c_cap, pg_rho_cap=self.pg_rho_cap
+            )
+
+            vs = vs.to(device).flatten()
+            pg_advantages = pg_advantages.to(device).flatten()
+
+        policy_loss = - torch.mean(pg_advantages * log_prob)
+        value_loss = 0.5 * F.mse_loss(value_outputs, vs)
+        policy_entropy = torch.mean(model.entropy(action_pd_params))
+
+        loss_value = (
+            policy_loss - self.entropy_coefficient * policy_entropy + self.value_coefficient * value_loss
+        )
+        loss_value.backward()
+
+        return {
+            'policy_loss': policy_loss.item(),
+            'value_loss': value_loss.item(),
+            'policy_entropy': policy_entropy.item(),
+            'advantage_norm': torch.norm(pg_advantages).item(),
+            'explained_variance': explained_variance(vs, value_outputs.detach()),
+            'importance_weight': rhos.mean().item()
+        }
+
+    def _reshape_to_episodes(self, array):
+        """ Reshape flat rollout into [number_of_steps, num_envs] """
+        return array.view(self.number_of_steps, -1)
+
+    def metrics(self) -> list:
+        """ List of metrics to track for this learning process """
+        return [
+            AveragingNamedMetric("value_loss"),
+            AveragingNamedMetric("policy_entropy"),
+            AveragingNamedMetric("policy_loss"),
+            AveragingNamedMetric("grad_norm"),
+            AveragingNamedMetric("advantage_norm"),
+            AveragingNamedMetric("explained_variance"),
+            AveragingNamedMetric("importance_weight")
+        ]
+
+
+def create(entropy_coefficient, value_coefficient, max_grad_norm, rho_cap=1.0, c_cap=1.0, pg_rho_cap=1.0,
+           precision='fp32'):
+    return VTracePolicyGradient(
+        entropy_coefficient=entropy_coefficient,
+        value_coefficient=value_coefficient,
+        max_grad_norm=max_grad_norm,
+        rho_cap=rho_cap,
+        c_cap=c_cap,
+        pg_rho_cap=pg_rho_cap,
+        precision=precision
+    )
@@ -0,0 +1,49 @@
+import gym
+import numpy.testing as nt
+import torch
+
+from vel.rl.algo.policy_gradient.ppo import PpoPolicyGradient
+from vel.rl.models.backbone.mlp import MLP
+from vel.rl.models.policy_gradient_model import PolicyGradientModel
+
+
+def test_accumulated_gradient_equals_full_batch_gradient():
+    """ Advantages are normalized over the whole rollout, so micro-batches give the large batch PPO gradient """
+    torch.manual_seed(0)
+
+    model = PolicyGradientModel(MLP(input_length=4, hidden_units=16), gym.spaces.Discrete(3))
+    model.reset_weights()
+
+    observations = torch.randn(30, 4)
+
+    with torch.no_grad():
+        step = model.step(observations)
+
+    # Advantages far from zero mean, so that normalizing each micro-batch separately makes a difference
+    advantages = 3.0 + 2.0 * torch.randn(30)
+
+    rollout = {
+        'size': 30,
+        'observations': observations,
+        'actions': step['actions'],
+        'logprobs': step['logprob'] + 0.1 * torch.randn(30),
+        'values': step['values'],
+        'advantages': advantages,
+        'returns': step['values'] + advantages,
+    }
+
+    batch_info = {'progress': 0.0}
+
+    full_result = PpoPolicyGradient(0.01, 0.5, 0.1, None).calculate_gradient(batch_info, 'cpu', model, rollout)
+    full_gradients = [p.grad.clone() for p in model.parameters()]
+
+    model.zero_grad()
+    result = PpoPolicyGradient(0.01, 0.5, 0.1, None, micro_batches=4).accumulate_gradient(
+        batch_info, 'cpu', model, rollout
+    )
+
+    for parameter, full_gradient in zip(model.parameters(), full_gradients):
+        nt.assert_allclose(parameter.grad.numpy(), full_gradient.numpy(), rtol=1e-4, atol=1e-6)
+
+    for key, value in full_result.items():
+        nt.assert_allclose(result[key], value, rtol=1e-5, atol=1e-6, err_msg=key)
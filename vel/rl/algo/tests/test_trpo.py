@@ -0,0 +1,130 @@
+import types
+
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+from vel.rl.algo.policy_gradient.trpo import TrpoPolicyGradient, conjugate_gradient_method, p2v
+from vel.rl.models.backbone.mlp import MLP
+from vel.rl.models.policy_gradient_model_separate import PolicyGradientModelSeparate
+
+
+def _algo(**kwargs):
+    return TrpoPolicyGradient(
+        max_kl=0.01, cg_iters=10, line_search_iters=10, cg_damping=0.001, entropy_coef=0.0, vf_iters=1,
+        improvement_acceptance_ratio=0.1, max_grad_norm=0.5, **kwargs
+    )
+
+
+def _model_and_rollout():
+    torch.manual_seed(0)
+
+    model = PolicyGradientModelSeparate(
+        MLP(input_length=4, hidden_units=16), MLP(input_length=4, hidden_units=16), gym.spaces.Discrete(3)
+    )
+    model.reset_weights()
+
+    observations = torch.randn(64, 4)
+
+    with torch.no_grad():
+        step = model.step(observations)
+
+    advantages = torch.randn(64)
+
+    rollout = {
+        'observations': observations,
+        'actions': step['actions'],
+        'logprobs': step['logprob'],
+        'values': step['values'],
+        'advantages': advantages,
+        'returns': step['values'] + advantages,
+    }
+
+    return model, rollout
+
+
+def _step_direction(algo, model, rollout, kl_divergence_gradient=None):
+    """ Conjugate gradient solution for the policy gradient of the rollout """
+    action_pd_params = model.policy(rollout['observations'])
+    policy_loss = algo.calc_policy_loss(model, action_pd_params, torch.mean(model.entropy(action_pd_params)), rollout)
+    policy_grad = p2v(torch.autograd.grad(policy_loss, model.policy_parameters(), retain_graph=True)).detach()
+
+    if kl_divergence_gradient is None:
+        kl_divergence_gradient = algo.kl_divergence_gradient(model, rollout['observations'], action_pd_params)
+
+    return policy_grad, conjugate_gradient_method(
+        lambda x: algo.fisher_vector_product(x, kl_divergence_gradient, model), -policy_grad, algo.cg_iters
+    )
+
+
+def test_full_fvp_sample_reproduces_step_direction():
+    """ Without subsampling Fisher-vector products use the KL divergence of the whole batch """
+    model, rollout = _model_and_rollout()
+    algo = _algo()
+
+    # KL divergence of the whole batch differentiated directly
+    action_pd_params = model.policy(rollout['observations'])
+    kl_divergence = torch.mean(model.kl_divergence(action_pd_params.detach(), action_pd_params))
+    reference_gradient = p2v(torch.autograd.grad(kl_divergence, model.policy_parameters(), create_graph=True))
+
+    _, reference = _step_direction(algo, model, rollout, reference_gradient)
+
+    for fvp_subsample in [None, 1.0]:
+        _, step_direction = _step_direction(_algo(fvp_subsample=fvp_subsample), model, rollout)
+        nt.assert_allclose(step_direction.numpy(), reference.numpy(), rtol=1e-5, atol=1e-7)
+
+
+def test_subsampled_fvp_step():
+    """ Optimization step with Fisher-vector products on a quarter of the batch gives a finite residual """
+    model, rollout = _model_and_rollout()
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+
+    result = _algo(fvp_subsample=0.25).optimizer_step(
+        types.SimpleNamespace(optimizer=optimizer), torch.device('cpu'), model, rollout
+    )
+
+    t.assert_true(np.isfinite(result['cg_residual']))
+    t.assert_true(np.isfinite(result['new_policy_loss']))
+
+
+def test_batched_line_search_matches_sequential():
+    """ Batched line search accepts the same step size as the sequential one, whatever the batch size """
+    model, rollout = _model_and_rollout()
+    algo = _algo()
+
+    action_pd_params = model.policy(rollout['observations'])
+    policy_loss = algo.calc_policy_loss(model, action_pd_params, torch.mean(model.entropy(action_pd_params)), rollout)
+    policy_grad, step_direction = _step_direction(algo, model, rollout)
+
+    # Step much too long, so that the search has to backtrack a few times
+    full_step = step_direction * 20.0
+    expected_improvement = (-policy_grad) @ full_step
+    original_parameter_vec = p2v(model.policy_parameters()).detach()
+
+    arguments = (
+        model, rollout, policy_loss.detach(), action_pd_params.detach(), original_parameter_vec, full_step,
+        expected_improvement
+    )
+
+    reference = algo.line_search(*arguments)
+    reference_parameters = p2v(model.policy_parameters()).detach().clone()
+
+    t.assert_true(reference[0])
+    t.assert_greater(torch.norm(reference_parameters - original_parameter_vec).item(), 0.0)
+    t.assert_less(torch.norm(reference_parameters - original_parameter_vec).item(), torch.norm(full_step).item() / 2)
+
+    for batch_size in [3, 10]:
+        torch.nn.utils.vector_to_parameters(original_parameter_vec, model.policy_parameters())
+
+        result = _algo(line_search_batch_size=batch_size).line_search_batched(*arguments)
+
+        t.assert_equal(result[0], reference[0])
+
+        for value, reference_value in zip(result[1:], reference[1:]):
+            nt.assert_allclose(value.item(), reference_value.item(), rtol=1e-5, atol=1e-8)
+
+        nt.assert_allclose(
+            p2v(model.policy_parameters()).detach().numpy(), reference_parameters.numpy(), rtol=1e-6, atol=1e-8
+        )
@@ -1,5 +1,9 @@
+import numpy as np
+import torch
 import torch.nn.utils
 
+from vel.api.precision import Precision
+
 
 class AlgoBase:
     """ Base class for algo reinforcement calculations """
@@ -30,15 +34,29 @@ class AlgoBase:
 
 
 class OptimizerAlgoBase(AlgoBase):
-    """ RL algo that does a simple optimizer update """
+    """
+    RL algo that does a simple optimizer update.
+
+    Gradient of the update may be accumulated over a number of micro-batches - parts of the rollout evaluated one
+    after another - to limit the memory used by large batches. That assumes the loss is an average over samples.
+    Statistics that are not averages over samples are calculated once for the whole rollout in `batch_statistics`.
 
-    def __init__(self, max_grad_norm):
+    Gradient calculation runs under the autocast of the supplied precision policy.
+    """
+
+    def __init__(self, max_grad_norm, micro_batches=1, precision='fp32'):
         self.max_grad_norm = max_grad_norm
+        self.micro_batches = micro_batches
+        self.precision = Precision(precision)
 
     def calculate_gradient(self, batch_info, device, model, rollout):
         """ Calculate loss of the supplied rollout """
         raise NotImplementedError
 
+    def batch_statistics(self, rollout) -> dict:
+        """ Statistics of the whole rollout, that cannot be averaged over its micro-batches """
+        return {}
+
     def post_optimization_step(self, batch_info, device, model, rollout):
         """ Steps to take after optimization has been done"""
         pass
@@ -47,7 +65,15 @@ class OptimizerAlgoBase(AlgoBase):
         """ Single optimization step for a model """
         batch_info.optimizer.zero_grad()
 
-        batch_result = self.calculate_gradient(batch_info=batch_info, device=device, model=model, rollout=rollout)
+        with self.precision.autocast(device):
+            if self.micro_batches > 1:
+                batch_result = self.accumulate_gradient(
+                    batch_info=batch_info, device=device, model=model, rollout=rollout
+                )
+            else:
+                batch_result = self.calculate_gradient(
+                    batch_info=batch_info, device=device, model=model, rollout=rollout
+                )
 
         self._clip_gradients(batch_result, model, self.max_grad_norm)
 
@@ -57,6 +83,72 @@ class OptimizerAlgoBase(AlgoBase):
 
         return batch_result
 
+    def accumulate_gradient(self, batch_info, device, model, rollout):
+        """
+        Calculate gradient of the supplied rollout as an average of the gradients of its micro-batches,
+        weighted by their sizes
+        """
+        tensors = {k: v for k, v in rollout.items() if isinstance(v, torch.Tensor)}
+        batch_size = next(iter(tensors.values())).size(0)
+        split_sizes = [len(part) for part in np.array_split(np.arange(batch_size), self.micro_batches) if len(part)]
+
+        parameters = [p for p in model.parameters() if p.requires_grad]
+        splits = {k: v.split(split_sizes) for k, v in tensors.items()}
+
+        results = []
+        accumulated_size = 0
+
+        for idx, split_size in enumerate(split_sizes):
+            micro_batch = dict(rollout)
+            micro_batch.update({k: v[idx] for k, v in splits.items()})
+
+            # Gradients so far are an average over accumulated samples. Rescale them, so that after the
+            # next backward pass they are an average over accumulated samples and the micro-batch
+            if accumulated_size > 0:
+                _scale_gradients(parameters, accumulated_size / split_size)
+
+            results.append(
+                self.calculate_gradient(batch_info=batch_info, device=device, model=model, rollout=micro_batch)
+            )
+
+            accumulated_size += split_size
+            _scale_gradients(parameters, split_size / accumulated_size)
+
+        batch_result = _aggregate_results(results, split_sizes)
+        batch_result.update(self.batch_statistics(rollout))
+
+        return batch_result
+
     def metrics(self) -> list:
         """ List of metrics to track for this learning process """
         return []
+
+
+def _scale_gradients(parameters, factor):
+    """ Multiply existing gradients of the parameters by a constant factor """
+    gradients = [p.grad for p in parameters if p.grad is not None]
+
+    if factor == 1.0 or not gradients:
+        return
+
+    with torch.no_grad():
+        if hasattr(torch, '_foreach_mul_'):
+            torch._foreach_mul_(gradients, factor)
+        else:
+            for gradient in gradients:
+                gradient.mul_(factor)
+
+
+def _aggregate_results(results, sizes):
+    """ Merge results of the micro-batches: per-sample arrays are concatenated, other values averaged by size """
+    aggregated = {}
+
+    for key, value in results[0].items():
+        values = [result[key] for result in results]
+
+        if isinstance(value, np.ndarray) and value.ndim > 0:
+            aggregated[key] = np.concatenate(values)
+        else:
+            aggregated[key] = float(np.average([float(v) for v in values], weights=sizes))
+
+    return aggregated
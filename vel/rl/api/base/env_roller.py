@@ -1,5 +1,6 @@
 import typing
 import gym
+import torch
 
 from vel.api import BatchInfo
 from vel.api.base import Model
@@ -31,6 +32,29 @@ class ReplayEnvRollerBase(EnvRollerBase):
         """ Sample experience from replay buffer and return a batch """
         raise NotImplementedError
 
+    def sample_rounds(self, batch_info: BatchInfo, model: Model, rounds: int) -> list:
+        """
+        Sample experience for a number of consecutive training rounds, return a list of batches.
+        Rollers may override it to assemble and transfer all the batches at once.
+        """
+        return [self.sample(batch_info, model) for _ in range(rounds)]
+
+    @staticmethod
+    def _split_rounds(sample: dict, rounds: int) -> list:
+        """ Split a sample of a few consecutive rounds into separate batches of equal size """
+        round_size = sample['size'] // rounds
+        batches = []
+
+        for idx in range(rounds):
+            start, end = idx * round_size, (idx + 1) * round_size
+
+            batch = {k: v[start:end] if isinstance(v, (torch.Tensor, list)) else v for k, v in sample.items()}
+            batch['size'] = round_size
+
+            batches.append(batch)
+
+        return batches
+
     def is_ready_for_sampling(self) -> bool:
         """ If buffer is ready for drawing samples from it (usually checks if there is enough data) """
         raise NotImplementedError
@@ -30,6 +30,10 @@ class ReinforcerBase:
         """ List of metrics to track for this learning process """
         raise NotImplementedError
 
+    def state_dict(self) -> dict:
+        """ State of the learning process, other than model weights, to be stored in the checkpoint """
+        return {}
+
     @property
     def model(self) -> Model:
         """ Model trained by this reinforcer """
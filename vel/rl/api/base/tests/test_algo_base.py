@@ -0,0 +1,38 @@
+import nose.tools as t
+import numpy.testing as nt
+import torch
+import torch.nn as nn
+
+from vel.rl.api.base import OptimizerAlgoBase
+
+
+class RegressionAlgo(OptimizerAlgoBase):
+    """ Mean squared error of a linear model """
+
+    def calculate_gradient(self, batch_info, device, model, rollout):
+        errors = (model(rollout['observations']).squeeze(1) - rollout['targets']) ** 2
+        loss = errors.mean()
+        loss.backward()
+
+        return {'loss': loss.item(), 'errors': errors.detach().numpy()}
+
+
+def test_accumulated_gradient_equals_full_batch_gradient():
+    """ Gradient accumulated over uneven micro-batches is the same as the gradient of the whole batch """
+    torch.manual_seed(0)
+
+    model = nn.Linear(3, 1)
+    rollout = {'observations': torch.randn(10, 3), 'targets': torch.randn(10), 'size': 10}
+
+    full_result = RegressionAlgo(max_grad_norm=None).calculate_gradient(None, 'cpu', model, rollout)
+    full_gradients = [p.grad.clone() for p in model.parameters()]
+
+    model.zero_grad()
+    result = RegressionAlgo(max_grad_norm=None, micro_batches=3).accumulate_gradient(None, 'cpu', model, rollout)
+
+    for parameter, full_gradient in zip(model.parameters(), full_gradients):
+        nt.assert_allclose(parameter.grad.numpy(), full_gradient.numpy(), rtol=1e-5, atol=1e-7)
+
+    t.assert_almost_equal(result['loss'], full_result['loss'], places=5)
+    nt.assert_allclose(result['errors'], full_result['errors'], rtol=1e-5)
+    t.assert_equal(result['errors'].shape, (10,))
@@ -0,0 +1,78 @@
+import types
+
+import gym
+import nose.tools as t
+import numpy as np
+import torch
+import torch.nn as nn
+
+from vel.api.precision import Precision
+from vel.exceptions import VelException
+from vel.rl.api.base import OptimizerAlgoBase
+from vel.rl.modules.action_head import ActionHead
+from vel.rl.modules.deterministic_action_head import DeterministicActionHead
+from vel.rl.modules.deterministic_critic_head import DeterministicCriticHead
+from vel.rl.modules.dueling_q_head import DuelingQHead
+from vel.rl.modules.q_head import QHead
+from vel.rl.modules.value_head import ValueHead
+
+
+class RegressionAlgo(OptimizerAlgoBase):
+    """ Mean squared error of a linear model """
+
+    def calculate_gradient(self, batch_info, device, model, rollout):
+        outputs = model(rollout['observations'])
+        loss = ((outputs.float().squeeze(1) - rollout['targets']) ** 2).mean()
+        loss.backward()
+
+        return {'loss': loss.item(), 'output_dtype': str(outputs.dtype)}
+
+
+@t.raises(VelException)
+def test_unknown_policy():
+    Precision('fp16')
+
+
+def test_heads_return_fp32_under_bf16_autocast():
+    """ Heads cast their outputs back to single precision, so that losses are calculated in fp32 """
+    box = gym.spaces.Box(low=-1.0, high=1.0, shape=(2,), dtype=np.float32)
+    inputs = torch.randn(5, 8)
+
+    heads = [
+        (ActionHead(8, gym.spaces.Discrete(3)), (inputs,)),
+        (ActionHead(8, box), (inputs,)),
+        (QHead(8, gym.spaces.Discrete(3)), (inputs,)),
+        (DuelingQHead(8, gym.spaces.Discrete(3)), (inputs, inputs)),
+        (ValueHead(8), (inputs,)),
+        (DeterministicActionHead(8, box), (inputs,)),
+        (DeterministicCriticHead(8, box), (inputs, torch.randn(5, 2))),
+    ]
+
+    with Precision('bf16').autocast('cpu'):
+        # Make sure the autocast is actually in effect
+        t.assert_equal(nn.Linear(8, 1)(inputs).dtype, torch.bfloat16)
+
+        for head, head_inputs in heads:
+            t.assert_equal(head(*head_inputs).dtype, torch.float32, type(head).__name__)
+
+
+def test_bf16_optimizer_step_keeps_fp32_parameters():
+    """ Forward pass runs in bfloat16, while parameters and gradients stay in single precision """
+    torch.manual_seed(0)
+
+    model = nn.Linear(3, 1)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    rollout = {'observations': torch.randn(10, 3), 'targets': torch.randn(10)}
+
+    initial_weight = model.weight.detach().clone()
+
+    result = RegressionAlgo(max_grad_norm=1.0, precision='bf16').optimizer_step(
+        types.SimpleNamespace(optimizer=optimizer), 'cpu', model, rollout
+    )
+
+    t.assert_equal(result['output_dtype'], str(torch.bfloat16))
+    t.assert_false(torch.equal(model.weight, initial_weight))
+
+    for parameter in model.parameters():
+        t.assert_equal(parameter.dtype, torch.float32)
+        t.assert_equal(parameter.grad.dtype, torch.float32)
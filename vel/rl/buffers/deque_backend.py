@@ -7,10 +7,14 @@ from vel.exceptions import VelException
 class DequeBufferBackend:
     """ Simple backend behind DequeBuffer """
 
-    def __init__(self, buffer_capacity: int, observation_space: gym.Space, action_space: gym.Space, extra_data=None):
+    def __init__(self, buffer_capacity: int, observation_space: gym.Space, action_space: gym.Space, extra_data=None,
+                 channels_first: bool=False):
         # Maximum number of items in the buffer
         self.buffer_capacity = buffer_capacity
 
+        # Frame history is stacked along the channel axis - first or last axis of the frame
+        self.channel_axis = -len(observation_space.shape) if channels_first else -1
+
         # How many elements have been inserted in the buffer
         self.current_size = 0
 
@@ -55,7 +59,8 @@ class DequeBufferBackend:
             raise VelException("Requested frame beyond the size of the buffer")
 
         if history_length > 1:
-            assert self.state_buffer.shape[-1] == 1, "State buffer must have last dimension of 1 if we want frame history"
+            assert self.state_buffer.shape[self.channel_axis] == 1, \
+                "State buffer must have a single channel if we want frame history"
 
         accumulator = []
 
@@ -75,7 +80,7 @@ class DequeBufferBackend:
                 accumulator.append(self.state_buffer[idx])
 
         # We're pushing the elements in reverse order
-        return np.concatenate(accumulator[::-1], axis=-1)
+        return np.concatenate(accumulator[::-1], axis=self.channel_axis)
 
     def get_transition(self, frame_idx, history_length=1):
         """ Single transition with given index """
@@ -102,8 +107,8 @@ class DequeBufferBackend:
         past_frame = self.get_frame(frame_idx, history_length)
 
         if history_length > 1:
-            assert self.state_buffer.shape[-1] == 1, \
-                "State buffer must have last dimension of 1 if we want frame history"
+            assert self.state_buffer.shape[self.channel_axis] == 1, \
+                "State buffer must have a single channel if we want frame history"
 
         if not self.dones_buffer[frame_idx]:
             next_idx = (frame_idx + 1) % self.buffer_capacity
@@ -114,8 +119,9 @@ class DequeBufferBackend:
 
         if history_length > 1:
             future_frame = np.concatenate([
-                past_frame.take(indices=np.arange(1, past_frame.shape[-1]), axis=-1), next_frame
-            ], axis=-1)
+                past_frame.take(indices=np.arange(1, past_frame.shape[self.channel_axis]), axis=self.channel_axis),
+                next_frame
+            ], axis=self.channel_axis)
         else:
             future_frame = next_frame
 
@@ -123,11 +129,10 @@ class DequeBufferBackend:
 
     def get_batch(self, indexes, history_length=1):
         """ Return batch with given indexes """
-        frame_batch_shape = (
-                [indexes.shape[0]]
-                + list(self.state_buffer.shape[1:-1])
-                + [self.state_buffer.shape[-1] * history_length]
-        )
+        frame_shape = list(self.state_buffer.shape[1:])
+        frame_shape[self.channel_axis] *= history_length
+
+        frame_batch_shape = [indexes.shape[0]] + frame_shape
 
         past_frame_buffer = np.zeros(frame_batch_shape, dtype=self.state_buffer.dtype)
         future_frame_buffer = np.zeros(frame_batch_shape, dtype=self.state_buffer.dtype)
@@ -21,10 +21,13 @@ class DequeMultiEnvBufferBackend:
     """
 
     def __init__(self, buffer_capacity: int, num_envs: int, observation_space: gym.Space, action_space: gym.Space,
-                 extra_data=None, frame_stack_compensation: bool=False):
+                 extra_data=None, frame_stack_compensation: bool=False, channels_first: bool=False):
         # Maximum number of items in the buffer
         self.buffer_capacity = buffer_capacity
 
+        # Frame history is stacked along the channel axis - first or last axis of the frame
+        self.channel_axis = -len(observation_space.shape) if channels_first else -1
+
         self.frame_stack_compensation = frame_stack_compensation
 
         # Number of parallel envs to record
@@ -37,16 +40,12 @@ class DequeMultiEnvBufferBackend:
         self.current_idx = -1
 
         # Data buffers
+        frame_shape = list(observation_space.shape)
+
         if self.frame_stack_compensation:
-            self.state_buffer = np.zeros(
-                [self.buffer_capacity, self.num_envs] + list(observation_space.shape)[:-1] + [1],
-                dtype=observation_space.dtype
-            )
-        else:
-            self.state_buffer = np.zeros(
-                [self.buffer_capacity, self.num_envs] + list(observation_space.shape),
-                dtype=observation_space.dtype
-            )
+            frame_shape[self.channel_axis] = 1
+
+        self.state_buffer = np.zeros([self.buffer_capacity, self.num_envs] + frame_shape, dtype=observation_space.dtype)
 
         self.action_buffer = np.zeros(
             [self.buffer_capacity, self.num_envs] + list(action_space.shape), dtype=action_space.dtype
@@ -66,7 +65,7 @@ class DequeMultiEnvBufferBackend:
 
         if self.frame_stack_compensation:
             # Compensate for frame stack built into the environment
-            frame = np.expand_dims(np.take(frame, indices=-1, axis=-1), axis=-1)
+            frame = np.take(frame, indices=[-1], axis=self.channel_axis)
 
         self.state_buffer[self.current_idx] = frame
 
@@ -90,8 +89,8 @@ class DequeMultiEnvBufferBackend:
         past_frame = self.get_frame(frame_idx, env_idx, history_length)
 
         if history_length > 1:
-            assert self.state_buffer.shape[-1] == 1, \
-                "State buffer must have last dimension of 1 if we want frame history"
+            assert self.state_buffer.shape[self.channel_axis] == 1, \
+                "State buffer must have a single channel if we want frame history"
 
         if not self.dones_buffer[frame_idx, env_idx]:
             next_idx = (frame_idx + 1) % self.buffer_capacity
@@ -102,8 +101,9 @@ class DequeMultiEnvBufferBackend:
 
         if history_length > 1:
             future_frame = np.concatenate([
-                past_frame.take(indices=np.arange(1, past_frame.shape[-1]), axis=-1), next_frame
-            ], axis=-1)
+                past_frame.take(indices=np.arange(1, past_frame.shape[self.channel_axis]), axis=self.channel_axis),
+                next_frame
+            ], axis=self.channel_axis)
         else:
             future_frame = next_frame
 
@@ -115,7 +115,8 @@ class DequeMultiEnvBufferBackend:
             raise VelException("Requested frame beyond the size of the buffer")
 
         if history_length > 1:
-            assert self.state_buffer.shape[-1] == 1, "State buffer must have last dimension of 1 if we want frame history"
+            assert self.state_buffer.shape[self.channel_axis] == 1, \
+                "State buffer must have a single channel if we want frame history"
 
         accumulator = []
 
@@ -136,7 +137,7 @@ class DequeMultiEnvBufferBackend:
                 accumulator.append(self.state_buffer[frame_idx, env_idx])
 
         # We're pushing the elements in reverse order
-        return np.concatenate(accumulator[::-1], axis=-1)
+        return np.concatenate(accumulator[::-1], axis=self.channel_axis)
 
     def get_transition(self, frame_idx, env_idx, history_length=1):
         """ Single transition with given index """
@@ -160,11 +161,10 @@ class DequeMultiEnvBufferBackend:
         assert indexes.shape[1] == self.state_buffer.shape[1], \
             "Must have the same number of indexes as there are environments"
 
-        frame_batch_shape = (
-                [indexes.shape[0], indexes.shape[1]]
-                + list(self.state_buffer.shape[2:-1])
-                + [self.state_buffer.shape[-1] * history_length]
-        )
+        frame_shape = list(self.state_buffer.shape[2:])
+        frame_shape[self.channel_axis] *= history_length
+
+        frame_batch_shape = [indexes.shape[0], indexes.shape[1]] + frame_shape
 
         past_frame_buffer = np.zeros(frame_batch_shape, dtype=self.state_buffer.dtype)
         future_frame_buffer = np.zeros(frame_batch_shape, dtype=self.state_buffer.dtype)
@@ -64,16 +64,23 @@ class SegmentTree:
 
 class PrioritizedReplayBackend:
     """ Backend behind the prioritized replay buffer """
-    def __init__(self, buffer_capacity: int, observation_space: gym.Space, action_space: gym.Space, extra_data=None):
-        self.deque = DequeBufferBackend(buffer_capacity, observation_space, action_space, extra_data=extra_data)
+    def __init__(self, buffer_capacity: int, observation_space: gym.Space, action_space: gym.Space, extra_data=None,
+                 channels_first: bool=False):
+        self.deque = DequeBufferBackend(
+            buffer_capacity, observation_space, action_space, extra_data=extra_data, channels_first=channels_first
+        )
         self.segment_tree = SegmentTree(buffer_capacity)
 
-    def store_transition(self, frame, action, reward, done, extra_info=None):
-        """ Store given transition in the backend """
-        self.deque.store_transition(frame, action, reward, done, extra_info=extra_info)
+    def store_transition(self, frame, action, reward, done, extra_info=None, priority=None):
+        """ Store given transition in the backend, by default with the max priority seen so far """
+        index = self.deque.store_transition(frame, action, reward, done, extra_info=extra_info)
 
-        # We add element with max priority to the tree
-        self.segment_tree.append(self.segment_tree.max)
+        if priority is None:
+            priority = self.segment_tree.max
+
+        self.segment_tree.append(priority)
+
+        return index
 
     def get_frame(self, idx, history):
         """ Return frame from the buffer """
@@ -116,12 +123,18 @@ class PrioritizedReplayBackend:
             prob, idx, tree_idx = self.segment_tree.find(sample)
 
             # Resample if transition straddled current index or probablity 0
-            if (self.segment_tree.index - idx) % self.segment_tree.size > 1 and \
-                    (idx - self.segment_tree.index) % self.segment_tree.size >= history and prob != 0:
-                valid = True  # Note that conditions are valid but extra conservative around buffer index 0
+            valid = self.is_valid_sample(prob, idx, history)
 
         return prob, idx, tree_idx
 
+    def is_valid_sample(self, prob, idx, history):
+        """ If the transition can be sampled - it has nonzero probability and its history and future are stored """
+        # Note that conditions are valid but extra conservative around buffer index 0
+        return (
+            (self.segment_tree.index - idx) % self.segment_tree.size > 1 and
+            (idx - self.segment_tree.index) % self.segment_tree.size >= history and prob != 0
+        )
+
     @property
     def current_size(self):
         """ Return current size of the replay buffer """
@@ -131,3 +144,8 @@ class PrioritizedReplayBackend:
     def current_idx(self):
         """ Return current index """
         return self.deque.current_idx
+
+    @property
+    def channel_axis(self):
+        """ Return axis of the frame along which frame history is stacked """
+        return self.deque.channel_axis
@@ -0,0 +1,97 @@
+import gym
+import numpy as np
+import random
+
+from .prioritized_backend import PrioritizedReplayBackend
+
+
+class PrioritizedMultiActorBackend:
+    """
+    Prioritized replay backend storing experience of several independent actors.
+
+    Each actor writes into a separate segment, so that frame history is never stitched together from
+    different environments, while the samples are drawn from a single distribution over all of them.
+    Indexes returned by this backend are pairs (actor index, index within the actor segment).
+    """
+
+    def __init__(self, buffer_capacity: int, observation_space: gym.Space, action_space: gym.Space, actors: int,
+                 channels_first: bool=False):
+        segment_capacity = (buffer_capacity + actors - 1) // actors
+
+        self.backends = [
+            PrioritizedReplayBackend(segment_capacity, observation_space, action_space, channels_first=channels_first)
+            for _ in range(actors)
+        ]
+
+    def store_transitions(self, actor_idx, frames, actions, rewards, dones, priorities):
+        """ Store consecutive transitions of a single actor together with their initial priorities """
+        backend = self.backends[actor_idx]
+
+        for frame, action, reward, done, priority in zip(frames, actions, rewards, dones, priorities):
+            backend.store_transition(frame, action, reward, done, priority=priority)
+
+    def get_batch(self, indexes, history):
+        """ Return batch of frames for given indexes """
+        result = None
+
+        for actor_idx in np.unique(indexes[:, 0]):
+            mask = indexes[:, 0] == actor_idx
+            actor_batch = self.backends[actor_idx].get_batch(indexes[mask, 1], history)
+
+            if result is None:
+                result = {
+                    name: np.zeros((indexes.shape[0],) + value.shape[1:], dtype=value.dtype)
+                    for name, value in actor_batch.items()
+                }
+
+            for name, value in actor_batch.items():
+                result[name][mask] = value
+
+        return result
+
+    def update_priority(self, tree_idx, priority):
+        """ Update priority of a single element """
+        self.backends[tree_idx[0]].update_priority(tree_idx[1], priority)
+
+    def total(self):
+        """ Sum of priorities of all the elements """
+        return sum(backend.segment_tree.total() for backend in self.backends)
+
+    def sample_batch_prioritized(self, batch_size, history):
+        """ Return indexes of the next sample in from prioritized distribution """
+        cumulative_totals = np.cumsum([backend.segment_tree.total() for backend in self.backends])
+        segment = cumulative_totals[-1] / batch_size
+
+        batch = [
+            self._get_sample(cumulative_totals, random.uniform(i * segment, (i + 1) * segment), history)
+            for i in range(batch_size)
+        ]
+
+        probs, actor_idxs, idxs, tree_idxs = zip(*batch)
+
+        return (
+            np.array(probs),
+            np.stack([np.array(actor_idxs), np.array(idxs)], axis=1),
+            np.stack([np.array(actor_idxs), np.array(tree_idxs)], axis=1)
+        )
+
+    def _get_sample(self, cumulative_totals, value, history):
+        """ Find the element for given cumulative priority value """
+        while True:
+            actor_idx = min(int(np.searchsorted(cumulative_totals, value)), len(self.backends) - 1)
+            offset = value - (cumulative_totals[actor_idx - 1] if actor_idx > 0 else 0.0)
+
+            backend = self.backends[actor_idx]
+            prob, idx, tree_idx = backend.segment_tree.find(offset)
+
+            if backend.is_valid_sample(prob, idx, history):
+                return prob, actor_idx, idx, tree_idx
+
+            # A high-priority element that cannot be sampled yet may cover the whole segment,
+            # in that case fall back to the whole distribution
+            value = random.uniform(0.0, cumulative_totals[-1])
+
+    @property
+    def current_size(self):
+        """ Return current size of the replay buffer """
+        return sum(backend.current_size for backend in self.backends)
@@ -520,3 +520,31 @@ def test_buffer_flexible_obs_action_sizes_with_history():
         [[[[21, 22], [21, 22]], [[21, 22], [21, 22]]],
          [[[210, 220], [210, 220]], [[210, 220], [210, 220]]]]
     ))
+
+
+def test_channels_first_batch_is_transposed():
+    """ Channels first buffer returns the same frame histories as channels last one, transposed """
+    random = np.random.RandomState(0)
+
+    buffers = [
+        DequeBufferBackend(
+            20, gym.spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8), gym.spaces.Discrete(4),
+            channels_first=channels_first
+        )
+        for shape, channels_first in [((3, 2, 1), False), ((1, 3, 2), True)]
+    ]
+
+    for i in range(30):
+        frame = random.randint(0, 255, size=(3, 2, 1)).astype(np.uint8)
+        done = i % 7 == 6
+
+        buffers[0].store_transition(frame, 0, 0.0, done)
+        buffers[1].store_transition(frame.transpose(2, 0, 1), 0, 0.0, done)
+
+    indexes = np.array([0, 3, 5, 8, 13, 15])
+    channels_last, channels_first = [buffer.get_batch(indexes, history_length=4) for buffer in buffers]
+
+    t.assert_equal(channels_first['states'].shape, (6, 4, 3, 2))
+
+    nt.assert_array_equal(channels_first['states'], channels_last['states'].transpose(0, 3, 1, 2))
+    nt.assert_array_equal(channels_first['states+1'], channels_last['states+1'].transpose(0, 3, 1, 2))
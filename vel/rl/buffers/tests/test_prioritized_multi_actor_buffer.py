@@ -0,0 +1,70 @@
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import random
+
+from vel.rl.buffers.prioritized_multi_actor_backend import PrioritizedMultiActorBackend
+
+
+def get_buffer_with_two_actors():
+    """ Return buffer filled with interleaved chunks of two actors, frames of the second actor are negative """
+    observation_space = gym.spaces.Box(low=-100, high=100, shape=(2, 2, 1), dtype=np.int32)
+    action_space = gym.spaces.Discrete(4)
+    buffer = PrioritizedMultiActorBackend(40, observation_space, action_space, actors=2)
+
+    v1 = np.ones(4, dtype=np.int32).reshape((2, 2, 1))
+
+    for chunk_idx in range(3):
+        for actor_idx, sign in [(0, 1), (1, -1)]:
+            steps = np.arange(chunk_idx * 5, (chunk_idx + 1) * 5)
+
+            buffer.store_transitions(
+                actor_idx,
+                frames=np.stack([v1 * sign * (i + 1) for i in steps]),
+                actions=np.zeros(5, dtype=np.int64),
+                rewards=steps.astype(np.float32),
+                dones=(steps % 7 == 6),
+                priorities=np.ones(5) * (actor_idx + 1)
+            )
+
+    return buffer
+
+
+def test_history_does_not_mix_actors():
+    """ Frame history of each sample comes from the actor that has generated it """
+    buffer = get_buffer_with_two_actors()
+
+    t.assert_equal(buffer.current_size, 30)
+
+    indexes = np.array([[0, 5], [1, 5], [1, 9], [0, 8]])
+    batch = buffer.get_batch(indexes, history=3)
+
+    nt.assert_array_equal(batch['states'][0, 0, 0], [4, 5, 6])
+    nt.assert_array_equal(batch['states'][1, 0, 0], [-4, -5, -6])
+    nt.assert_array_equal(batch['states+1'][2, 0, 0], [-9, -10, -11])
+
+    # Transition with index 6 was the end of an episode
+    nt.assert_array_equal(batch['states'][3, 0, 0], [0, 8, 9])
+    nt.assert_array_equal(batch['rewards'], [5.0, 5.0, 9.0, 8.0])
+
+
+def test_sampling_follows_priorities():
+    """ Samples are distributed across the actors proportionally to their priorities """
+    buffer = get_buffer_with_two_actors()
+
+    random.seed(0)
+    probs, indexes, tree_idxs = buffer.sample_batch_prioritized(300, history=4)
+
+    nt.assert_array_equal(indexes[:, 0], tree_idxs[:, 0])
+    t.assert_true((indexes[:, 1] < 14).all())
+    t.assert_almost_equal((indexes[:, 0] == 1).mean(), 2.0 / 3.0, delta=0.05)
+
+    for tree_idx in tree_idxs[indexes[:, 0] == 1]:
+        buffer.update_priority(tree_idx, 0.0)
+
+    # Most recent transition of the second actor is not available for sampling yet, still has the priority
+    t.assert_equal(buffer.total(), 15.0 + 2.0)
+
+    _, indexes, _ = buffer.sample_batch_prioritized(50, history=4)
+    t.assert_true((indexes[:, 0] == 0).all())
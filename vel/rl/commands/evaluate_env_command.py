@@ -7,14 +7,15 @@ import tqdm
 from vel.api import ModelConfig
 from vel.api.base import Storage, ModelFactory
 from vel.rl.api.base import EnvFactory
-from vel.openai.baselines.common.atari_wrappers import FrameStack
+from vel.rl.env.wrappers.buffered_frame_stack import BufferedFrameStack
+from vel.rl.env.wrappers.env_normalize import restore_normalization
 
 
 class EvaluateEnvCommand:
     """ Record environment playthrough as a game  """
     def __init__(self, model_config: ModelConfig, env_factory: EnvFactory, model_factory: ModelFactory,
                  storage: Storage, takes: int, frame_history: int,
-                 sample_args: dict = None):
+                 sample_args: dict = None, channels_first: bool = False):
         self.model_config = model_config
         self.model_factory = model_factory
         self.env_factory = env_factory
@@ -22,14 +23,19 @@ class EvaluateEnvCommand:
         self.takes = takes
         self.frame_history = frame_history
         self.sample_args = sample_args if sample_args is not None else {}
+        self.channels_first = channels_first
 
     def run(self):
         device = torch.device(self.model_config.device)
 
-        env = FrameStack(self.env_factory.instantiate(preset='raw'), self.frame_history)
+        env = self.env_factory.instantiate(preset='raw')
         model = self.model_factory.instantiate(action_space=env.action_space).to(device)
 
-        self.storage.resume_learning(model)
+        _, hidden_state = self.storage.resume_learning(model)
+
+        env = BufferedFrameStack(
+            restore_normalization(env, hidden_state), self.frame_history, channels_first=self.channels_first
+        )
 
         model.eval()
 
@@ -54,7 +60,7 @@ class EvaluateEnvCommand:
         print("Evaluating environment...")
 
         while True:
-            observation_array = np.expand_dims(np.array(observation), axis=0)
+            observation_array = np.expand_dims(observation, axis=0)
             observation_tensor = torch.from_numpy(observation_array).to(device)
             actions = model.step(observation_tensor, **self.sample_args)['actions']
 
@@ -67,7 +73,7 @@ class EvaluateEnvCommand:
                 return epinfo['episode']
 
 
-def create(model_config, model, env, storage, takes, frame_history, sample_args=None):
+def create(model_config, model, env, storage, takes, frame_history, sample_args=None, channels_first=False):
     return EvaluateEnvCommand(
         model_config=model_config,
         model_factory=model,
@@ -75,5 +81,6 @@ def create(model_config, model, env, storage, takes, frame_history, sample_args=
         storage=storage,
         frame_history=frame_history,
         takes=takes,
-        sample_args=sample_args
+        sample_args=sample_args,
+        channels_first=channels_first
     )
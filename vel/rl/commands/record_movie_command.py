@@ -10,14 +10,15 @@ import typing
 from vel.api import ModelConfig
 from vel.api.base import Storage, ModelFactory
 from vel.rl.api.base import EnvFactory
-from vel.openai.baselines.common.atari_wrappers import FrameStack
+from vel.rl.env.wrappers.buffered_frame_stack import BufferedFrameStack
+from vel.rl.env.wrappers.env_normalize import restore_normalization
 
 
 class RecordMovieCommand:
     """ Record environment playthrough as a game  """
     def __init__(self, model_config: ModelConfig, env_factory: EnvFactory, model_factory: ModelFactory,
                  storage: Storage, videoname: str, takes: int, frame_history: typing.Optional[int],
-                 fps: int, sample_args: typing.Optional[dict] = None):
+                 fps: int, sample_args: typing.Optional[dict] = None, channels_first: bool = False):
         self.model_config = model_config
         self.model_factory = model_factory
         self.env_factory = env_factory
@@ -27,18 +28,20 @@ class RecordMovieCommand:
         self.frame_history = frame_history
         self.sample_args = sample_args if sample_args is not None else {}
         self.fps = fps
+        self.channels_first = channels_first
 
     def run(self):
         device = torch.device(self.model_config.device)
 
         env = self.env_factory.instantiate(preset='raw')
+        model = self.model_factory.instantiate(action_space=env.action_space).to(device)
 
-        if self.frame_history:
-            env = FrameStack(env, self.frame_history)
+        _, hidden_state = self.storage.resume_learning(model)
 
-        model = self.model_factory.instantiate(action_space=env.action_space).to(device)
+        env = restore_normalization(env, hidden_state)
 
-        self.storage.resume_learning(model)
+        if self.frame_history:
+            env = BufferedFrameStack(env, self.frame_history, channels_first=self.channels_first)
 
         model.eval()
 
@@ -56,7 +59,7 @@ class RecordMovieCommand:
         print("Evaluating environment...")
 
         while True:
-            observation_array = np.expand_dims(np.array(observation), axis=0)
+            observation_array = np.expand_dims(observation, axis=0)
             observation_tensor = torch.from_numpy(observation_array).to(device)
             actions = model.step(observation_tensor, **self.sample_args)['actions']
             actions = actions.detach().cpu().numpy()
@@ -82,7 +85,8 @@ class RecordMovieCommand:
         print(f"Written {takename}")
 
 
-def create(model_config, model, env, storage, takes, videoname, frame_history=None, fps=30, sample_args=None):
+def create(model_config, model, env, storage, takes, videoname, frame_history=None, fps=30, sample_args=None,
+           channels_first=False):
     return RecordMovieCommand(
         model_config=model_config,
         model_factory=model,
@@ -92,5 +96,6 @@ def create(model_config, model, env, storage, takes, videoname, frame_history=No
         frame_history=frame_history,
         takes=takes,
         fps=fps,
-        sample_args=sample_args
+        sample_args=sample_args,
+        channels_first=channels_first
     )
@@ -75,7 +75,7 @@ class RlTrainCommand:
             if self.openai_logging:
                 self._openai_logging(epoch_info.result)
 
-            self.storage.checkpoint(epoch_info, reinforcer.model)
+            self.storage.checkpoint(epoch_info, reinforcer.model, state_dict=reinforcer.state_dict())
 
             global_epoch_idx += 1
 
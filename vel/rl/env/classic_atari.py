@@ -53,8 +53,11 @@ def env_maker(environment_id):
 
 def wrapped_env_maker(environment_id, seed, serial_id, disable_reward_clipping=False, disable_episodic_life=False,
                       monitor=False, allow_early_resets=False, scale_float_frames=False,
-                      max_episode_frames=10000, frame_stack=None):
-    """ Wrap atari environment so that it's nicer to learn RL algorithms """
+                      max_episode_frames=10000, frame_stack=None, channels_first=False):
+    """
+    Wrap atari environment so that it's nicer to learn RL algorithms.
+    With `channels_first` frames are returned in (channels, height, width) layout.
+    """
     env = env_maker(environment_id)
     env.seed(seed + serial_id)
 
@@ -82,7 +85,7 @@ def wrapped_env_maker(environment_id, seed, serial_id, disable_reward_clipping=F
             env = FireResetEnv(env)
 
     # Warp frames to 84x84 as done in the Nature paper and later work.
-    env = WarpFrame(env)
+    env = WarpFrame(env, channels_first=channels_first)
 
     if scale_float_frames:
         env = ScaledFloatFrame(env)
@@ -92,15 +95,16 @@ def wrapped_env_maker(environment_id, seed, serial_id, disable_reward_clipping=F
         env = ClipRewardEnv(env)
 
     if frame_stack is not None:
-        env = FrameStack(env, frame_stack)
+        env = FrameStack(env, frame_stack, channels_first=channels_first)
 
     return env
 
 
 class ClassicAtariEnv(EnvFactory):
     """ Atari game environment wrapped in the same way as Deep Mind and OpenAI baselines """
-    def __init__(self, envname, env_settings=None):
+    def __init__(self, envname, env_settings=None, channels_first=False):
         self.envname = envname
+        self.channels_first = channels_first
 
         env_settings = env_settings if env_settings is not None else {}
         env_keys = set(DEFAULT_SETTINGS.keys()).union(set(env_settings.keys()))
@@ -129,8 +133,8 @@ class ClassicAtariEnv(EnvFactory):
     def instantiate(self, seed=0, serial_id=0, preset='default') -> gym.Env:
         """ Make a single environment compatible with the experiments """
         settings = self.get_preset(preset)
-        return wrapped_env_maker(self.envname, seed, serial_id, **settings)
+        return wrapped_env_maker(self.envname, seed, serial_id, channels_first=self.channels_first, **settings)
 
 
-def create(game, env_settings=None):
-    return ClassicAtariEnv(game, env_settings)
+def create(game, env_settings=None, channels_first=False):
+    return ClassicAtariEnv(game, env_settings, channels_first=channels_first)
@@ -0,0 +1,164 @@
+import gym
+import numpy as np
+import os.path
+import time
+
+from gym.envs.registration import EnvSpec
+
+from vel.exceptions import VelException
+from vel.openai.baselines import logger
+from vel.openai.baselines.bench import Monitor
+from vel.rl.api.base import EnvFactory
+
+
+DEFAULT_SETTINGS = {
+    'default': {
+        'monitor': False,
+        'allow_early_resets': False,
+    },
+    'raw': {
+        'monitor': False,
+        'allow_early_resets': True,
+    }
+}
+
+
+class SyntheticEnv(gym.Env):
+    """
+    Deterministic synthetic environment for throughput benchmarking.
+
+    Observations are cycled from a small pool of pregenerated frames, so that producing them costs next to nothing.
+    Cost of the real environment step can be simulated by busy-waiting for `step_cost` seconds.
+    Episode lengths are drawn from a configurable distribution with a given mean.
+    """
+
+    DISTRIBUTIONS = ('constant', 'uniform', 'geometric')
+
+    def __init__(self, observation_space: gym.spaces.Box, action_space: gym.Space, reward_function,
+                 step_cost=0.0, episode_length=1000, episode_length_distribution='constant',
+                 frame_pool_size=32, seed=0):
+        if episode_length_distribution not in self.DISTRIBUTIONS:
+            raise VelException(f"Unknown episode length distribution: {episode_length_distribution}")
+
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.reward_function = reward_function
+
+        self.step_cost = step_cost
+        self.episode_length = episode_length
+        self.episode_length_distribution = episode_length_distribution
+        self.frame_pool_size = frame_pool_size
+
+        self.current_step = 0
+        self.current_episode_length = 0
+
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """ Reseed random number generator and regenerate the frame pool """
+        self.random = np.random.RandomState(seed)
+
+        space = self.observation_space
+
+        if np.issubdtype(space.dtype, np.integer):
+            frames = self.random.randint(
+                space.low.min(), int(space.high.max()) + 1, size=(self.frame_pool_size,) + space.shape
+            )
+        else:
+            frames = self.random.normal(size=(self.frame_pool_size,) + space.shape)
+
+        self.frame_pool = frames.astype(space.dtype)
+
+        return [seed]
+
+    def reset(self):
+        self.current_step = 0
+        self.current_episode_length = self._sample_episode_length()
+        return self._observation()
+
+    def step(self, action):
+        if self.step_cost > 0:
+            deadline = time.perf_counter() + self.step_cost
+
+            while time.perf_counter() < deadline:
+                pass
+
+        self.current_step += 1
+
+        reward = self.reward_function(self.random, action)
+        done = self.current_step >= self.current_episode_length
+
+        return self._observation(), reward, done, {}
+
+    def render(self, mode='human'):
+        frame = self._observation()
+
+        if mode == 'rgb_array' and frame.dtype == np.uint8 and frame.ndim == 3:
+            return np.repeat(frame[..., -1:], 3, axis=-1)
+        else:
+            return super().render(mode=mode)
+
+    def _observation(self):
+        return self.frame_pool[self.current_step % self.frame_pool_size]
+
+    def _sample_episode_length(self):
+        """ Draw length of the next episode """
+        if self.episode_length_distribution == 'constant':
+            return self.episode_length
+        elif self.episode_length_distribution == 'uniform':
+            return self.random.randint(max(self.episode_length // 2, 1), self.episode_length * 3 // 2 + 1)
+        else:
+            return self.random.geometric(1.0 / self.episode_length)
+
+
+class SyntheticEnvFactory(EnvFactory):
+    """ Base factory of synthetic environments, wrapped in the same way as the real ones """
+    ENV_ID = None
+
+    def __init__(self, step_cost=0.0, episode_length=1000, episode_length_distribution='constant',
+                 env_settings=None):
+        self.step_cost = step_cost
+        self.episode_length = episode_length
+        self.episode_length_distribution = episode_length_distribution
+
+        env_settings = env_settings if env_settings is not None else {}
+        env_keys = set(DEFAULT_SETTINGS.keys()).union(set(env_settings.keys()))
+
+        self.presets = {}
+
+        for key in env_keys:
+            self.presets[key] = env_settings.get(key, {})
+
+    def specification(self) -> EnvSpec:
+        """ Return environment specification """
+        return EnvSpec(self.ENV_ID, entry_point=None)
+
+    def get_preset(self, preset_key='default') -> dict:
+        """ Get env settings for given preset """
+        current_settings = DEFAULT_SETTINGS.get(preset_key, {}).copy()
+
+        if 'all' in self.presets:
+            current_settings.update(self.presets['all'])
+
+        # Key must be present in presets
+        current_settings.update(self.presets[preset_key])
+
+        return current_settings
+
+    def instantiate(self, seed=0, serial_id=0, preset='default') -> gym.Env:
+        """ Make a single environment compatible with the experiments """
+        settings = self.get_preset(preset)
+
+        env = self.instantiate_raw(seed + serial_id)
+
+        # Monitoring the env
+        if settings['monitor']:
+            logdir = logger.get_dir() and os.path.join(logger.get_dir(), str(serial_id))
+        else:
+            logdir = None
+
+        return Monitor(env, logdir, allow_early_resets=settings['allow_early_resets'])
+
+    def instantiate_raw(self, seed) -> SyntheticEnv:
+        """ Make a synthetic environment without any wrappers """
+        raise NotImplementedError
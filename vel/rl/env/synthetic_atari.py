@@ -0,0 +1,56 @@
+import gym
+import numpy as np
+
+from vel.rl.env.synthetic import SyntheticEnv, SyntheticEnvFactory
+
+
+def sparse_reward(random, action):
+    """ Atari-like sparse reward, clipped to {0, 1} """
+    return float(random.rand() < 0.05)
+
+
+class SyntheticAtariEnv(SyntheticEnvFactory):
+    """
+    Fake Atari game producing frames in the same format as the wrapped classic Atari environments.
+    Observation shape is given as (height, width, channels), frames are transposed if `channels_first` is set.
+    """
+    ENV_ID = 'SyntheticAtari-v0'
+
+    def __init__(self, observation_shape=(84, 84, 1), num_actions=4, step_cost=0.0, episode_length=1000,
+                 episode_length_distribution='constant', env_settings=None, channels_first=False):
+        super().__init__(
+            step_cost=step_cost, episode_length=episode_length,
+            episode_length_distribution=episode_length_distribution, env_settings=env_settings
+        )
+
+        if channels_first:
+            self.observation_shape = (observation_shape[-1],) + tuple(observation_shape[:-1])
+        else:
+            self.observation_shape = tuple(observation_shape)
+
+        self.num_actions = num_actions
+
+    def instantiate_raw(self, seed) -> SyntheticEnv:
+        """ Make a synthetic environment without any wrappers """
+        return SyntheticEnv(
+            observation_space=gym.spaces.Box(low=0, high=255, shape=self.observation_shape, dtype=np.uint8),
+            action_space=gym.spaces.Discrete(self.num_actions),
+            reward_function=sparse_reward,
+            step_cost=self.step_cost,
+            episode_length=self.episode_length,
+            episode_length_distribution=self.episode_length_distribution,
+            seed=seed
+        )
+
+
+def create(observation_shape=(84, 84, 1), num_actions=4, step_cost=0.0, episode_length=1000,
+           episode_length_distribution='constant', env_settings=None, channels_first=False):
+    return SyntheticAtariEnv(
+        observation_shape=observation_shape,
+        num_actions=num_actions,
+        step_cost=step_cost,
+        episode_length=episode_length,
+        episode_length_distribution=episode_length_distribution,
+        env_settings=env_settings,
+        channels_first=channels_first
+    )
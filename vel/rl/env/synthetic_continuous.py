@@ -0,0 +1,48 @@
+import gym
+import numpy as np
+
+from vel.rl.env.synthetic import SyntheticEnv, SyntheticEnvFactory
+
+
+def control_cost_reward(random, action):
+    """ Dense reward penalizing the size of the action, as in the MuJoCo control cost """
+    return 1.0 - 0.1 * float(np.sum(np.square(action)))
+
+
+class SyntheticContinuousEnv(SyntheticEnvFactory):
+    """ Fake continuous control environment producing observations in the same format as MuJoCo environments """
+    ENV_ID = 'SyntheticContinuous-v0'
+
+    def __init__(self, observation_shape=(17,), action_dim=6, step_cost=0.0, episode_length=1000,
+                 episode_length_distribution='constant', env_settings=None):
+        super().__init__(
+            step_cost=step_cost, episode_length=episode_length,
+            episode_length_distribution=episode_length_distribution, env_settings=env_settings
+        )
+
+        self.observation_shape = tuple(observation_shape)
+        self.action_dim = action_dim
+
+    def instantiate_raw(self, seed) -> SyntheticEnv:
+        """ Make a synthetic environment without any wrappers """
+        return SyntheticEnv(
+            observation_space=gym.spaces.Box(low=-np.inf, high=np.inf, shape=self.observation_shape, dtype=np.float64),
+            action_space=gym.spaces.Box(low=-1.0, high=1.0, shape=(self.action_dim,), dtype=np.float32),
+            reward_function=control_cost_reward,
+            step_cost=self.step_cost,
+            episode_length=self.episode_length,
+            episode_length_distribution=self.episode_length_distribution,
+            seed=seed
+        )
+
+
+def create(observation_shape=(17,), action_dim=6, step_cost=0.0, episode_length=1000,
+           episode_length_distribution='constant', env_settings=None):
+    return SyntheticContinuousEnv(
+        observation_shape=observation_shape,
+        action_dim=action_dim,
+        step_cost=step_cost,
+        episode_length=episode_length,
+        episode_length_distribution=episode_length_distribution,
+        env_settings=env_settings
+    )
@@ -0,0 +1,51 @@
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+
+from vel.rl.env.synthetic_atari import SyntheticAtariEnv
+from vel.rl.env.synthetic_continuous import SyntheticContinuousEnv
+
+
+def test_synthetic_atari_is_deterministic():
+    """ Environments seeded the same way produce the same frames and rewards """
+    env_a = SyntheticAtariEnv(episode_length=10).instantiate_raw(seed=5)
+    env_b = SyntheticAtariEnv(episode_length=10).instantiate_raw(seed=5)
+
+    obs_a, obs_b = env_a.reset(), env_b.reset()
+
+    t.assert_equal(obs_a.shape, (84, 84, 1))
+    t.assert_equal(obs_a.dtype, np.uint8)
+    nt.assert_array_equal(obs_a, obs_b)
+
+    for i in range(10):
+        obs_a, reward_a, done_a, _ = env_a.step(0)
+        obs_b, reward_b, done_b, _ = env_b.step(0)
+
+        nt.assert_array_equal(obs_a, obs_b)
+        t.assert_equal(reward_a, reward_b)
+        t.assert_equal(done_a, i == 9)
+
+
+def test_synthetic_continuous_episode_lengths():
+    """ Episode lengths follow the configured distribution """
+    env = SyntheticContinuousEnv(
+        observation_shape=(3,), action_dim=2, episode_length=20, episode_length_distribution='uniform'
+    ).instantiate_raw(seed=0)
+
+    t.assert_equal(env.reset().shape, (3,))
+
+    lengths = []
+
+    for _ in range(50):
+        env.reset()
+        length, done = 0, False
+
+        while not done:
+            _, _, done, _ = env.step(np.zeros(2))
+            length += 1
+
+        lengths.append(length)
+
+    t.assert_true(min(lengths) >= 10)
+    t.assert_true(max(lengths) <= 30)
+    t.assert_true(len(set(lengths)) > 1)
@@ -0,0 +1,79 @@
+import gym
+import gym.spaces as spaces
+import numpy as np
+
+
+class BufferedFrameStack(gym.Wrapper):
+    """
+    Stack k last frames along the channel axis - last one, or first one if `channels_first` is set - without any
+    concatenation.
+
+    Frames are written into a preallocated circular buffer of length 2k, each frame twice, k positions apart.
+    That way k most recent frames are always a slice of the buffer and each observation is a view of it.
+    With `channels_first` the view is contiguous in memory, with channels last it is strided - frame slots
+    interleave for every pixel.
+
+    Observation returned is only valid until the next call to `step` or `reset`, copy it if you want to keep it.
+    """
+
+    def __init__(self, env, k, channels_first: bool=False):
+        super().__init__(env)
+
+        self.k = k
+        self.position = 0
+        self.channels_first = channels_first
+
+        shape = env.observation_space.shape
+        dtype = env.observation_space.dtype
+
+        if self.channels_first:
+            # Frame index is the first axis, so that the slice of k frames can be viewed as (k * channels, ...)
+            self.frame_shape = shape[1:]
+            self.channels = shape[0]
+            self.buffer = np.zeros((2 * k, self.channels) + self.frame_shape, dtype=dtype)
+            self.stack_axis = 0
+        else:
+            # Frame index is the next to last axis, so that the slice of k frames can be viewed as (..., k * channels)
+            self.frame_shape = shape[:-1]
+            self.channels = shape[-1]
+            self.buffer = np.zeros(self.frame_shape + (2 * k, self.channels), dtype=dtype)
+            self.stack_axis = -2
+
+        channel_axis = 0 if self.channels_first else -1
+
+        self.observation_space = spaces.Box(
+            low=np.repeat(env.observation_space.low, k, axis=channel_axis),
+            high=np.repeat(env.observation_space.high, k, axis=channel_axis),
+            dtype=dtype
+        )
+
+    def reset(self, **kwargs):
+        ob = self.env.reset(**kwargs)
+        self.buffer[...] = np.expand_dims(ob, axis=self.stack_axis)
+        self.position = 0
+        return self._observation()
+
+    def step(self, action):
+        ob, reward, done, info = self.env.step(action)
+
+        self.position = (self.position + 1) % self.k
+        self._frame(self.position)[...] = ob
+        self._frame(self.position + self.k)[...] = ob
+
+        return self._observation(), reward, done, info
+
+    def _frame(self, index):
+        """ View of a single frame slot of the buffer """
+        if self.channels_first:
+            return self.buffer[index]
+        else:
+            return self.buffer[..., index, :]
+
+    def _observation(self):
+        """ View of the k most recent frames, oldest first """
+        start = self.position + 1
+
+        if self.channels_first:
+            return self.buffer[start:start + self.k].reshape((self.k * self.channels,) + self.frame_shape)
+        else:
+            return self.buffer[..., start:start + self.k, :].reshape(self.frame_shape + (self.k * self.channels,))
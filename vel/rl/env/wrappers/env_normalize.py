@@ -1,7 +1,8 @@
 import gym
 import numpy as np
 
-from vel.openai.baselines.common.running_mean_std import RunningMeanStd
+from vel.math.normalization import RunningNormalizer
+from vel.openai.baselines.common.vec_env.vec_normalize import VecNormalize
 
 
 class EnvNormalize(gym.Wrapper):
@@ -9,16 +10,21 @@ class EnvNormalize(gym.Wrapper):
     Single environment normalization based on VecNormalize from OpenAI baselines
     """
     def __init__(self, env, normalize_observations=True, normalize_returns=True,
-                 clip_observations=10., clip_rewards=10., gamma=0.99, epsilon=1e-8):
+                 clip_observations=10., clip_rewards=10., gamma=0.99, epsilon=1e-8, update_frequency=1):
         super().__init__(env)
 
-        self.ob_rms = RunningMeanStd(shape=self.observation_space.shape) if normalize_observations else None
-        self.ret_rms = RunningMeanStd(shape=()) if normalize_returns else None
-        self.clipob = clip_observations
-        self.cliprew = clip_rewards
-        self.ret = 0.0
+        self.ob_rms = RunningNormalizer(
+            shape=self.observation_space.shape, clip=clip_observations, epsilon=epsilon,
+            update_frequency=update_frequency
+        ) if normalize_observations else None
+
+        self.ret_rms = RunningNormalizer(
+            shape=(), clip=clip_rewards, epsilon=epsilon, update_frequency=update_frequency
+        ) if normalize_returns else None
+
+        self.ret = np.zeros(1)
         self.gamma = gamma
-        self.epsilon = epsilon
+        self.training = True
 
     def step(self, action):
         """
@@ -29,22 +35,23 @@ class EnvNormalize(gym.Wrapper):
         """
         obs, rews, news, infos = self.env.step(action)
 
-        self.ret = self.ret * self.gamma + rews
+        self.ret *= self.gamma
+        self.ret += rews
 
         obs = self._filter_observation(obs)
 
         if self.ret_rms:
-            self.ret_rms.update(self.ret)
-            rews = np.clip(rews / np.sqrt(self.ret_rms.var + self.epsilon), -self.cliprew, self.cliprew)
+            if self.training:
+                self.ret_rms.update(self.ret)
+            rews = self.ret_rms.scale(rews)
 
         return obs, rews, news, infos
 
     def _filter_observation(self, obs):
         if self.ob_rms:
-            self.ob_rms.update(obs)
-            obs = np.clip((obs - self.ob_rms.mean) / np.sqrt(self.ob_rms.var + self.epsilon), -self.clipob, self.clipob)
-
-            return obs.astype(np.float32)
+            if self.training:
+                self.ob_rms.update(np.expand_dims(obs, axis=0))
+            return self.ob_rms.normalize(obs)
         else:
             return obs
 
@@ -54,3 +61,62 @@ class EnvNormalize(gym.Wrapper):
         """
         obs = self.env.reset()
         return self._filter_observation(obs)
+
+    def state_dict(self):
+        """ Normalization statistics to be stored in the checkpoint """
+        return {
+            'ob_rms': self.ob_rms.state_dict() if self.ob_rms else None,
+            'ret_rms': self.ret_rms.state_dict() if self.ret_rms else None,
+        }
+
+    def load_state_dict(self, state_dict):
+        """ Restore normalization statistics from the checkpoint """
+        if self.ob_rms and state_dict.get('ob_rms') is not None:
+            self.ob_rms.load_state_dict(state_dict['ob_rms'])
+        if self.ret_rms and state_dict.get('ret_rms') is not None:
+            self.ret_rms.load_state_dict(state_dict['ret_rms'])
+
+
+def find_normalization(environment):
+    """ Find normalization wrapper in the chain of environment wrappers, if there is any """
+    while environment is not None:
+        if isinstance(environment, (VecNormalize, EnvNormalize)):
+            return environment
+
+        if hasattr(environment, 'venv'):
+            environment = environment.venv
+        elif isinstance(environment, gym.Wrapper):
+            environment = environment.env
+        else:
+            environment = None
+
+    return None
+
+
+def environment_state_dict(environment) -> dict:
+    """ State of the environment normalization to be stored in the checkpoint hidden state """
+    normalization = find_normalization(environment)
+
+    if normalization is None:
+        return {}
+    else:
+        return {'normalization': normalization.state_dict()}
+
+
+def restore_normalization(env, hidden_state):
+    """ Wrap single environment with normalization stored in the checkpoint hidden state, if there is any """
+    if hidden_state is None or 'normalization' not in hidden_state.get('environment', {}):
+        return env
+
+    state_dict = hidden_state['environment']['normalization']
+
+    env = EnvNormalize(
+        env,
+        normalize_observations=state_dict['ob_rms'] is not None,
+        normalize_returns=state_dict['ret_rms'] is not None
+    )
+
+    env.load_state_dict(state_dict)
+    env.training = False
+
+    return env
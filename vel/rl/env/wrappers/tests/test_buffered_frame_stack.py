@@ -0,0 +1,90 @@
+import collections
+
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+
+from vel.rl.env.wrappers.buffered_frame_stack import BufferedFrameStack
+
+
+class CountingEnv(gym.Env):
+    """ Environment whose observation is filled with the number of steps taken """
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(2, 2, 2), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(2)
+
+    def __init__(self):
+        self.counter = 0
+
+    def reset(self):
+        self.counter = 0
+        return self._observation()
+
+    def step(self, action):
+        self.counter += 1
+        return self._observation(), 0.0, False, {}
+
+    def _observation(self):
+        ob = np.full((2, 2, 2), self.counter, dtype=np.uint8)
+        ob[..., 1] += 100
+        return ob
+
+
+def test_matches_concatenated_frames():
+    """ Check that stacked observations are equal to concatenated k last frames """
+    env = BufferedFrameStack(CountingEnv(), 3)
+    reference = collections.deque(maxlen=3)
+
+    t.assert_equal(env.observation_space.shape, (2, 2, 6))
+
+    ob = env.reset()
+
+    for _ in range(3):
+        reference.append(np.full((2, 2, 2), 0, dtype=np.uint8) + np.array([0, 100], dtype=np.uint8))
+
+    nt.assert_array_equal(ob, np.concatenate(reference, axis=-1))
+
+    for i in range(10):
+        ob, _, _, _ = env.step(0)
+        reference.append(np.full((2, 2, 2), i + 1, dtype=np.uint8) + np.array([0, 100], dtype=np.uint8))
+
+        t.assert_equal(ob.shape, (2, 2, 6))
+        nt.assert_array_equal(ob, np.concatenate(reference, axis=-1))
+
+
+def test_observation_is_a_view():
+    """ Check that observations share memory with the internal buffer """
+    env = BufferedFrameStack(CountingEnv(), 4)
+
+    ob = env.reset()
+    t.assert_true(np.shares_memory(ob, env.buffer))
+
+    for _ in range(5):
+        ob, _, _, _ = env.step(0)
+        t.assert_true(np.shares_memory(ob, env.buffer))
+
+
+class ChannelsFirstCountingEnv(CountingEnv):
+    """ Counting environment returning frames with the channel axis first """
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(2, 2, 2), dtype=np.uint8)
+
+    def _observation(self):
+        return np.ascontiguousarray(super()._observation().transpose(2, 0, 1))
+
+
+def test_channels_first_matches_transposed_frames():
+    """ Check that channels first stacked observations are contiguous transposed channels last ones """
+    env = BufferedFrameStack(ChannelsFirstCountingEnv(), 3, channels_first=True)
+    reference_env = BufferedFrameStack(CountingEnv(), 3)
+
+    t.assert_equal(env.observation_space.shape, (6, 2, 2))
+
+    ob, reference = env.reset(), reference_env.reset()
+
+    for _ in range(5):
+        t.assert_true(ob.flags['C_CONTIGUOUS'])
+        t.assert_true(np.shares_memory(ob, env.buffer))
+        nt.assert_array_equal(ob, reference.transpose(2, 0, 1))
+
+        ob, _, _, _ = env.step(0)
+        reference, _, _, _ = reference_env.step(0)
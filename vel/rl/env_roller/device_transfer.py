@@ -0,0 +1,51 @@
+import time
+
+import torch
+
+
+class DeviceTransfer:
+    """
+    Host-to-device copies of the rollout data, instrumented with the time spent on them.
+
+    Host buffers are allocated in page-locked memory when the target device is a GPU, so that the copies
+    can be performed asynchronously.
+    """
+
+    def __init__(self, device):
+        self.device = torch.device(device)
+        self.pin_memory = self.device.type == 'cuda'
+        self.seconds = 0.0
+
+    def host_buffer(self, shape, dtype) -> torch.Tensor:
+        """ Allocate a zeroed host buffer """
+        buffer = torch.zeros(shape, dtype=dtype)
+
+        if self.pin_memory:
+            buffer = buffer.pin_memory()
+
+        return buffer
+
+    def to_device(self, tensor: torch.Tensor) -> torch.Tensor:
+        """ Copy tensor to the device, returning the same tensor if it is already there """
+        start = time.perf_counter()
+        result = tensor.to(self.device, non_blocking=self.pin_memory)
+        self.seconds += time.perf_counter() - start
+        return result
+
+    def copy_(self, target: torch.Tensor, source: torch.Tensor) -> None:
+        """ Copy source into the target tensor in place """
+        start = time.perf_counter()
+        target.copy_(source, non_blocking=self.pin_memory)
+        self.seconds += time.perf_counter() - start
+
+    def synchronize(self) -> None:
+        """ Wait for queued asynchronous copies to finish, counting the time spent waiting """
+        if self.device.type == 'cuda':
+            start = time.perf_counter()
+            torch.cuda.synchronize(self.device)
+            self.seconds += time.perf_counter() - start
+
+    def reset(self) -> float:
+        """ Return time spent on transfers since the last reset and start counting from zero """
+        seconds, self.seconds = self.seconds, 0.0
+        return seconds
@@ -0,0 +1,224 @@
+import gym
+import numpy as np
+import time
+import torch
+
+from multiprocessing.connection import wait
+
+from vel.api.metrics import AveragingNamedMetric
+from vel.util.shared_weights import SharedWeights
+
+
+class InferenceClient:
+    """
+    Actor-side endpoint of the inference server, a drop-in replacement of `model.step`.
+    Observations and results travel through shared memory, the pipe only carries their number and a reply.
+    """
+
+    def __init__(self, connection, observations: torch.Tensor, outputs: dict):
+        self.connection = connection
+        self.observations = observations
+        self.outputs = outputs
+        self.version = None
+
+    def step(self, observations: torch.Tensor) -> dict:
+        """ Evaluate the policy on given observations in the server process """
+        rows = observations.shape[0]
+
+        self.observations[:rows].copy_(observations)
+        self.connection.send(rows)
+        self.version = self.connection.recv()
+
+        return {name: output[:rows].clone() for name, output in self.outputs.items()}
+
+
+class InferenceServer:
+    """
+    Process serving policy evaluations to many actor processes.
+
+    Requests are collected until they contain `max_batch_size` observations, all the clients are waiting, or
+    `timeout` seconds have passed since the first pending request. Then a single `model.step` is run over all of them
+    and the results are scattered back. Weights are hot-swapped whenever the learner publishes new ones.
+    """
+
+    # Quantiles of the batch size distribution reported in the statistics
+    QUANTILES = [0.1, 0.5, 0.9]
+
+    def __init__(self, context, shared_weights: SharedWeights, observation_space: gym.Space, clients: int,
+                 rows_per_client: int, max_batch_size: int, timeout: float, threads: int = None):
+        self.context = context
+        self.shared_weights = shared_weights
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self.threads = threads
+
+        observation_dtype = torch.from_numpy(np.zeros(0, dtype=observation_space.dtype)).dtype
+
+        # Discover the shapes of step outputs
+        with torch.no_grad():
+            sample_observation = torch.zeros((1,) + observation_space.shape, dtype=observation_dtype)
+            sample_step = shared_weights.model.step(sample_observation)
+
+        self.connections = []
+        self.clients = []
+
+        for _ in range(clients):
+            server_end, client_end = context.Pipe()
+
+            observations = torch.zeros((rows_per_client,) + observation_space.shape, dtype=observation_dtype)
+            outputs = {
+                name: torch.zeros((rows_per_client,) + value.shape[1:], dtype=value.dtype).share_memory_()
+                for name, value in sample_step.items()
+            }
+
+            self.connections.append(server_end)
+            self.clients.append(InferenceClient(client_end, observations.share_memory_(), outputs))
+
+        # Several requests may arrive at once, so the batch size is limited only by the number of clients
+        self.batch_size_histogram = context.Array('l', clients * rows_per_client, lock=False)
+        self.counters = context.Array('d', 3, lock=False)  # Number of requests, total wait, total busy time
+
+        self.stop_event = context.Event()
+        self.process = None
+
+        self.last_histogram = np.zeros(len(self.batch_size_histogram), dtype=np.int64)
+        self.last_counters = np.zeros(3)
+        self.last_statistics = {metric.name: 0.0 for metric in self.metrics()}
+
+    @classmethod
+    def metrics(cls) -> list:
+        """ List of metrics to track for this server """
+        return [
+            AveragingNamedMetric("inference_batch_size"),
+            AveragingNamedMetric("inference_wait_time"),
+            AveragingNamedMetric("inference_throughput"),
+        ] + [
+            AveragingNamedMetric(cls._quantile_name(quantile)) for quantile in cls.QUANTILES
+        ]
+
+    @staticmethod
+    def _quantile_name(quantile):
+        """ Name of the metric for given quantile of the batch size """
+        return 'inference_batch_size_p{:02d}'.format(int(quantile * 100))
+
+    def start(self):
+        """ Start the server process """
+        self.process = self.context.Process(target=self.serve, daemon=True)
+        self.process.start()
+
+    def is_alive(self) -> bool:
+        """ If the server process is running """
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self):
+        """ Stop the server process """
+        self.stop_event.set()
+        self.process.join(timeout=10.0)
+
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def serve(self):
+        """ Body of the server process """
+        if self.threads is not None:
+            torch.set_num_threads(self.threads)
+
+        model = self.shared_weights.local_copy()
+        model.eval()
+
+        version = None
+        client_for = dict(zip(self.connections, self.clients))
+        connections = list(self.connections)
+        pending = {}
+
+        with torch.no_grad():
+            while connections and not self.stop_event.is_set():
+                deadline = None
+
+                while len(pending) < len(connections):
+                    rows = sum(request_rows for request_rows, _ in pending.values())
+
+                    if rows >= self.max_batch_size:
+                        break
+
+                    if deadline is None:
+                        wait_time = 1.0
+                    else:
+                        wait_time = deadline - time.perf_counter()
+
+                        if wait_time <= 0.0:
+                            break
+
+                    for connection in wait([c for c in connections if c not in pending], timeout=wait_time):
+                        try:
+                            pending[connection] = (connection.recv(), time.perf_counter())
+                        except EOFError:
+                            connections.remove(connection)
+
+                    if deadline is None:
+                        if pending:
+                            deadline = time.perf_counter() + self.timeout
+                        elif self.stop_event.is_set():
+                            break
+
+                if not pending:
+                    continue
+
+                dispatch_start = time.perf_counter()
+                version = self.shared_weights.refresh(model, version)
+
+                requests = [(client_for[c], c, rows) for c, (rows, _) in pending.items()]
+
+                step = model.step(torch.cat([client.observations[:rows] for client, _, rows in requests]))
+
+                offset = 0
+
+                for client, _, rows in requests:
+                    for name, output in client.outputs.items():
+                        output[:rows].copy_(step[name][offset:offset + rows])
+
+                    offset += rows
+
+                # Statistics are updated before the replies, so that they are up to date when the clients proceed
+                self.batch_size_histogram[offset - 1] += 1
+                self.counters[0] += len(requests)
+                self.counters[1] += sum(dispatch_start - arrival for _, arrival in pending.values())
+                self.counters[2] += time.perf_counter() - dispatch_start
+
+                for _, connection, _ in requests:
+                    connection.send(version)
+
+                pending = {}
+
+    def statistics(self) -> dict:
+        """ Statistics of the batches served since the last call """
+        histogram = np.array(self.batch_size_histogram[:], dtype=np.int64)
+        counters = np.array(self.counters[:], dtype=np.float64)
+
+        batch_counts = histogram - self.last_histogram
+        requests, wait_time, busy_time = counters - self.last_counters
+
+        self.last_histogram, self.last_counters = histogram, counters
+
+        batches = batch_counts.sum()
+
+        # Nothing has been served in the meantime, repeat the previous values
+        if batches == 0:
+            return self.last_statistics
+
+        batch_sizes = np.arange(1, len(batch_counts) + 1)
+        cumulative = np.cumsum(batch_counts) / batches
+        rows = (batch_sizes * batch_counts).sum()
+
+        self.last_statistics = {
+            'inference_batch_size': rows / batches,
+            'inference_wait_time': wait_time / requests,
+            'inference_throughput': rows / busy_time if busy_time > 0 else 0.0,
+        }
+
+        for quantile in self.QUANTILES:
+            quantile_size = batch_sizes[np.searchsorted(cumulative, quantile)]
+            self.last_statistics[self._quantile_name(quantile)] = float(quantile_size)
+
+        return self.last_statistics
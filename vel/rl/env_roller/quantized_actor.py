@@ -0,0 +1,97 @@
+import copy
+import inspect
+import time
+
+import torch
+import torch.nn as nn
+
+from vel.api.base import Model
+from vel.api.metrics import AveragingNamedMetric
+from vel.exceptions import VelException
+
+try:
+    from torch.ao.quantization import quantize_dynamic
+except ImportError:
+    # Older versions of pytorch keep quantization in a different module
+    from torch.quantization import quantize_dynamic
+
+
+def greedy_actions(model: Model, observations: torch.Tensor) -> torch.Tensor:
+    """ Deterministic actions of the model - argmax of the policy or of the action values """
+    if 'argmax_sampling' in inspect.signature(model.step).parameters:
+        return model.step(observations, argmax_sampling=True)['actions']
+    else:
+        return model.step(observations)['actions']
+
+
+class QuantizedActor:
+    """
+    Dynamically quantized copy of the trained model, used for acting in the environment on the CPU.
+
+    Weights of the linear layers are stored in int8 and activations are quantized on the fly, the rest of the model
+    (convolutions included - dynamic quantization supports only linear and recurrent layers) stays in fp32.
+    Trained model is not modified. The copy is quantized again from the current weights every `frequency` rollouts.
+
+    Right after each quantization greedy actions of both models are computed for the same observations, to measure
+    how often they agree and how much faster the quantized copy is.
+    """
+
+    def __init__(self, device, frequency: int):
+        if torch.device(device).type != 'cpu':
+            raise VelException("Quantized actor can only run on the CPU")
+
+        self.frequency = frequency
+        self.rollouts = 0
+
+        self.model = None
+        self.measure = False
+
+        self.agreement = 1.0
+        self.speedup = 1.0
+
+    def refresh(self, model: Model) -> None:
+        """ Called once per rollout - quantize the model again if it's due """
+        if self.rollouts % self.frequency == 0:
+            self.model = quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+            self.measure = True
+
+        self.rollouts += 1
+
+    @torch.no_grad()
+    def step(self, model: Model, observations: torch.Tensor) -> dict:
+        """ Select actions with the quantized copy of the model """
+        if self.measure:
+            self._compare(model, observations)
+            self.measure = False
+
+        return self.model.step(observations)
+
+    @torch.no_grad()
+    def value(self, observations: torch.Tensor) -> torch.Tensor:
+        """ State values estimated by the quantized copy of the model """
+        return self.model.value(observations)
+
+    def _compare(self, model: Model, observations: torch.Tensor) -> None:
+        """ Compare greedy actions and evaluation time of the trained model and its quantized copy """
+        start = time.perf_counter()
+        reference_actions = greedy_actions(model, observations)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actions = greedy_actions(self.model, observations)
+        quantized_time = time.perf_counter() - start
+
+        self.agreement = (actions == reference_actions).float().mean().item()
+        self.speedup = reference_time / quantized_time
+
+    def write_state(self, batch_info) -> None:
+        """ Store latest measurements in the batch info """
+        batch_info['actor_agreement'] = self.agreement
+        batch_info['actor_speedup'] = self.speedup
+
+    def metrics(self) -> list:
+        """ List of metrics to track for the quantized actor """
+        return [
+            AveragingNamedMetric("actor_agreement"),
+            AveragingNamedMetric("actor_speedup"),
+        ]
@@ -5,6 +5,7 @@ from vel.api.base import Schedule
 from vel.api.metrics import AveragingNamedMetric
 from vel.rl.api.base import ReplayEnvRollerBase, ReplayEnvRollerFactory
 from vel.rl.buffers.deque_backend import DequeBufferBackend
+from vel.rl.env_roller.quantized_actor import QuantizedActor
 
 
 class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
@@ -17,7 +18,8 @@ class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
     """
 
     def __init__(self, environment, device, epsilon_schedule: Schedule, batch_size: int,
-                 buffer_capacity: int, buffer_initial_size: int, frame_stack: int):
+                 buffer_capacity: int, buffer_initial_size: int, frame_stack: int, channels_first: bool=False,
+                 actor_quantization_frequency: int=None):
         self.epsilon_schedule = epsilon_schedule
         self.batch_size = batch_size
         self.buffer_capacity = buffer_capacity
@@ -29,9 +31,16 @@ class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
         self.backend = DequeBufferBackend(
             buffer_capacity=self.buffer_capacity,
             observation_space=environment.observation_space,
-            action_space=environment.action_space
+            action_space=environment.action_space,
+            channels_first=channels_first
         )
 
+        # Acting with an int8 copy of the model, quantized again every that many environment steps
+        if actor_quantization_frequency is not None:
+            self.quantized_actor = QuantizedActor(self.device, actor_quantization_frequency)
+        else:
+            self.quantized_actor = None
+
         self.last_observation = self.environment.reset()
 
     @property
@@ -54,13 +63,19 @@ class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
         epsilon_value = self.epsilon_schedule.value(batch_info['progress'])
         batch_info['epsilon'] = epsilon_value
 
+        if self.quantized_actor is not None:
+            self.quantized_actor.refresh(model)
+
         last_observation = np.concatenate([
             self.backend.get_frame(self.backend.current_idx, self.frame_stack - 1),
             self.last_observation
-        ], axis=-1)
+        ], axis=self.backend.channel_axis)
 
         observation_tensor = torch.from_numpy(last_observation[None]).to(self.device)
-        step = model.step(observation_tensor)
+        step = self._step(model, observation_tensor)
+
+        if self.quantized_actor is not None:
+            self.quantized_actor.write_state(batch_info)
 
         epsgreedy_step = self.epsgreedy_action(step['actions'], epsilon_value)
         action = epsgreedy_step.item()
@@ -81,15 +96,37 @@ class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
             'value': step['values'][0]
         }
 
+    def _step(self, model, observations):
+        """ Evaluate the policy for given observations, with the quantized actor if there is one """
+        if self.quantized_actor is None:
+            return model.step(observations)
+        else:
+            return self.quantized_actor.step(model, observations)
+
     def metrics(self):
         """ List of metrics to track for this learning process """
-        return [
+        my_metrics = [
             AveragingNamedMetric("epsilon"),
         ]
 
+        if self.quantized_actor is not None:
+            my_metrics.extend(self.quantized_actor.metrics())
+
+        return my_metrics
+
     def sample(self, batch_info, model) -> dict:
         """ Sample experience from replay buffer and return a batch """
-        indexes = self.backend.sample_batch_uniform(self.batch_size, self.frame_stack)
+        return self._sample_batches(1)
+
+    def sample_rounds(self, batch_info, model, rounds: int) -> list:
+        """ Sample batches for a number of training rounds, assembled and transferred to the device at once """
+        return self._split_rounds(self._sample_batches(rounds), rounds)
+
+    def _sample_batches(self, rounds: int) -> dict:
+        """ Sample a number of batches, each drawn from the buffer independently, and merge them together """
+        indexes = np.concatenate([
+            self.backend.sample_batch_uniform(self.batch_size, self.frame_stack) for _ in range(rounds)
+        ])
         batch = self.backend.get_batch(indexes, self.frame_stack)
 
         observations = torch.from_numpy(batch['states']).to(self.device)
@@ -99,7 +136,7 @@ class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
         actions = torch.from_numpy(batch['actions']).to(self.device)
 
         return {
-            'size': self.batch_size,
+            'size': self.batch_size * rounds,
             'observations': observations,
             'observations+1': observations_plus1,
             'dones': dones,
@@ -112,23 +149,29 @@ class DequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
 class DequeReplayRollerEpsGreedyFactory(ReplayEnvRollerFactory):
     """ Factory class for DequeReplayQRoller """
     def __init__(self, epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int,
-                 frame_stack: int=1):
+                 frame_stack: int=1, channels_first: bool=False, actor_quantization_frequency: int=None):
         self.buffer_capacity = buffer_capacity
         self.epsilon_schedule = epsilon_schedule
         self.buffer_initial_size = buffer_initial_size
         self.frame_stack = frame_stack
+        self.channels_first = channels_first
+        self.actor_quantization_frequency = actor_quantization_frequency
 
     def instantiate(self, environment, device, settings) -> ReplayEnvRollerBase:
         return DequeReplayRollerEpsGreedy(
             environment, device, self.epsilon_schedule, settings.batch_size,
-            self.buffer_capacity, self.buffer_initial_size, self.frame_stack
+            self.buffer_capacity, self.buffer_initial_size, self.frame_stack, channels_first=self.channels_first,
+            actor_quantization_frequency=self.actor_quantization_frequency
         )
 
 
-def create(epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int, frame_stack: int=1):
+def create(epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int, frame_stack: int=1,
+           channels_first: bool=False, actor_quantization_frequency: int=None):
     return DequeReplayRollerEpsGreedyFactory(
         epsilon_schedule=epsilon_schedule,
         buffer_capacity=buffer_capacity,
         buffer_initial_size=buffer_initial_size,
-        frame_stack=frame_stack
+        frame_stack=frame_stack,
+        channels_first=channels_first,
+        actor_quantization_frequency=actor_quantization_frequency
     )
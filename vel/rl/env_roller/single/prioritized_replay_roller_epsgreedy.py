@@ -5,6 +5,7 @@ from vel.api.base import Schedule
 from vel.api.metrics import AveragingNamedMetric
 from vel.rl.api.base import ReplayEnvRollerBase, EnvRollerFactory
 from vel.rl.buffers.prioritized_backend import PrioritizedReplayBackend
+from vel.rl.env_roller.quantized_actor import QuantizedActor
 
 
 class PrioritizedReplayRollerEpsGreedy(ReplayEnvRollerBase):
@@ -18,7 +19,9 @@ class PrioritizedReplayRollerEpsGreedy(ReplayEnvRollerBase):
 
     def __init__(self, environment, device, epsilon_schedule: Schedule, batch_size: int,
                  buffer_capacity: int, buffer_initial_size: int, frame_stack: int,
-                 priority_exponent: float, priority_weight: Schedule, priority_epsilon: float):
+                 priority_exponent: float, priority_weight: Schedule, priority_epsilon: float,
+                 channels_first: bool=False,
+                 actor_quantization_frequency: int=None):
         self.epsilon_schedule = epsilon_schedule
 
         self.batch_size = batch_size
@@ -36,9 +39,16 @@ class PrioritizedReplayRollerEpsGreedy(ReplayEnvRollerBase):
         self.backend = PrioritizedReplayBackend(
             buffer_capacity=self.buffer_capacity,
             observation_space=environment.observation_space,
-            action_space=environment.action_space
+            action_space=environment.action_space,
+            channels_first=channels_first
         )
 
+        # Acting with an int8 copy of the model, quantized again every that many environment steps
+        if actor_quantization_frequency is not None:
+            self.quantized_actor = QuantizedActor(self.device, actor_quantization_frequency)
+        else:
+            self.quantized_actor = None
+
         self.last_observation = self.environment.reset()
 
     @property
@@ -61,14 +71,21 @@ class PrioritizedReplayRollerEpsGreedy(ReplayEnvRollerBase):
         epsilon_value = self.epsilon_schedule.value(batch_info['progress'])
         batch_info['epsilon'] = epsilon_value
 
+        if self.quantized_actor is not None:
+            self.quantized_actor.refresh(model)
+
         last_observation = np.concatenate([
             self.backend.get_frame(self.backend.current_idx, self.frame_stack - 1),
             self.last_observation
-        ], axis=-1)
+        ], axis=self.backend.channel_axis)
 
         observation_tensor = torch.from_numpy(last_observation[None]).to(self.device)
 
-        step = model.step(observation_tensor)
+        step = self._step(model, observation_tensor)
+
+        if self.quantized_actor is not None:
+            self.quantized_actor.write_state(batch_info)
+
         epsgreedy_step = self.epsgreedy_action(step['actions'], epsilon_value)
         action = epsgreedy_step.item()
 
@@ -89,24 +106,59 @@ class PrioritizedReplayRollerEpsGreedy(ReplayEnvRollerBase):
             'value': step['values'][0]
         }
 
+    def _step(self, model, observations):
+        """ Evaluate the policy for given observations, with the quantized actor if there is one """
+        if self.quantized_actor is None:
+            return model.step(observations)
+        else:
+            return self.quantized_actor.step(model, observations)
+
     def metrics(self):
         """ List of metrics to track for this learning process """
-        return [
+        my_metrics = [
             AveragingNamedMetric("epsilon"),
         ]
 
+        if self.quantized_actor is not None:
+            my_metrics.extend(self.quantized_actor.metrics())
+
+        return my_metrics
+
     def sample(self, batch_info, model) -> dict:
         """ Sample experience from replay buffer and return a batch """
-        probs, indexes, tree_idxs = self.backend.sample_batch_prioritized(self.batch_size, self.frame_stack)
-        batch = self.backend.get_batch(indexes, self.frame_stack)
+        return self._sample_batches(batch_info, 1)
 
-        # Normalize weights properly
-        priority_weight = self.priority_weight_schedule.value(batch_info['progress'])
+    def sample_rounds(self, batch_info, model, rounds: int) -> list:
+        """
+        Sample batches for a number of training rounds, assembled and transferred to the device at once.
 
-        probs = np.stack(probs) / self.backend.segment_tree.total()
+        All the batches are drawn before the first training round, therefore the priorities of the batch of round `k`
+        do not include the updates of the preceding `k` rounds. Updates themselves are still applied after each round.
+        """
+        return self._split_rounds(self._sample_batches(batch_info, rounds), rounds)
+
+    def _sample_batches(self, batch_info, rounds: int) -> dict:
+        """ Sample a number of batches, each drawn from the buffer independently, and merge them together """
+        priority_weight = self.priority_weight_schedule.value(batch_info['progress'])
         capacity = self.backend.deque.current_size
-        weights = (capacity * probs) ** (-priority_weight)
-        weights = weights / weights.max()
+
+        all_indexes, all_weights, all_tree_idxs = [], [], []
+
+        for _ in range(rounds):
+            probs, indexes, tree_idxs = self.backend.sample_batch_prioritized(self.batch_size, self.frame_stack)
+
+            # Normalize weights properly
+            probs = np.stack(probs) / self.backend.segment_tree.total()
+            weights = (capacity * probs) ** (-priority_weight)
+            weights = weights / weights.max()
+
+            all_indexes.append(indexes)
+            all_weights.append(weights)
+            all_tree_idxs.extend(tree_idxs)
+
+        indexes, weights, tree_idxs = np.concatenate(all_indexes), np.concatenate(all_weights), all_tree_idxs
+
+        batch = self.backend.get_batch(indexes, self.frame_stack)
 
         observations = torch.from_numpy(batch['states']).to(self.device)
         observations_plus1 = torch.from_numpy(batch['states+1']).to(self.device)
@@ -116,7 +168,7 @@ class PrioritizedReplayRollerEpsGreedy(ReplayEnvRollerBase):
         weights = torch.from_numpy(weights.astype(np.float32)).to(self.device)
 
         return {
-            'size': self.batch_size,
+            'size': self.batch_size * rounds,
             'observations': observations,
             'observations+1': observations_plus1,
             'dones': dones,
@@ -140,7 +192,8 @@ class PrioritizedReplayRollerEpsGreedyFactory(EnvRollerFactory):
     """ Factory class for PrioritizedReplayQRoller """
 
     def __init__(self, epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int,
-                 frame_stack: int, priority_exponent: float, priority_weight: Schedule, priority_epsilon: float):
+                 frame_stack: int, priority_exponent: float, priority_weight: Schedule, priority_epsilon: float,
+                 channels_first: bool=False, actor_quantization_frequency: int=None):
         self.epsilon_schedule = epsilon_schedule
         self.buffer_capacity = buffer_capacity
         self.buffer_initial_size = buffer_initial_size
@@ -148,6 +201,8 @@ class PrioritizedReplayRollerEpsGreedyFactory(EnvRollerFactory):
         self.priority_exponent = priority_exponent
         self.priority_weight = priority_weight
         self.priority_epsilon = priority_epsilon
+        self.channels_first = channels_first
+        self.actor_quantization_frequency = actor_quantization_frequency
 
     def instantiate(self, environment, device, settings):
         return PrioritizedReplayRollerEpsGreedy(
@@ -160,12 +215,15 @@ class PrioritizedReplayRollerEpsGreedyFactory(EnvRollerFactory):
             frame_stack=self.frame_stack,
             priority_exponent=self.priority_exponent,
             priority_weight=self.priority_weight,
-            priority_epsilon=self.priority_epsilon
+            priority_epsilon=self.priority_epsilon,
+            channels_first=self.channels_first,
+            actor_quantization_frequency=self.actor_quantization_frequency
         )
 
 
 def create(epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int, frame_stack: int,
-           priority_exponent: float, priority_weight: Schedule, priority_epsilon: float):
+           priority_exponent: float, priority_weight: Schedule, priority_epsilon: float, channels_first: bool=False,
+           actor_quantization_frequency: int=None):
     return PrioritizedReplayRollerEpsGreedyFactory(
         epsilon_schedule=epsilon_schedule,
         buffer_capacity=buffer_capacity,
@@ -173,5 +231,7 @@ def create(epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size
         frame_stack=frame_stack,
         priority_exponent=priority_exponent,
         priority_weight=priority_weight,
-        priority_epsilon=priority_epsilon
+        priority_epsilon=priority_epsilon,
+        channels_first=channels_first,
+        actor_quantization_frequency=actor_quantization_frequency
     )
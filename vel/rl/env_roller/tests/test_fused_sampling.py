@@ -0,0 +1,49 @@
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+from vel.rl.env_roller.single.deque_replay_roller_epsgreedy import DequeReplayRollerEpsGreedy
+from vel.schedules.constant import ConstantSchedule
+
+
+class FrameEnvironment:
+    """ Minimal environment providing spaces and the initial observation """
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(2, 2, 1), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(3)
+
+    def reset(self):
+        return np.zeros((2, 2, 1), dtype=np.uint8)
+
+
+def get_filled_roller():
+    """ Return roller with a buffer filled with numbered frames """
+    roller = DequeReplayRollerEpsGreedy(
+        FrameEnvironment(), torch.device('cpu'), ConstantSchedule(0.1), batch_size=4,
+        buffer_capacity=30, buffer_initial_size=10, frame_stack=2
+    )
+
+    for i in range(20):
+        roller.backend.store_transition(np.full((2, 2, 1), i, dtype=np.uint8), i % 3, float(i), i % 7 == 6)
+
+    return roller
+
+
+def test_fused_rounds_equal_separate_samples():
+    """ Batches sampled for a few rounds at once are the same as batches sampled one by one """
+    roller = get_filled_roller()
+
+    np.random.seed(0)
+    separate = [roller.sample(None, None) for _ in range(3)]
+
+    np.random.seed(0)
+    fused = roller.sample_rounds(None, None, 3)
+
+    t.assert_equal(len(fused), 3)
+
+    for separate_batch, fused_batch in zip(separate, fused):
+        t.assert_equal(fused_batch['size'], 4)
+
+        for name in ['observations', 'observations+1', 'dones', 'rewards', 'actions', 'weights']:
+            nt.assert_array_equal(fused_batch[name].numpy(), separate_batch[name].numpy())
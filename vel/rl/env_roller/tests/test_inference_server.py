@@ -0,0 +1,57 @@
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import threading
+import torch
+import torch.multiprocessing as mp
+
+import vel.rl.models.backbone.mlp as mlp
+import vel.rl.models.policy_gradient_model as policy_gradient_model
+
+from vel.rl.env_roller.inference_server import InferenceServer
+from vel.util.shared_weights import SharedWeights
+
+
+def test_server_batches_requests_of_all_clients():
+    """ Requests of clients waiting at the same time are served with a single batch and the same weights """
+    context = mp.get_context('fork')
+    observation_space = gym.spaces.Box(low=-1.0, high=1.0, shape=(3,), dtype=np.float32)
+
+    model = policy_gradient_model.create(mlp.create(input_length=3)).instantiate(action_space=gym.spaces.Discrete(2))
+    model.reset_weights()
+
+    shared_weights = SharedWeights(context, model)
+    shared_weights.publish(model, 7)
+
+    # Long timeout, batch is dispatched as soon as all the clients are waiting
+    server = InferenceServer(
+        context, shared_weights, observation_space, clients=2, rows_per_client=4, max_batch_size=100, timeout=30.0
+    )
+    server.start()
+
+    observations = [torch.randn(4, 3), torch.randn(3, 3)]
+    results = [None, None]
+
+    def request(idx):
+        results[idx] = server.clients[idx].step(observations[idx])
+
+    threads = [threading.Thread(target=request, args=(idx,)) for idx in range(2)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    statistics = server.statistics()
+    server.stop()
+
+    with torch.no_grad():
+        for observation, result in zip(observations, results):
+            t.assert_equal(result['actions'].shape[0], observation.shape[0])
+            nt.assert_allclose(result['values'].numpy(), model.value(observation).numpy(), rtol=1e-5, atol=1e-6)
+
+    t.assert_equal(server.clients[0].version, 7)
+    t.assert_equal(statistics['inference_batch_size'], 7.0)
+    t.assert_equal(statistics['inference_batch_size_p90'], 7.0)
@@ -0,0 +1,41 @@
+import gym
+import nose.tools as t
+import torch
+import torch.nn as nn
+
+from vel.rl.env_roller.quantized_actor import QuantizedActor
+from vel.rl.models.backbone.mlp import MLP
+from vel.rl.models.policy_gradient_model import PolicyGradientModel
+
+
+def test_actor_is_quantized_again_with_given_frequency():
+    """ Actor acts with an int8 copy refreshed every few rollouts, while the trained model stays fp32 """
+    torch.manual_seed(0)
+
+    model = PolicyGradientModel(MLP(input_length=8, hidden_units=32), gym.spaces.Discrete(4))
+    model.reset_weights()
+
+    actor = QuantizedActor(torch.device('cpu'), frequency=2)
+    observations = torch.randn(64, 8)
+
+    quantized_models = []
+
+    for _ in range(4):
+        actor.refresh(model)
+        quantized_models.append(actor.model)
+
+        step = actor.step(model, observations)
+        t.assert_equal(step['actions'].shape, (64,))
+
+        with torch.no_grad():
+            model.value_head.linear_layer.weight.add_(1.0)
+
+    t.assert_is(quantized_models[0], quantized_models[1])
+    t.assert_is_not(quantized_models[1], quantized_models[2])
+
+    t.assert_false(any(isinstance(m, nn.Linear) for m in actor.model.modules()))
+    t.assert_true(all(p.dtype == torch.float32 for p in model.parameters()))
+
+    # Int8 weights barely change the greedy policy
+    t.assert_greater(actor.agreement, 0.9)
+    t.assert_greater(actor.speedup, 0.0)
@@ -0,0 +1,193 @@
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+import vel.math.returns as returns_util
+
+from vel.openai.baselines.common.vec_env.dummy_vec_env import DummyVecEnv
+from vel.rl.env_roller.device_transfer import DeviceTransfer
+from vel.rl.env_roller.vec.step_env_roller import StepEnvRoller
+from vel.rl.models.backbone.mlp import MLP
+from vel.rl.models.policy_gradient_model import PolicyGradientModel
+
+
+class CountingEnv(gym.Env):
+    """ Observation is the env index and step count, reward depends on the action, episode ends every few steps """
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(2,), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(3)
+
+    def __init__(self, idx):
+        self.idx = idx
+        self.counter = 0
+
+    def reset(self):
+        self.counter = 0
+        return self._observation()
+
+    def step(self, action):
+        self.counter += 1
+        done = self.counter == 3 + self.idx
+        info = {'episode': {'r': 1.0, 'l': self.counter, 't': 0.0}} if done else {}
+        return self._observation(), float(action) + 0.1 * self.counter, done, info
+
+    def _observation(self):
+        return np.array([self.idx, self.counter], dtype=np.uint8)
+
+
+def _environment():
+    return DummyVecEnv([lambda i=i: CountingEnv(i) for i in range(3)])
+
+
+def _model():
+    torch.manual_seed(0)
+    model = PolicyGradientModel(MLP(input_length=2, hidden_units=8), gym.spaces.Discrete(3))
+    model.reset_weights()
+    return model
+
+
+@torch.no_grad()
+def _reference_rollouts(environment, model, number_of_steps, rollouts):
+    """ Rollouts accumulated in lists of tensors and stacked at the end """
+    observation = torch.from_numpy(environment.reset().copy())
+    dones = torch.zeros(environment.num_envs, dtype=torch.uint8)
+    results = []
+
+    for _ in range(rollouts):
+        observations, actions, values, logprobs, rewards, dones_list = [], [], [], [], [], []
+
+        for _ in range(number_of_steps):
+            step = model.step(observation)
+
+            observations.append(observation)
+            actions.append(step['actions'])
+            values.append(step['values'])
+            logprobs.append(step['logprob'])
+            dones_list.append(dones)
+
+            new_obs, new_rewards, new_dones, _ = environment.step(step['actions'].numpy())
+
+            dones = torch.from_numpy(new_dones.astype(np.uint8))
+            observation = torch.from_numpy(new_obs.copy())
+            rewards.append(torch.from_numpy(new_rewards.astype(np.float32)))
+
+        dones_list.append(dones)
+
+        dones_buffer = torch.stack(dones_list)
+        values_buffer = torch.stack(values)
+
+        advantages = returns_util.discount_bootstrap_gae(
+            torch.stack(rewards), dones_buffer[1:], values_buffer, model.value(observation), 0.9, 0.95
+        )
+
+        results.append({
+            'observations': torch.stack(observations).reshape(-1, 2),
+            'actions': torch.stack(actions).flatten(),
+            'values': values_buffer.flatten(),
+            'logprobs': torch.stack(logprobs).flatten(),
+            'masks': dones_buffer[:-1].flatten(),
+            'dones': dones_buffer[1:].flatten(),
+            'advantages': advantages.flatten(),
+            'returns': (advantages + values_buffer).flatten(),
+        })
+
+    return results
+
+
+def test_preallocated_rollout_matches_stacked_rollout():
+    """ Rollouts written into preallocated buffers equal the stacked ones and reuse the same memory """
+    model = _model()
+    reference = _reference_rollouts(_environment(), model, number_of_steps=4, rollouts=3)
+
+    torch.manual_seed(0)
+    roller = StepEnvRoller(_environment(), torch.device('cpu'), number_of_steps=4, discount_factor=0.9,
+                           gae_lambda=0.95)
+
+    model = _model()
+    pointers = None
+
+    for expected in reference:
+        rollout = roller.rollout({}, model)
+
+        for key, value in expected.items():
+            nt.assert_allclose(rollout[key].numpy(), value.numpy(), rtol=1e-6, err_msg=key)
+
+        rollout_pointers = {key: rollout[key].data_ptr() for key in ['observations', 'actions', 'values', 'logprobs']}
+
+        if pointers is not None:
+            t.assert_equal(rollout_pointers, pointers)
+
+        pointers = rollout_pointers
+
+
+def test_staging_rollout_matches_direct_rollout():
+    """ Staged rollout keeps uint8 observations in a host buffer, transfers them in bulk and gives the same data """
+    rollouts = {}
+    batch_infos = {}
+
+    for staging in [False, True]:
+        torch.manual_seed(0)
+        roller = StepEnvRoller(_environment(), torch.device('cpu'), number_of_steps=4, discount_factor=0.9,
+                               gae_lambda=0.95, staging=staging)
+        model = _model()
+
+        batch_infos[staging] = {}
+        rollouts[staging] = [roller.rollout(batch_infos[staging], model) for _ in range(2)]
+
+        if staging:
+            t.assert_equal(roller.observation_buffer.dtype, torch.uint8)
+            t.assert_equal(roller.observation_buffer.device.type, 'cpu')
+
+            # On the host the bulk transfer is a no-op returning the buffer itself
+            t.assert_equal(rollouts[staging][-1]['observations'].data_ptr(), roller.observation_buffer.data_ptr())
+
+        t.assert_equal([metric.name for metric in roller.metrics()], ['transfer_time'])
+        t.assert_greater(batch_infos[staging]['transfer_time'], 0.0)
+
+    for direct, staged in zip(rollouts[False], rollouts[True]):
+        t.assert_equal(staged['observations'].dtype, torch.uint8)
+
+        for key in ['observations', 'actions', 'values', 'logprobs', 'masks', 'dones', 'advantages', 'returns']:
+            nt.assert_allclose(staged[key].numpy(), direct[key].numpy(), rtol=1e-6, err_msg=key)
+
+
+def test_device_transfer_accounts_time():
+    """ Host buffers are zeroed, transfers to the host are no-ops and the time spent on copies is counted """
+    transfer = DeviceTransfer('cpu')
+
+    buffer = transfer.host_buffer((2, 3), torch.uint8)
+    t.assert_equal(buffer.dtype, torch.uint8)
+    t.assert_false(buffer.any().item())
+
+    transfer.copy_(buffer, torch.ones(2, 3, dtype=torch.uint8))
+    t.assert_is(transfer.to_device(buffer), buffer)
+    nt.assert_array_equal(buffer.numpy(), np.ones((2, 3)))
+
+    t.assert_greater(transfer.reset(), 0.0)
+    t.assert_equal(transfer.reset(), 0.0)
+
+
+def test_quantized_rollout_bootstraps_off_quantized_values():
+    """ With a quantized actor values of the rollout and the bootstrap value come from the same quantized model """
+    torch.manual_seed(0)
+    roller = StepEnvRoller(_environment(), torch.device('cpu'), number_of_steps=4, discount_factor=0.9,
+                           gae_lambda=0.95, actor_quantization_frequency=1)
+    model = _model()
+
+    rollout = roller.rollout({}, model)
+
+    quantized_model = roller.quantized_actor.model
+
+    # Activations are quantized dynamically for each batch, so the model is evaluated step by step as in the rollout
+    with torch.no_grad():
+        last_values = quantized_model.value(roller.observation_buffer[-1])
+        values = torch.stack([quantized_model.value(roller.observation_buffer[idx]) for idx in range(4)])
+
+    nt.assert_allclose(roller.values_buffer.numpy(), values.numpy(), rtol=1e-5, atol=1e-6)
+
+    advantages = returns_util.discount_bootstrap_gae(
+        roller.rewards_buffer, roller.dones_buffer[1:], roller.values_buffer, last_values, 0.9, 0.95
+    )
+
+    nt.assert_allclose(rollout['advantages'].numpy(), advantages.flatten().numpy(), rtol=1e-5, atol=1e-6)
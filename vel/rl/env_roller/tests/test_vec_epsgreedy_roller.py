@@ -0,0 +1,115 @@
+import collections
+
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+from vel.openai.baselines.common.vec_env.dummy_vec_env import DummyVecEnv
+from vel.rl.env_roller.vec.deque_replay_roller_epsgreedy import VecDequeReplayRollerEpsGreedy
+from vel.rl.reinforcers.buffered_single_off_policy_iteration_reinforcer import (
+    BufferedSingleOffPolicyIterationReinforcer
+)
+from vel.schedules.constant import ConstantSchedule
+
+
+class CountingFrameEnv(gym.Env):
+    """ Single channel frame filled with the env index and step count, episode ends every `length` steps """
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(2, 2, 1), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(3)
+
+    def __init__(self, idx, length):
+        self.idx = idx
+        self.length = length
+        self.counter = 0
+
+    def reset(self):
+        self.counter = 0
+        return self._observation()
+
+    def step(self, action):
+        self.counter += 1
+        done = self.counter == self.length
+        info = {'episode': {'r': float(self.idx), 'l': self.length, 't': 0.0}} if done else {}
+        return self._observation(), 1.0, done, info
+
+    def _observation(self):
+        # Never zero, to tell frames apart from the zero padding
+        return np.full((2, 2, 1), 50 * self.idx + self.counter + 1, dtype=np.uint8)
+
+
+class GreedyModel:
+    """ Model always choosing action zero """
+    def step(self, observations):
+        return {
+            'actions': torch.zeros(observations.shape[0], dtype=torch.long),
+            'values': torch.zeros(observations.shape[0])
+        }
+
+
+def _roller(lengths, frame_stack=1, per_env_epsilon=False, epsilon=0.0):
+    env = DummyVecEnv([lambda i=i, length=length: CountingFrameEnv(i, length) for i, length in enumerate(lengths)])
+
+    return VecDequeReplayRollerEpsGreedy(
+        env, torch.device('cpu'), ConstantSchedule(epsilon), batch_size=4, buffer_capacity=40,
+        buffer_initial_size=8, frame_stack=frame_stack, per_env_epsilon=per_env_epsilon, epsilon_alpha=7.0
+    )
+
+
+def test_per_env_epsilon():
+    """ Each environment uses eps ** (1 + alpha * i / (N - 1)), single environment the plain schedule value """
+    roller = _roller([5, 5, 5, 5], per_env_epsilon=True, epsilon=0.4)
+
+    nt.assert_allclose(roller.epsilon_exponents, [1.0, 1.0 + 7.0 / 3, 1.0 + 14.0 / 3, 8.0])
+
+    batch_info = {'progress': 0.0}
+    roller.rollout(batch_info, GreedyModel())
+    nt.assert_allclose(batch_info['epsilon'], np.mean(0.4 ** roller.epsilon_exponents))
+
+    single = _roller([5], per_env_epsilon=True, epsilon=0.4)
+    nt.assert_allclose(single.epsilon_exponents, [1.0])
+
+    batch_info = {'progress': 0.0}
+    single.rollout(batch_info, GreedyModel())
+    nt.assert_allclose(batch_info['epsilon'], 0.4)
+
+
+def test_frame_stack_across_episodes():
+    """ Stacked observations hold k last frames of the current episode, padded with zeros after a reset """
+    lengths = [2, 3]
+    roller = _roller(lengths, frame_stack=3)
+    references = [collections.deque([np.zeros((2, 2, 1), dtype=np.uint8)] * 3, maxlen=3) for _ in lengths]
+
+    for idx, reference in enumerate(references):
+        reference.append(np.full((2, 2, 1), 50 * idx + 1, dtype=np.uint8))
+
+    episode_information, rollout_actions, rollout_values = [], [], []
+    frames = 0
+
+    for step in range(1, 8):
+        observations = [np.concatenate(reference, axis=-1) for reference in references]
+        nt.assert_array_equal(roller.stacked_observation, np.stack(observations))
+
+        rollout = roller.rollout({'progress': 0.0}, GreedyModel())
+
+        frames += BufferedSingleOffPolicyIterationReinforcer._record_rollout(
+            rollout, episode_information, rollout_actions, rollout_values
+        )
+
+        for idx, (reference, length) in enumerate(zip(references, lengths)):
+            if step % length == 0:
+                reference.extend([np.zeros((2, 2, 1), dtype=np.uint8)] * 3)
+
+            reference.append(np.full((2, 2, 1), 50 * idx + step % length + 1, dtype=np.uint8))
+
+    # Each step is a frame of each environment, episodes of env 0 end at steps 2, 4, 6 and of env 1 at 3 and 6
+    t.assert_equal(frames, 14)
+    t.assert_equal(sorted(info['r'] for info in episode_information), [0.0, 0.0, 0.0, 1.0, 1.0])
+
+    # Buffer holds the observations the actions were taken in
+    nt.assert_array_equal(roller.backend.state_buffer[:7, 1, 0, 0, 0], [51, 52, 53, 51, 52, 53, 51])
+
+    batch = roller.sample({}, GreedyModel())
+    t.assert_equal(batch['size'], 4)
+    t.assert_equal(tuple(batch['observations'].shape), (4, 2, 2, 3))
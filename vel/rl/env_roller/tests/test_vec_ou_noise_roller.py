@@ -0,0 +1,110 @@
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+from vel.math.processes import OrnsteinUhlenbeckNoiseProcess
+from vel.openai.baselines.common.vec_env.dummy_vec_env import DummyVecEnv
+from vel.rl.env_roller.vec.deque_replay_roller_ou_noise import VecDequeReplayRollerOuNoise
+from vel.rl.reinforcers.buffered_single_off_policy_iteration_reinforcer import (
+    BufferedSingleOffPolicyIterationReinforcer
+)
+
+
+class CountingContinuousEnv(gym.Env):
+    """ Observation is the env index and step count, episode ends every `length` steps """
+    observation_space = gym.spaces.Box(low=-1000, high=1000, shape=(2,), dtype=np.float32)
+    action_space = gym.spaces.Box(low=-1.0, high=1.0, shape=(1,), dtype=np.float32)
+
+    def __init__(self, idx, length):
+        self.idx = idx
+        self.length = length
+        self.counter = 0
+
+    def reset(self):
+        self.counter = 0
+        return self._observation()
+
+    def step(self, action):
+        self.counter += 1
+        done = self.counter == self.length
+        info = {'episode': {'r': float(self.idx), 'l': self.length, 't': 0.0}} if done else {}
+        return self._observation(), float(self.idx), done, info
+
+    def _observation(self):
+        return np.array([self.idx, self.counter], dtype=np.float32)
+
+
+class ZeroModel:
+    """ Deterministic policy always choosing a zero action """
+    def step(self, observations):
+        return {
+            'actions': torch.zeros(observations.shape[0], 1),
+            'values': torch.zeros(observations.shape[0])
+        }
+
+
+def test_noise_process_reset_of_selected_rows():
+    """ Only given rows of a batched process go back to the initial state """
+    process = OrnsteinUhlenbeckNoiseProcess(np.zeros((3, 2)), np.ones((3, 2)))
+    noise = process()
+
+    process.reset(np.array([1]))
+
+    nt.assert_array_equal(process.x_prev[[0, 2]], noise[[0, 2]])
+    nt.assert_array_equal(process.x_prev[1], np.zeros(2))
+
+    # Noise returned earlier is not modified in place
+    t.assert_true(np.all(noise[1] != 0.0))
+
+
+def test_vector_rollout():
+    """ Transitions of each environment land in its buffer slot and noise is reset only for finished episodes """
+    np.random.seed(0)
+
+    lengths = [2, 3, 100]
+    env = DummyVecEnv([lambda i=i, length=length: CountingContinuousEnv(i, length) for i, length in enumerate(lengths)])
+
+    roller = VecDequeReplayRollerOuNoise(
+        env, torch.device('cpu'), batch_size=6, buffer_capacity=30, buffer_initial_size=12, noise_std_dev=0.2
+    )
+
+    model = ZeroModel()
+    episode_information, rollout_actions, rollout_values = [], [], []
+    frames = 0
+
+    for step in range(1, 7):
+        rollout = roller.rollout({}, model)
+
+        frames += BufferedSingleOffPolicyIterationReinforcer._record_rollout(
+            rollout, episode_information, rollout_actions, rollout_values
+        )
+
+        for idx, length in enumerate(lengths):
+            if step % length == 0:
+                nt.assert_array_equal(roller.noise_process.x_prev[idx], np.zeros(1))
+            else:
+                t.assert_true(np.all(roller.noise_process.x_prev[idx] != 0.0))
+
+    t.assert_equal(frames, 18)
+    t.assert_equal(roller.backend.current_size, 6)
+    t.assert_true(roller.is_ready_for_sampling())
+
+    # Episodes of env 0 end at steps 2, 4 and 6, of env 1 at 3 and 6
+    t.assert_equal(sorted(info['r'] for info in episode_information), [0.0, 0.0, 0.0, 1.0, 1.0])
+    t.assert_equal(len(rollout_actions), 6)
+
+    # Each environment's transitions are stored in its own column, with its rewards and dones
+    nt.assert_array_equal(roller.backend.state_buffer[:6, :, 0], np.tile([0, 1, 2], (6, 1)))
+    nt.assert_array_equal(roller.backend.state_buffer[:6, 2, 1], np.arange(6))
+    nt.assert_array_equal(roller.backend.reward_buffer[:6], np.tile([0.0, 1.0, 2.0], (6, 1)))
+    nt.assert_array_equal(roller.backend.dones_buffer[:6, 0], [False, True] * 3)
+    nt.assert_array_equal(roller.backend.dones_buffer[:6, 1], [False, False, True] * 2)
+
+    # Stored actions are the perturbed ones, zero model action plus the noise
+    t.assert_true(np.all(roller.backend.action_buffer[:6] != 0.0))
+
+    batch = roller.sample({}, model)
+    t.assert_equal(batch['size'], 6)
+    t.assert_equal(batch['observations'].shape, (6, 2))
@@ -0,0 +1,225 @@
+import numpy as np
+import torch
+
+import vel.util.math as math_util
+
+from vel.api.base import Schedule
+from vel.api.metrics import AveragingNamedMetric
+from vel.openai.baselines.common.vec_env import VecEnv
+from vel.rl.api.base import ReplayEnvRollerBase, ReplayEnvRollerFactory
+from vel.rl.buffers.deque_multi_env_buffer_backend import DequeMultiEnvBufferBackend
+from vel.rl.env_roller.quantized_actor import QuantizedActor
+
+
+class VecDequeReplayRollerEpsGreedy(ReplayEnvRollerBase):
+    """
+    Environment roller for action-value models using experience replay, rolling out a **vector** environment.
+
+    Each rollout performs a single batched model step and epsilon-greedy action selection for all the environments.
+    Optionally each environment may use its own epsilon, as in Ape-X: eps_i = eps ** (1 + alpha * i / (N - 1)),
+    where eps is the current value of the epsilon schedule.
+
+    Framestack is implemented directly in the buffer, and the roller keeps stacked last observations of all
+    environments up to date itself.
+    """
+
+    def __init__(self, environment: VecEnv, device, epsilon_schedule: Schedule, batch_size: int,
+                 buffer_capacity: int, buffer_initial_size: int, frame_stack: int,
+                 per_env_epsilon: bool = False, epsilon_alpha: float = 7.0, channels_first: bool = False,
+                 actor_quantization_frequency: int = None):
+        self.epsilon_schedule = epsilon_schedule
+        self.batch_size = batch_size
+        self.buffer_capacity = buffer_capacity
+        self.buffer_initial_size = buffer_initial_size
+        self.frame_stack = frame_stack
+        self.per_env_epsilon = per_env_epsilon
+        self.epsilon_alpha = epsilon_alpha
+
+        self.device = device
+        self._environment = environment
+        self.num_envs = environment.num_envs
+
+        # Each environment holds its share of the buffer capacity
+        self.backend = DequeMultiEnvBufferBackend(
+            buffer_capacity=math_util.divide_ceiling(self.buffer_capacity, self.num_envs),
+            num_envs=self.num_envs,
+            observation_space=environment.observation_space,
+            action_space=environment.action_space,
+            channels_first=channels_first
+        )
+
+        if self.per_env_epsilon and self.num_envs > 1:
+            self.epsilon_exponents = 1.0 + self.epsilon_alpha * np.arange(self.num_envs) / (self.num_envs - 1)
+        else:
+            self.epsilon_exponents = np.ones(self.num_envs)
+
+        # Acting with an int8 copy of the model, quantized again every that many environment steps
+        if actor_quantization_frequency is not None:
+            self.quantized_actor = QuantizedActor(self.device, actor_quantization_frequency)
+        else:
+            self.quantized_actor = None
+
+        self.last_observation = self.environment.reset().copy()
+
+        stacked_shape = list(self.last_observation.shape)
+        stacked_shape[self.backend.channel_axis] *= self.frame_stack
+
+        self.stacked_observation = np.zeros(stacked_shape, dtype=self.last_observation.dtype)
+        self._update_stacked_observation(self.last_observation, np.zeros(self.num_envs, dtype=bool))
+
+    @property
+    def environment(self):
+        """ Return environment of this env roller """
+        return self._environment
+
+    def is_ready_for_sampling(self) -> bool:
+        """ If buffer is ready for drawing samples from it (usually checks if there is enough data) """
+        return self.backend.current_size * self.num_envs >= self.buffer_initial_size
+
+    def epsgreedy_action(self, policy_samples, epsilon):
+        """ Sample e-greedy action using current policy and a vector of epsilon values """
+        random_samples = torch.randint_like(policy_samples, self.environment.action_space.n)
+        selector = torch.rand_like(random_samples, dtype=torch.float32)
+        return torch.where(selector > epsilon, policy_samples, random_samples)
+
+    def rollout(self, batch_info, model) -> dict:
+        """ Roll-out the environment and return it """
+        epsilon_value = self.epsilon_schedule.value(batch_info['progress'])
+        epsilons = epsilon_value ** self.epsilon_exponents
+        batch_info['epsilon'] = float(np.mean(epsilons))
+
+        if self.quantized_actor is not None:
+            self.quantized_actor.refresh(model)
+
+        observation_tensor = torch.from_numpy(self.stacked_observation).to(self.device)
+        step = self._step(model, observation_tensor)
+
+        if self.quantized_actor is not None:
+            self.quantized_actor.write_state(batch_info)
+
+        epsilon_tensor = torch.from_numpy(epsilons.astype(np.float32)).to(self.device)
+        epsgreedy_step = self.epsgreedy_action(step['actions'], epsilon_tensor)
+        actions = epsgreedy_step.cpu().numpy()
+
+        observation, reward, done, infos = self.environment.step(actions)
+        self.backend.store_transition(self.last_observation, actions, reward, done)
+
+        self._update_stacked_observation(observation, done)
+
+        # Vector environments may return their internal buffer, overwritten by the next step
+        self.last_observation = observation.copy()
+
+        return {
+            'epsilon': epsilon_value,
+            'frames': self.num_envs,
+            'episode_infos': [info['episode'] for info in infos if 'episode' in info],
+            'action': epsgreedy_step,
+            'value': step['values']
+        }
+
+    def _update_stacked_observation(self, observation, done):
+        """ Shift the frame stack by one frame, history of environments that are done starts from zeros """
+        channels = observation.shape[self.backend.channel_axis]
+
+        # View with the channel axis last, writes go to the stacked observation itself
+        stacked = np.moveaxis(self.stacked_observation, self.backend.channel_axis, -1)
+
+        stacked[..., :-channels] = stacked[..., channels:]
+        stacked[done] = 0
+        stacked[..., -channels:] = np.moveaxis(observation, self.backend.channel_axis, -1)
+
+    def _step(self, model, observations):
+        """ Evaluate the policy for given observations, with the quantized actor if there is one """
+        if self.quantized_actor is None:
+            return model.step(observations)
+        else:
+            return self.quantized_actor.step(model, observations)
+
+    def metrics(self):
+        """ List of metrics to track for this learning process """
+        my_metrics = [
+            AveragingNamedMetric("epsilon"),
+        ]
+
+        if self.quantized_actor is not None:
+            my_metrics.extend(self.quantized_actor.metrics())
+
+        return my_metrics
+
+    def sample(self, batch_info, model) -> dict:
+        """ Sample experience from replay buffer and return a batch """
+        return self._sample_batches(1)
+
+    def sample_rounds(self, batch_info, model, rounds: int) -> list:
+        """ Sample batches for a number of training rounds, assembled and transferred to the device at once """
+        return self._split_rounds(self._sample_batches(rounds), rounds)
+
+    def _sample_batches(self, rounds: int) -> dict:
+        """ Sample a number of batches, each drawn from the buffer independently, and merge them together """
+        samples_per_env = math_util.divide_ceiling(self.batch_size, self.num_envs)
+
+        indexes = np.concatenate([
+            self.backend.sample_batch_uniform(samples_per_env, self.frame_stack) for _ in range(rounds)
+        ])
+        batch = self.backend.get_batch(indexes, self.frame_stack)
+
+        batch_size = samples_per_env * self.num_envs * rounds
+
+        def flatten(array):
+            """ Merge the sample and the environment axes """
+            return array.reshape((batch_size,) + array.shape[2:])
+
+        observations = torch.from_numpy(flatten(batch['states'])).to(self.device)
+        observations_plus1 = torch.from_numpy(flatten(batch['states+1'])).to(self.device)
+        dones = torch.from_numpy(flatten(batch['dones']).astype(np.float32)).to(self.device)
+        rewards = torch.from_numpy(flatten(batch['rewards']).astype(np.float32)).to(self.device)
+        actions = torch.from_numpy(flatten(batch['actions'])).to(self.device)
+
+        return {
+            'size': batch_size,
+            'observations': observations,
+            'observations+1': observations_plus1,
+            'dones': dones,
+            'rewards': rewards,
+            'actions': actions,
+            'weights': torch.ones_like(rewards)
+        }
+
+
+class VecDequeReplayRollerEpsGreedyFactory(ReplayEnvRollerFactory):
+    """ Factory class for VecDequeReplayRollerEpsGreedy """
+    def __init__(self, epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int,
+                 frame_stack: int=1, per_env_epsilon: bool=False, epsilon_alpha: float=7.0,
+                 channels_first: bool=False, actor_quantization_frequency: int=None):
+        self.buffer_capacity = buffer_capacity
+        self.epsilon_schedule = epsilon_schedule
+        self.buffer_initial_size = buffer_initial_size
+        self.frame_stack = frame_stack
+        self.per_env_epsilon = per_env_epsilon
+        self.epsilon_alpha = epsilon_alpha
+        self.channels_first = channels_first
+        self.actor_quantization_frequency = actor_quantization_frequency
+
+    def instantiate(self, environment, device, settings) -> ReplayEnvRollerBase:
+        return VecDequeReplayRollerEpsGreedy(
+            environment, device, self.epsilon_schedule, settings.batch_size,
+            self.buffer_capacity, self.buffer_initial_size, self.frame_stack,
+            per_env_epsilon=self.per_env_epsilon, epsilon_alpha=self.epsilon_alpha,
+            channels_first=self.channels_first,
+            actor_quantization_frequency=self.actor_quantization_frequency
+        )
+
+
+def create(epsilon_schedule: Schedule, buffer_capacity: int, buffer_initial_size: int, frame_stack: int=1,
+           per_env_epsilon: bool=False, epsilon_alpha: float=7.0, channels_first: bool=False,
+           actor_quantization_frequency: int=None):
+    return VecDequeReplayRollerEpsGreedyFactory(
+        epsilon_schedule=epsilon_schedule,
+        buffer_capacity=buffer_capacity,
+        buffer_initial_size=buffer_initial_size,
+        frame_stack=frame_stack,
+        per_env_epsilon=per_env_epsilon,
+        epsilon_alpha=epsilon_alpha,
+        channels_first=channels_first,
+        actor_quantization_frequency=actor_quantization_frequency
+    )
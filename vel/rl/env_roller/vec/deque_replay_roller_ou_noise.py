@@ -0,0 +1,162 @@
+import numpy as np
+import torch
+
+import vel.util.math as math_util
+
+from vel.math.normalization import RunningNormalizer
+from vel.math.processes import OrnsteinUhlenbeckNoiseProcess
+from vel.openai.baselines.common.vec_env import VecEnv
+from vel.rl.api.base import ReplayEnvRollerBase, ReplayEnvRollerFactory
+from vel.rl.buffers.deque_multi_env_buffer_backend import DequeMultiEnvBufferBackend
+
+
+class VecDequeReplayRollerOuNoise(ReplayEnvRollerBase):
+    """
+    Environment roller with experience replay buffer rolling out a **vector** environment
+    with Ornstein–Uhlenbeck noise process.
+
+    Each rollout performs a single batched model step for all the environments.
+    Noise is generated for all environments at once and reset separately for each environment that is done.
+    """
+
+    def __init__(self, environment: VecEnv, device, batch_size, buffer_capacity, buffer_initial_size,
+                 noise_std_dev, normalize_observations=False):
+        self.device = device
+        self.batch_size = batch_size
+        self.buffer_capacity = buffer_capacity
+        self.buffer_initial_size = buffer_initial_size
+        self.normalize_observations = normalize_observations
+
+        self._environment = environment
+        self.num_envs = environment.num_envs
+
+        # Each environment holds its share of the buffer capacity
+        self.backend = DequeMultiEnvBufferBackend(
+            buffer_capacity=math_util.divide_ceiling(self.buffer_capacity, self.num_envs),
+            num_envs=self.num_envs,
+            observation_space=environment.observation_space,
+            action_space=environment.action_space
+        )
+
+        self.last_observation = self.environment.reset().copy()
+
+        len_action_space = self.environment.action_space.shape[-1]
+
+        self.noise_process = OrnsteinUhlenbeckNoiseProcess(
+            np.zeros((self.num_envs, len_action_space)),
+            float(noise_std_dev) * np.ones((self.num_envs, len_action_space))
+        )
+
+        self.ob_rms = RunningNormalizer(
+            shape=self.environment.observation_space.shape, clip=10.0
+        ) if normalize_observations else None
+
+    @property
+    def environment(self):
+        """ Return environment of this env roller """
+        return self._environment
+
+    def is_ready_for_sampling(self) -> bool:
+        """ If buffer is ready for drawing samples from it (usually checks if there is enough data) """
+        return self.backend.current_size * self.num_envs >= self.buffer_initial_size
+
+    def rollout(self, batch_info, model) -> dict:
+        """ Roll-out the environment and return it """
+        observation_tensor = torch.from_numpy(self.last_observation).to(self.device)
+
+        step = model.step(observation_tensor)
+        action = step['actions'].detach().cpu().numpy()
+        noise = self.noise_process()
+
+        action_perturbed = np.clip(
+            action + noise, self.environment.action_space.low, self.environment.action_space.high
+        )
+
+        observation, reward, done, infos = self.environment.step(action_perturbed)
+
+        if self.ob_rms is not None:
+            self.ob_rms.update(observation)
+
+        self.backend.store_transition(self.last_observation, action_perturbed, reward, done)
+
+        # Environments reset themselves on done, only the noise needs to be reset
+        done_indices = np.flatnonzero(done)
+
+        if done_indices.size > 0:
+            self.noise_process.reset(done_indices)
+
+        # Vector environments may return their internal buffer, overwritten by the next step
+        self.last_observation = observation.copy()
+
+        return {
+            'frames': self.num_envs,
+            'episode_infos': [info['episode'] for info in infos if 'episode' in info],
+            'action': step['actions'],
+            'value': step['values']
+        }
+
+    def _filter_observation(self, obs):
+        """ Potentially normalize observation """
+        if self.ob_rms is not None:
+            return self.ob_rms.normalize(obs)
+        else:
+            return obs
+
+    def sample(self, batch_info, model) -> dict:
+        """ Sample experience from replay buffer and return a batch """
+        samples_per_env = math_util.divide_ceiling(self.batch_size, self.num_envs)
+
+        indexes = self.backend.sample_batch_uniform(samples_per_env, 1)
+        batch = self.backend.get_batch(indexes, 1)
+
+        batch_size = samples_per_env * self.num_envs
+
+        def flatten(array):
+            """ Merge the sample and the environment axes """
+            return array.reshape((batch_size,) + array.shape[2:])
+
+        observations = torch.from_numpy(self._filter_observation(flatten(batch['states']))).to(self.device)
+        observations_plus1 = torch.from_numpy(self._filter_observation(flatten(batch['states+1']))).to(self.device)
+        dones = torch.from_numpy(flatten(batch['dones']).astype(np.float32)).to(self.device)
+        rewards = torch.from_numpy(flatten(batch['rewards']).astype(np.float32)).to(self.device)
+        actions = torch.from_numpy(flatten(batch['actions'])).to(self.device)
+
+        return {
+            'size': batch_size,
+            'observations': observations,
+            'observations+1': observations_plus1,
+            'dones': dones,
+            'rewards': rewards,
+            'actions': actions
+        }
+
+
+class VecDequeReplayRollerOuNoiseFactory(ReplayEnvRollerFactory):
+    """ Factory class for VecDequeReplayRollerOuNoise """
+    def __init__(self, buffer_capacity: int, buffer_initial_size: int, noise_std_dev: float,
+                 normalize_observations: bool=False):
+        self.buffer_capacity = buffer_capacity
+        self.buffer_initial_size = buffer_initial_size
+        self.noise_std_dev = noise_std_dev
+        self.normalize_observations = normalize_observations
+
+    def instantiate(self, environment, device, settings) -> ReplayEnvRollerBase:
+        return VecDequeReplayRollerOuNoise(
+            environment=environment,
+            device=device,
+            batch_size=settings.batch_size,
+            buffer_capacity=self.buffer_capacity,
+            buffer_initial_size=self.buffer_initial_size,
+            noise_std_dev=self.noise_std_dev,
+            normalize_observations=self.normalize_observations
+        )
+
+
+def create(buffer_capacity: int, buffer_initial_size: int, noise_std_dev: float,
+           normalize_observations=False):
+    return VecDequeReplayRollerOuNoiseFactory(
+        noise_std_dev=noise_std_dev,
+        buffer_capacity=buffer_capacity,
+        buffer_initial_size=buffer_initial_size,
+        normalize_observations=normalize_observations
+    )
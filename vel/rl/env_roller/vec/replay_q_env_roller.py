@@ -1,19 +1,33 @@
 import torch
 import numpy as np
 
+from vel.api.metrics import AveragingNamedMetric
 from vel.openai.baselines.common.vec_env import VecEnv
 from vel.rl.api.base import ReplayEnvRollerBase, EnvRollerFactory
 from vel.rl.buffers.deque_multi_env_buffer_backend import DequeMultiEnvBufferBackend
+from vel.rl.env_roller.device_transfer import DeviceTransfer
+from vel.rl.env_roller.quantized_actor import QuantizedActor
 
 
 class ReplayQEnvRoller(ReplayEnvRollerBase):
     """
     Class calculating env rollouts and storing them in a buffer for experience replay
     Idea behind this class is to store as much as we can as pytorch tensors to minimize tensor copying.
+
+    Observations, rewards and dones are kept in their original types in a host buffer, which is stored in the
+    replay buffer at the end of the rollout together with the model outputs copied back from the device at once.
+
+    In the staging mode only the current observation is sent to the device for inference and the whole rollout
+    is transferred to the device in a single copy at the end.
+
+    If `actor_quantization_frequency` is given, actions are selected by an int8 dynamically quantized copy of the
+    model, quantized again every that many rollouts. Action logits stored in the buffer come from that copy as well
+    - it is the behavior policy.
     """
 
     def __init__(self, environment: VecEnv, device, number_of_steps, discount_factor, buffer_capacity,
-                 buffer_initial_size, frame_stack_compensation):
+                 buffer_initial_size, frame_stack_compensation, staging=False, channels_first=False,
+                 actor_quantization_frequency=None):
         self._environment = environment
         self.device = device
         self.number_of_steps = number_of_steps
@@ -21,13 +35,49 @@ class ReplayQEnvRoller(ReplayEnvRollerBase):
         self.buffer_capacity = buffer_capacity
         self.buffer_initial_size = buffer_initial_size
         self.frame_stack_compensation = frame_stack_compensation
+        self.staging = staging
+        self.channels_first = channels_first
+
+        self.transfer = DeviceTransfer(self.device)
+
+        if actor_quantization_frequency is not None:
+            self.quantized_actor = QuantizedActor(self.device, actor_quantization_frequency)
+        else:
+            self.quantized_actor = None
+
+        initial_observation = self.environment.reset()
+        self.num_envs = initial_observation.shape[0]
+
+        # Host side of the rollout, which is stored in the replay buffer
+        # One more slot for the observation and dones following the last step of the rollout
+        self.observation_buffer = self.transfer.host_buffer(
+            (self.number_of_steps + 1,) + initial_observation.shape, torch.from_numpy(initial_observation).dtype
+        )
+        self.dones_buffer = self.transfer.host_buffer((self.number_of_steps + 1, self.num_envs), torch.uint8)
+        self.rewards_buffer = self.transfer.host_buffer((self.number_of_steps, self.num_envs), torch.float32)
+
+        # Without staging rollout is mirrored on the device step by step, unless the device is the host
+        if self.staging or self.transfer.device.type == 'cpu':
+            self.device_buffers = None
+        else:
+            self.device_buffers = {
+                'observations': torch.zeros_like(self.observation_buffer, device=self.device),
+                'dones': torch.zeros_like(self.dones_buffer, device=self.device),
+                'rewards': torch.zeros_like(self.rewards_buffer, device=self.device),
+            }
+
+        # Shapes and types of these depend on the model, they are allocated on the first step
+        self.actions_buffer = None
+        self.action_logits_buffer = None
 
-        # Initial observation
-        self.last_observation = self._to_tensor(self.environment.reset())
-        self.dones = torch.tensor([False for _ in range(self.last_observation.shape[0])], device=self.device)
+        # Initial observation takes the place of the last observation of the previous rollout
+        self.observation_buffer[-1].copy_(torch.from_numpy(initial_observation))
+
+        if self.device_buffers is not None:
+            self.transfer.copy_(self.device_buffers['observations'][-1], self.observation_buffer[-1])
 
         self.batch_observation_shape = (
-                (self.last_observation.shape[0] * self.number_of_steps,) + self.environment.observation_space.shape
+                (self.num_envs * self.number_of_steps,) + self.environment.observation_space.shape
         )
 
         # Replay buffer
@@ -41,7 +91,8 @@ class ReplayQEnvRoller(ReplayEnvRollerBase):
                     (self.buffer_capacity, self.environment.num_envs, self.environment.action_space.n), dtype=np.float32
                 )
             },
-            frame_stack_compensation=self.frame_stack_compensation is not None
+            frame_stack_compensation=self.frame_stack_compensation is not None,
+            channels_first=self.channels_first
         )
 
     @property
@@ -53,48 +104,84 @@ class ReplayQEnvRoller(ReplayEnvRollerBase):
         """ Convert numpy array to a tensor """
         return torch.from_numpy(numpy_array).to(self.device)
 
+    def _allocate_step_buffers(self, actions, action_logits):
+        """ Allocate storage for the model outputs, matching their shapes and types """
+        def allocate(tensor):
+            return torch.zeros((self.number_of_steps,) + tensor.shape, dtype=tensor.dtype, device=self.device)
+
+        self.actions_buffer = allocate(actions)
+        self.action_logits_buffer = allocate(action_logits)
+
+    def _step(self, model, observations):
+        """ Select actions for given observations, with the quantized actor if there is one """
+        if self.quantized_actor is None:
+            return model.step(observations)
+        else:
+            return self.quantized_actor.step(model, observations)
+
+    def metrics(self):
+        """ List of metrics to track for this learning process """
+        my_metrics = [
+            AveragingNamedMetric("transfer_time"),
+        ]
+
+        if self.quantized_actor is not None:
+            my_metrics.extend(self.quantized_actor.metrics())
+
+        return my_metrics
+
     @torch.no_grad()
     def rollout(self, batch_info, model):
         """ Calculate env rollout """
-        observation_accumulator = []  # Device tensors
-        action_accumulator = []  # Device tensors
-        action_logit_accumulator = []  # Device tensors
-        dones_accumulator = []  # Device tensors
-        rewards_accumulator = []  # Device tensors
         episode_information = []  # Python objects
 
+        host_observations = self.observation_buffer.numpy()
+        host_dones = self.dones_buffer.numpy()
+        host_rewards = self.rewards_buffer.numpy()
+
+        # Last observation and dones of the previous rollout are the first ones of this one
+        host_observations[0] = host_observations[-1]
+        host_dones[0] = host_dones[-1]
+
+        if self.device_buffers is not None:
+            self.device_buffers['observations'][0].copy_(self.device_buffers['observations'][-1])
+            self.device_buffers['dones'][0].copy_(self.device_buffers['dones'][-1])
+
+        if self.quantized_actor is not None:
+            self.quantized_actor.refresh(model)
+
         for step_idx in range(self.number_of_steps):
-            step = model.step(self.last_observation)
+            if self.device_buffers is not None:
+                observation = self.device_buffers['observations'][step_idx]
+            else:
+                observation = self.transfer.to_device(self.observation_buffer[step_idx])
+
+            step = self._step(model, observation)
 
             actions = step['actions']
+            action_logits = step['action_logits']
 
-            observation_accumulator.append(self.last_observation)
-            action_accumulator.append(actions)
-            dones_accumulator.append(self.dones)
+            if self.actions_buffer is None:
+                self._allocate_step_buffers(actions, action_logits)
 
-            action_logits = step['action_logits']
-            action_logit_accumulator.append(action_logits)
+            self.actions_buffer[step_idx].copy_(actions)
+            self.action_logits_buffer[step_idx].copy_(action_logits)
 
             actions_numpy = actions.detach().cpu().numpy()
             new_obs, new_rewards, new_dones, new_infos = self.environment.step(actions_numpy)
 
-            # Store rollout in the experience replay buffer
-            self.replay_buffer.store_transition(
-                frame=self.last_observation.detach().cpu().numpy(),
-                action=actions_numpy,
-                reward=new_rewards,
-                done=new_dones,
-                extra_info={
-                    'action_logits': action_logits.detach().cpu().numpy(),
-                }
-            )
-
             # Done is flagged true when the episode has ended AND the frame we see is already a first frame from the
             # Next episode
-            self.dones = self._to_tensor(new_dones.astype(np.uint8))
-            self.last_observation = self._to_tensor(new_obs[:])
+            host_observations[step_idx + 1] = new_obs
+            host_dones[step_idx + 1] = new_dones
+            host_rewards[step_idx] = new_rewards
 
-            rewards_accumulator.append(self._to_tensor(new_rewards.astype(np.float32)))
+            if self.device_buffers is not None:
+                for name, buffer, idx in [
+                        ('observations', self.observation_buffer, step_idx + 1),
+                        ('dones', self.dones_buffer, step_idx + 1),
+                        ('rewards', self.rewards_buffer, step_idx)]:
+                    self.transfer.copy_(self.device_buffers[name][idx], buffer[idx])
 
             for info in new_infos:
                 maybe_episode_info = info.get('episode')
@@ -102,20 +189,36 @@ class ReplayQEnvRoller(ReplayEnvRollerBase):
                 if maybe_episode_info:
                     episode_information.append(maybe_episode_info)
 
-        final_values = model.value(self.last_observation)
+        if self.device_buffers is not None:
+            all_observations = self.device_buffers['observations']
+            all_dones = self.device_buffers['dones']
+            rewards_buffer = self.device_buffers['rewards']
+        else:
+            # Whole rollout is sent to the device at once, these are no-ops if it's already there
+            all_observations = self.transfer.to_device(self.observation_buffer)
+            all_dones = self.transfer.to_device(self.dones_buffer)
+            rewards_buffer = self.transfer.to_device(self.rewards_buffer)
+
+        self.transfer.synchronize()
 
-        dones_accumulator.append(self.dones)
+        batch_info['transfer_time'] = self.transfer.reset()
 
-        observation_buffer = torch.stack(observation_accumulator)
-        rewards_buffer = torch.stack(rewards_accumulator)
-        actions_buffer = torch.stack(action_accumulator)
-        dones_buffer = torch.stack(dones_accumulator)
-        action_logit_buffer = torch.stack(action_logit_accumulator)
+        if self.quantized_actor is not None:
+            self.quantized_actor.write_state(batch_info)
 
-        masks_buffer = dones_buffer[:-1, :]
-        dones_buffer = dones_buffer[1:, :]
+        self._store_rollout(host_observations, host_rewards, host_dones)
 
-        batch_action_shape = (action_logit_buffer.size(0) * action_logit_buffer.size(1), action_logit_buffer.size(2))
+        # Only the action logits come from the quantized actor - they describe the behavior policy. Q-values of the
+        # rollout are evaluated by the trained model during the optimization, so it bootstraps the returns as well
+        final_values = model.value(all_observations[-1])
+
+        observation_buffer = all_observations[:-1]
+        masks_buffer = all_dones[:-1]
+        dones_buffer = all_dones[1:]
+
+        batch_action_shape = (
+            self.action_logits_buffer.size(0) * self.action_logits_buffer.size(1), self.action_logits_buffer.size(2)
+        )
 
         # Reshape into final batch size
         return {
@@ -124,12 +227,28 @@ class ReplayQEnvRoller(ReplayEnvRollerBase):
             'masks': masks_buffer.flatten(),  # Dones and masks are basically the same, just shifted by 1
             'dones': dones_buffer.flatten(),
             'rewards': rewards_buffer.flatten(),
-            'actions': actions_buffer.flatten(),
+            'actions': self.actions_buffer.flatten(),
             'episode_information': episode_information,
-            'action_logits': action_logit_buffer.reshape(batch_action_shape),
+            'action_logits': self.action_logits_buffer.reshape(batch_action_shape),
             'final_values': final_values
         }
 
+    def _store_rollout(self, host_observations, host_rewards, host_dones):
+        """ Store rollout in the experience replay buffer, copying model outputs back to the host all at once """
+        actions = self.actions_buffer.cpu().numpy()
+        action_logits = self.action_logits_buffer.cpu().numpy()
+
+        for step_idx in range(self.number_of_steps):
+            self.replay_buffer.store_transition(
+                frame=host_observations[step_idx],
+                action=actions[step_idx],
+                reward=host_rewards[step_idx],
+                done=host_dones[step_idx + 1],
+                extra_info={
+                    'action_logits': action_logits[step_idx],
+                }
+            )
+
     def is_ready_for_sampling(self) -> bool:
         """ If buffer is ready for drawing samples from it (usually checks if there is enough data) """
         return self.replay_buffer.current_size >= self.buffer_initial_size
@@ -163,22 +282,33 @@ class ReplayQEnvRoller(ReplayEnvRollerBase):
 
 class ReplayQEnvRollerFactory(EnvRollerFactory):
     """ Factory for the StepEnvRoller """
-    def __init__(self, buffer_capacity, buffer_initial_size, frame_stack_compensation=None):
+    def __init__(self, buffer_capacity, buffer_initial_size, frame_stack_compensation=None, staging=False,
+                 channels_first=False, actor_quantization_frequency=None):
         self.buffer_capacity = buffer_capacity
         self.buffer_initial_size = buffer_initial_size
         self.frame_stack_compensation = frame_stack_compensation
+        self.staging = staging
+        self.channels_first = channels_first
+        self.actor_quantization_frequency = actor_quantization_frequency
 
     def instantiate(self, environment, device, settings):
         return ReplayQEnvRoller(
             environment, device, settings.number_of_steps, settings.discount_factor,
             self.buffer_capacity, self.buffer_initial_size,
-            frame_stack_compensation=self.frame_stack_compensation
+            frame_stack_compensation=self.frame_stack_compensation,
+            staging=self.staging,
+            channels_first=self.channels_first,
+            actor_quantization_frequency=self.actor_quantization_frequency
         )
 
 
-def create(buffer_capacity, buffer_initial_size, frame_stack_compensation=None):
+def create(buffer_capacity, buffer_initial_size, frame_stack_compensation=None, staging=False, channels_first=False,
+           actor_quantization_frequency=None):
     return ReplayQEnvRollerFactory(
         buffer_capacity=buffer_capacity,
         buffer_initial_size=buffer_initial_size,
-        frame_stack_compensation=frame_stack_compensation
+        frame_stack_compensation=frame_stack_compensation,
+        staging=staging,
+        channels_first=channels_first,
+        actor_quantization_frequency=actor_quantization_frequency
     )
@@ -1,32 +1,77 @@
 import torch
 import numpy as np
 
+import vel.math.returns as returns_util
+
+from vel.api.metrics import AveragingNamedMetric
 from vel.rl.api.base import EnvRollerBase, EnvRollerFactory
+from vel.rl.env_roller.device_transfer import DeviceTransfer
+from vel.rl.env_roller.quantized_actor import QuantizedActor
 
 
 class StepEnvRoller(EnvRollerBase):
     """
     Class calculating env rollouts.
     Idea behind this class is to store as much as we can as pytorch tensors to minimize tensor copying.
+
+    Rollout is written in place into persistent preallocated [number_of_steps, num_envs, ...] tensors and
+    returned as views into them, therefore a rollout is only valid until the next one is calculated.
+
+    In the staging mode observations, rewards and dones are kept in their original types in a host buffer.
+    Only the current observation is sent to the device for inference and the whole rollout is transferred to the
+    device in a single copy at the end.
+
+    If `actor_quantization_frequency` is given, actions are selected by an int8 dynamically quantized copy of the
+    model, quantized again every that many rollouts. Values and log probabilities of the rollout, bootstrap values
+    included, come from that copy as well - it is the behavior policy.
     """
 
-    def __init__(self, environment, device, number_of_steps, discount_factor, gae_lambda=1.0):
+    def __init__(self, environment, device, number_of_steps, discount_factor, gae_lambda=1.0, staging=False,
+                 actor_quantization_frequency=None):
         self._environment = environment
         self.device = device
         self.number_of_steps = number_of_steps
         self.discount_factor = discount_factor
         self.gae_lambda = gae_lambda
+        self.staging = staging
+
+        self.transfer = DeviceTransfer(self.device)
+
+        if actor_quantization_frequency is not None:
+            self.quantized_actor = QuantizedActor(self.device, actor_quantization_frequency)
+        else:
+            self.quantized_actor = None
+
+        initial_observation = self.environment.reset()
+        self.num_envs = initial_observation.shape[0]
+
+        if self.staging:
+            allocate = self.transfer.host_buffer
+        else:
+            def allocate(shape, dtype):
+                return torch.zeros(shape, dtype=dtype, device=self.device)
 
-        # Initial observation
-        self.observation = self._to_tensor(self.environment.reset())
-        self.dones = torch.tensor([False for _ in range(self.observation.shape[0])], device=self.device)
+        # One more slot for the observation and dones following the last step of the rollout
+        self.observation_buffer = allocate(
+            (self.number_of_steps + 1,) + initial_observation.shape, torch.from_numpy(initial_observation).dtype
+        )
+        self.dones_buffer = allocate((self.number_of_steps + 1, self.num_envs), torch.uint8)
+        self.rewards_buffer = allocate((self.number_of_steps, self.num_envs), torch.float32)
+
+        # Shapes and types of these depend on the model, they are allocated on the first step
+        self.actions_buffer = None
+        self.values_buffer = None
+        self.logprob_buffer = None
+
+        # Initial observation takes the place of the last observation of the previous rollout
+        self.transfer.copy_(self.observation_buffer[-1], torch.from_numpy(initial_observation))
 
         self.batch_observation_shape = (
-            (self.observation.shape[0]*self.number_of_steps,) + self.environment.observation_space.shape
+            (self.num_envs*self.number_of_steps,) + self.environment.observation_space.shape
         )
 
         self.action_observation_shape = (
-            (self.observation.shape[0]*self.number_of_steps,) + self.environment.action_space.shape
+            (self.num_envs*self.number_of_steps,) + self.environment.action_space.shape
         )
 
     @property
@@ -34,40 +79,71 @@ class StepEnvRoller(EnvRollerBase):
         """ Return environment of this env roller """
         return self._environment
 
-    def _to_tensor(self, numpy_array):
-        """ Convert numpy array to a tensor """
-        return torch.from_numpy(numpy_array).to(self.device)
+    def _allocate_step_buffers(self, actions, values, logprob):
+        """ Allocate storage for the model outputs, matching their shapes and types """
+        def allocate(tensor):
+            return torch.zeros((self.number_of_steps,) + tensor.shape, dtype=tensor.dtype, device=self.device)
+
+        self.actions_buffer = allocate(actions)
+        self.values_buffer = allocate(values)
+        self.logprob_buffer = allocate(logprob)
+
+    def _step(self, model, observations):
+        """ Select actions for given observations, with the quantized actor if there is one """
+        if self.quantized_actor is None:
+            return model.step(observations)
+        else:
+            return self.quantized_actor.step(model, observations)
+
+    def _value(self, model, observations):
+        """ State values of given observations, with the quantized actor if there is one """
+        if self.quantized_actor is None:
+            return model.value(observations)
+        else:
+            return self.quantized_actor.value(observations)
+
+    def metrics(self):
+        """ List of metrics to track for this learning process """
+        my_metrics = [
+            AveragingNamedMetric("transfer_time"),
+        ]
+
+        if self.quantized_actor is not None:
+            my_metrics.extend(self.quantized_actor.metrics())
+
+        return my_metrics
 
     @torch.no_grad()
     def rollout(self, batch_info, model):
         """ Calculate env rollout """
-        observation_accumulator = []  # Device tensors
-        action_accumulator = []  # Device tensors
-        value_accumulator = []  # Device tensors
-        dones_accumulator = []  # Device tensors
-        rewards_accumulator = []  # Device tensors
         episode_information = []  # Python objects
-        logprob_accumulator = []  # Device tensors
+
+        # Last observation and dones of the previous rollout are the first ones of this one
+        self.observation_buffer[0].copy_(self.observation_buffer[-1])
+        self.dones_buffer[0].copy_(self.dones_buffer[-1])
+
+        if self.quantized_actor is not None:
+            self.quantized_actor.refresh(model)
 
         for step_idx in range(self.number_of_steps):
-            step = model.step(self.observation)
+            step = self._step(model, self.transfer.to_device(self.observation_buffer[step_idx]))
             actions, values, logprob = step['actions'], step['values'], step['logprob']
 
-            observation_accumulator.append(self.observation)
-            action_accumulator.append(actions)
-            value_accumulator.append(values)
-            dones_accumulator.append(self.dones)
-            logprob_accumulator.append(logprob)
+            if self.actions_buffer is None:
+                self._allocate_step_buffers(actions, values, logprob)
+
+            self.actions_buffer[step_idx].copy_(actions)
+            self.values_buffer[step_idx].copy_(values)
+            self.logprob_buffer[step_idx].copy_(logprob)
 
             actions_numpy = actions.detach().cpu().numpy()
             new_obs, new_rewards, new_dones, new_infos = self.environment.step(actions_numpy)
 
             # Done is flagged true when the episode has ended AND the frame we see is already a first frame from the
             # Next episode
-            self.dones = self._to_tensor(new_dones.astype(np.uint8))
-            self.observation = self._to_tensor(new_obs[:])
-
-            rewards_accumulator.append(self._to_tensor(new_rewards.astype(np.float32)))
+            self.transfer.copy_(self.dones_buffer[step_idx + 1], torch.from_numpy(new_dones.astype(np.uint8)))
+            self.transfer.copy_(self.observation_buffer[step_idx + 1], torch.from_numpy(new_obs))
+            self.transfer.copy_(self.rewards_buffer[step_idx], torch.from_numpy(new_rewards))
 
             for info in new_infos:
                 maybe_episode_info = info.get('episode')
@@ -75,36 +151,40 @@ class StepEnvRoller(EnvRollerBase):
                 if maybe_episode_info:
                     episode_information.append(maybe_episode_info)
 
-        last_values = model.value(self.observation)
-        dones_accumulator.append(self.dones)
+        # Whole rollout is sent to the device at once, these are no-ops if it's already there
+        all_observations = self.transfer.to_device(self.observation_buffer)
+        all_dones = self.transfer.to_device(self.dones_buffer)
+        rewards_buffer = self.transfer.to_device(self.rewards_buffer)
+        self.transfer.synchronize()
+
+        batch_info['transfer_time'] = self.transfer.reset()
 
-        observation_buffer = torch.stack(observation_accumulator)
-        rewards_buffer = torch.stack(rewards_accumulator)
-        # There may be different types of actions
-        actions_buffer = torch.stack(action_accumulator)
-        values_buffer = torch.stack(value_accumulator)
-        dones_buffer = torch.stack(dones_accumulator)
-        logprob_buffer = torch.stack(logprob_accumulator)
+        if self.quantized_actor is not None:
+            self.quantized_actor.write_state(batch_info)
 
-        masks_buffer = dones_buffer[:-1, :]
-        dones_buffer = dones_buffer[1:, :]
+        # Bootstrap off the same value function that estimated the values of the rollout
+        last_values = self._value(model, all_observations[-1])
+
+        observation_buffer = all_observations[:-1]
+        masks_buffer = all_dones[:-1]
+        dones_buffer = all_dones[1:]
 
         # Generalized Advantage Estimation
         # https://arxiv.org/abs/1506.02438
         advantages = self.discount_bootstrap_gae(
-            rewards_buffer, dones_buffer, values_buffer, last_values,
+            rewards_buffer, dones_buffer, self.values_buffer, last_values,
             self.discount_factor, self.gae_lambda
         )
 
-        returns = advantages + values_buffer
+        returns = advantages + self.values_buffer
 
         # Flatten the rollout
         advantages = advantages.flatten()
         returns = returns.flatten()
-        values = values_buffer.flatten()
+        values = self.values_buffer.flatten()
         masks = masks_buffer.flatten()
         dones = dones_buffer.flatten()
-        logprobs = logprob_buffer.flatten()
+        logprobs = self.logprob_buffer.flatten()
 
         # Reshape into final batch size
         return {
@@ -113,7 +193,7 @@ class StepEnvRoller(EnvRollerBase):
             'returns': returns,
             'masks': masks,
             'dones': dones,
-            'actions': actions_buffer.reshape(self.action_observation_shape),
+            'actions': self.actions_buffer.reshape(self.action_observation_shape),
             'values': values,
             'advantages': advantages,
             'episode_information': episode_information,
@@ -122,48 +202,22 @@ class StepEnvRoller(EnvRollerBase):
 
     def discount_bootstrap(self, rewards_buffer, dones_buffer, last_values_buffer, discount_factor):
         """ Calculate state values bootstrapping off the following state values """
-        true_value_buffer = torch.zeros_like(rewards_buffer)
-        dones_buffer = dones_buffer.to(dtype=torch.float32)
-
-        # discount/bootstrap off value fn
-        current_value = last_values_buffer
-
-        for i in reversed(range(self.number_of_steps)):
-            current_value = rewards_buffer[i] + discount_factor * current_value * (1.0 - dones_buffer[i])
-            true_value_buffer[i] = current_value
-
-        return true_value_buffer
+        return returns_util.discount_bootstrap(rewards_buffer, dones_buffer, last_values_buffer, discount_factor)
 
     def discount_bootstrap_gae(self, rewards_buffer, dones_buffer, values_buffer, last_values_buffer,
                                discount_factor, gae_lambda):
         """ Calculate state values bootstrapping off the following state values - Generalized Advantage Estimation """
-        advantage_buffer = torch.zeros_like(rewards_buffer)
-        dones_buffer = dones_buffer.to(dtype=torch.float32)
-
-        # Accmulate sums
-        sum_accumulator = 0
-
-        for i in reversed(range(self.number_of_steps)):
-            if i == self.number_of_steps - 1:
-                next_value = last_values_buffer
-            else:
-                next_value = values_buffer[i+1]
-
-            bellman_delta = (
-                rewards_buffer[i] + discount_factor * next_value * (1.0 - dones_buffer[i]) - values_buffer[i]
-            )
-
-            advantage_buffer[i] = sum_accumulator = (
-                bellman_delta + discount_factor * gae_lambda * sum_accumulator * (1.0 - dones_buffer[i])
-            )
-
-        return advantage_buffer
+        return returns_util.discount_bootstrap_gae(
+            rewards_buffer, dones_buffer, values_buffer, last_values_buffer, discount_factor, gae_lambda
+        )
 
 
 class StepEnvRollerFactory(EnvRollerFactory):
     """ Factory for the StepEnvRoller """
-    def __init__(self, gae_lambda=1.0):
+    def __init__(self, gae_lambda=1.0, staging=False, actor_quantization_frequency=None):
         self.gae_lambda = gae_lambda
+        self.staging = staging
+        self.actor_quantization_frequency = actor_quantization_frequency
 
     def instantiate(self, environment, device, settings):
         return StepEnvRoller(
@@ -171,10 +225,14 @@ class StepEnvRollerFactory(EnvRollerFactory):
             device=device,
             number_of_steps=settings.number_of_steps,
             discount_factor=settings.discount_factor,
-            gae_lambda=self.gae_lambda
+            gae_lambda=self.gae_lambda,
+            staging=self.staging,
+            actor_quantization_frequency=self.actor_quantization_frequency
         )
 
 
-def create(gae_lambda=1.0):
-    return StepEnvRollerFactory(gae_lambda=gae_lambda)
+def create(gae_lambda=1.0, staging=False, actor_quantization_frequency=None):
+    return StepEnvRollerFactory(
+        gae_lambda=gae_lambda, staging=staging, actor_quantization_frequency=actor_quantization_frequency
+    )
 
@@ -25,7 +25,8 @@ class FPSMetric(ValueMetric):
         frames = batch_info.training_info['frames']
         seconds = batch_info.training_info['time']
 
-        fps = int(frames/seconds)
+        # Time may still be zero if so far it was all spent compiling the model
+        fps = int(frames/seconds) if seconds > 0 else 0
 
         return fps
 
@@ -108,3 +109,54 @@ class ExplainedVariance(AveragingMetric):
 
         explained_variance = 1 - torch.var(rewards - values) / torch.var(rewards)
         return explained_variance.item()
+
+
+class EnvironmentStatisticMetric(BaseMetric):
+    """
+    Quantile of a sample window recorded by an instrumented vector environment - either across all the workers
+    or of the slowest worker
+    """
+    def __init__(self, name, statistics, key, quantile, worst_worker=False):
+        super().__init__(name)
+        self.statistics = statistics
+        self.key = key
+        self.quantile = quantile
+        self.worst_worker = worst_worker
+
+    def calculate(self, data_dict):
+        """ Calculate value of a metric based on supplied data """
+        # Samples are recorded by the environment itself
+        pass
+
+    def reset(self):
+        """ Reset value of a metric """
+        # Statistics are kept in a rolling window, no need for reset..
+        pass
+
+    def value(self):
+        """ Return current value for the metric """
+        if self.worst_worker:
+            return float(self.statistics.worker_quantile(self.key, self.quantile).max())
+        else:
+            return self.statistics.quantile(self.key, self.quantile)
+
+
+def environment_metrics(environment) -> list:
+    """ Latency metrics of an environment, if it has been instrumented """
+    statistics = getattr(environment, 'statistics', None)
+
+    if statistics is None:
+        return []
+
+    quantiles = [('p50', 0.5), ('p95', 0.95), ('max', 1.0)]
+
+    # Pooled quantiles hide a single slow worker, therefore the slowest worker is reported as well
+    return [
+        EnvironmentStatisticMetric(f'env:{key}_{suffix}', statistics, key, quantile)
+        for key in statistics.KEYS
+        for suffix, quantile in quantiles
+    ] + [
+        EnvironmentStatisticMetric(f'env:{key}_worst_{suffix}', statistics, key, quantile, worst_worker=True)
+        for key in statistics.WORKER_KEYS
+        for suffix, quantile in quantiles
+    ]
@@ -18,11 +18,14 @@ from vel.api.base import LinearBackboneModel, ModelFactory
 
 class NatureCnnSmall(LinearBackboneModel):
     """ Neural network as defined in the paper 'Human-level control through deep reinforcement learning'"""
-    def __init__(self, input_width, input_height, input_channels, output_dim=128):
+    def __init__(self, input_width, input_height, input_channels, output_dim=128, channels_first=False):
         super().__init__()
 
         self._output_dim = output_dim
 
+        # Input frames are in (channels, height, width) layout and need no transposition
+        self.channels_first = channels_first
+
         self.conv1 = nn.Conv2d(
             in_channels=input_channels,
             out_channels=8,
@@ -69,16 +72,23 @@ class NatureCnnSmall(LinearBackboneModel):
                 init.constant_(m.bias, 0.0)
 
     def forward(self, image):
-        result = image.permute(0, 3, 1, 2).contiguous().type(torch.float) / 255.0
+        if self.channels_first:
+            result = image.type(torch.float) / 255.0
+        else:
+            result = image.permute(0, 3, 1, 2).contiguous().type(torch.float) / 255.0
+
         result = F.relu(self.conv1(result))
         result = F.relu(self.conv2(result))
         flattened = result.view(result.size(0), -1)
         return F.relu(self.linear_layer(flattened))
 
 
-def create(input_width, input_height, input_channels=1):
+def create(input_width, input_height, input_channels=1, channels_first=False):
     def instantiate(**_):
-        return NatureCnnSmall(input_width=input_width, input_height=input_height, input_channels=input_channels)
+        return NatureCnnSmall(
+            input_width=input_width, input_height=input_height, input_channels=input_channels,
+            channels_first=channels_first
+        )
 
     return ModelFactory.generic(instantiate)
 
@@ -4,6 +4,7 @@ import itertools as it
 from vel.api.base import LinearBackboneModel, Model, ModelFactory
 from vel.rl.modules.deterministic_action_head import DeterministicActionHead
 from vel.rl.modules.deterministic_critic_head import DeterministicCriticHead
+from vel.util.compilation import compile_model
 
 
 class DeterministicPolicyModel(Model):
@@ -80,22 +81,27 @@ class DeterministicPolicyModel(Model):
 
 class DeterministicPolicyModelFactory(ModelFactory):
     """ Factory  class for policy gradient models """
-    def __init__(self, policy_backbone: ModelFactory, value_backbone: ModelFactory):
+    def __init__(self, policy_backbone: ModelFactory, value_backbone: ModelFactory, compilation: str=None):
         self.policy_backbone = policy_backbone
         self.value_backbone = value_backbone
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
         """ Instantiate the model """
         policy_backbone = self.policy_backbone.instantiate(**extra_args)
         value_backbone = self.value_backbone.instantiate(**extra_args)
 
-        return DeterministicPolicyModel(
+        model = DeterministicPolicyModel(
             policy_backbone=policy_backbone,
             value_backbone=value_backbone,
             action_space=extra_args['action_space']
         )
 
+        return compile_model(model, self.compilation)
 
-def create(policy_backbone: ModelFactory, value_backbone: ModelFactory):
+
+def create(policy_backbone: ModelFactory, value_backbone: ModelFactory, compilation: str=None):
     """ Vel creation function """
-    return DeterministicPolicyModelFactory(policy_backbone=policy_backbone, value_backbone=value_backbone)
+    return DeterministicPolicyModelFactory(
+        policy_backbone=policy_backbone, value_backbone=value_backbone, compilation=compilation
+    )
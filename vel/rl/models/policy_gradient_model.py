@@ -1,6 +1,7 @@
 import gym
 
 from vel.api.base import LinearBackboneModel, Model, ModelFactory
+from vel.util.compilation import compile_model
 from vel.rl.modules.action_head import ActionHead
 from vel.rl.modules.value_head import ValueHead
 
@@ -64,15 +65,16 @@ class PolicyGradientModel(Model):
 
 class PolicyGradientModelFactory(ModelFactory):
     """ Factory  class for policy gradient models """
-    def __init__(self, backbone: ModelFactory):
+    def __init__(self, backbone: ModelFactory, compilation: str=None):
         self.backbone = backbone
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
         """ Instantiate the model """
         backbone = self.backbone.instantiate(**extra_args)
-        return PolicyGradientModel(backbone, extra_args['action_space'])
+        return compile_model(PolicyGradientModel(backbone, extra_args['action_space']), self.compilation)
 
 
-def create(backbone: ModelFactory):
+def create(backbone: ModelFactory, compilation: str=None):
     """ Vel creation function """
-    return PolicyGradientModelFactory(backbone=backbone)
+    return PolicyGradientModelFactory(backbone=backbone, compilation=compilation)
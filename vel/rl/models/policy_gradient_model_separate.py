@@ -5,6 +5,7 @@ import gym
 from vel.api.base import LinearBackboneModel, Model, ModelFactory
 from vel.rl.modules.action_head import ActionHead
 from vel.rl.modules.value_head import ValueHead
+from vel.util.compilation import compile_model
 
 
 class PolicyGradientModelSeparate(Model):
@@ -87,20 +88,25 @@ class PolicyGradientModelSeparate(Model):
 
 class PolicyGradientModelSeparateFactory(ModelFactory):
     """ Factory  class for policy gradient models """
-    def __init__(self, policy_backbone: ModelFactory, value_backbone: ModelFactory):
+    def __init__(self, policy_backbone: ModelFactory, value_backbone: ModelFactory, compilation: str=None):
         self.policy_backbone = policy_backbone
         self.value_backbone = value_backbone
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
         """ Instantiate the model """
         policy_backbone = self.policy_backbone.instantiate(**extra_args)
         value_backbone = self.value_backbone.instantiate(**extra_args)
 
-        return PolicyGradientModelSeparate(policy_backbone, value_backbone, extra_args['action_space'])
+        return compile_model(
+            PolicyGradientModelSeparate(policy_backbone, value_backbone, extra_args['action_space']),
+            self.compilation
+        )
 
 
-def create(policy_backbone: ModelFactory, value_backbone: ModelFactory):
+def create(policy_backbone: ModelFactory, value_backbone: ModelFactory, compilation: str=None):
     return PolicyGradientModelSeparateFactory(
         policy_backbone=policy_backbone,
-        value_backbone=value_backbone
+        value_backbone=value_backbone,
+        compilation=compilation
     )
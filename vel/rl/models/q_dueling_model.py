@@ -1,6 +1,7 @@
 import gym
 
 from vel.api.base import LinearBackboneModel, Model, ModelFactory
+from vel.util.compilation import compile_model
 from vel.rl.modules.dueling_q_head import DuelingQHead
 
 
@@ -37,15 +38,16 @@ class QDuelingModel(Model):
 
 class QDuelingModelFactory(ModelFactory):
     """ Factory  class for policy gradient models """
-    def __init__(self, backbone: ModelFactory):
+    def __init__(self, backbone: ModelFactory, compilation: str=None):
         self.backbone = backbone
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
         """ Instantiate the model """
         backbone = self.backbone.instantiate(**extra_args)
-        return QDuelingModel(backbone, extra_args['action_space'])
+        return compile_model(QDuelingModel(backbone, extra_args['action_space']), self.compilation)
 
 
-def create(backbone: ModelFactory):
+def create(backbone: ModelFactory, compilation: str=None):
     """ DQN model factory """
-    return QDuelingModelFactory(backbone=backbone)
+    return QDuelingModelFactory(backbone=backbone, compilation=compilation)
@@ -1,6 +1,7 @@
 import gym
 
 from vel.api.base import LinearBackboneModel, Model, ModelFactory
+from vel.util.compilation import compile_model
 from vel.rl.modules.q_head import QHead
 
 
@@ -36,15 +37,16 @@ class QModel(Model):
 
 class QModelFactory(ModelFactory):
     """ Factory class for q-learning models """
-    def __init__(self, backbone: ModelFactory):
+    def __init__(self, backbone: ModelFactory, compilation: str=None):
         self.backbone = backbone
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
         """ Instantiate the model """
         backbone = self.backbone.instantiate(**extra_args)
-        return QModel(backbone, extra_args['action_space'])
+        return compile_model(QModel(backbone, extra_args['action_space']), self.compilation)
 
 
-def create(backbone: ModelFactory):
+def create(backbone: ModelFactory, compilation: str=None):
     """ Q-Learning model factory """
-    return QModelFactory(backbone=backbone)
+    return QModelFactory(backbone=backbone, compilation=compilation)
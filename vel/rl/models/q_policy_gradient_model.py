@@ -2,6 +2,7 @@ import gym
 import torch
 
 from vel.api.base import LinearBackboneModel, Model, ModelFactory
+from vel.util.compilation import compile_model
 
 from vel.rl.modules.action_head import ActionHead
 from vel.rl.modules.q_head import QHead
@@ -75,14 +76,15 @@ class QPolicyGradientModel(Model):
 
 class QPolicyGradientModelFactory(ModelFactory):
     """ Factory  class for policy gradient models """
-    def __init__(self, backbone: ModelFactory):
+    def __init__(self, backbone: ModelFactory, compilation: str=None):
         self.backbone = backbone
+        self.compilation = compilation
 
     def instantiate(self, **extra_args):
         """ Instantiate the model """
         backbone = self.backbone.instantiate(**extra_args)
-        return QPolicyGradientModel(backbone, extra_args['action_space'])
+        return compile_model(QPolicyGradientModel(backbone, extra_args['action_space']), self.compilation)
 
 
-def create(backbone: ModelFactory):
-    return QPolicyGradientModelFactory(backbone=backbone)
+def create(backbone: ModelFactory, compilation: str=None):
+    return QPolicyGradientModelFactory(backbone=backbone, compilation=compilation)
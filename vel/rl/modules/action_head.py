@@ -27,7 +27,8 @@ class DiagGaussianActionHead(nn.Module):
         self.log_std = nn.Parameter(torch.zeros(1, num_dimensions))
 
     def forward(self, input_data):
-        means = self.linear_layer(input_data)
+        # Distribution parameters are always calculated in single precision
+        means = self.linear_layer(input_data).float()
         log_std_tile = self.log_std.repeat(means.size(0), 1)
 
         return torch.stack([means, log_std_tile], dim=-1)
@@ -98,7 +99,8 @@ class CategoricalActionHead(nn.Module):
         self.linear_layer = nn.Linear(input_dim, num_actions)
 
     def forward(self, input_data):
-        return F.log_softmax(self.linear_layer(input_data), dim=1)
+        # Log-softmax is calculated in single precision, also when the network runs under reduced precision autocast
+        return F.log_softmax(self.linear_layer(input_data).float(), dim=1)
 
     def logprob(self, actions, action_logits):
         """ Logarithm of probability of given sample """
@@ -25,7 +25,7 @@ class DeterministicActionHead(nn.Module):
         self.linear_layer = nn.Linear(input_dim, action_space.shape[0])
 
     def forward(self, input_data):
-        return torch.tanh(self.linear_layer(input_data)) * self.max_action
+        return torch.tanh(self.linear_layer(input_data).float()) * self.max_action
 
     def sample(self, params, **_):
         """ Sample from a probability space of all actions """
@@ -44,7 +44,7 @@ class DeterministicCriticHead(nn.Module):
 
         final_output = self.output_layer(activated)
 
-        return final_output[:, 0]
+        return final_output[:, 0].float()
 
     def sample(self, params, **kwargs):
         """ Sample from a probability space of all actions """
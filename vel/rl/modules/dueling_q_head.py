@@ -25,8 +25,8 @@ class DuelingQHead(nn.Module):
                 init.constant_(m.bias, 0.0)
 
     def forward(self, advantage_data, value_data):
-        adv = self.linear_layer_advantage(advantage_data)
-        value = self.linear_layer_value(value_data)
+        adv = self.linear_layer_advantage(advantage_data).float()
+        value = self.linear_layer_value(value_data).float()
         # Advantage must be 0-centered
 
         return (adv - adv.mean(dim=1, keepdim=True)) + value
@@ -21,7 +21,7 @@ class QHead(nn.Module):
         init.constant_(self.linear_layer.bias, 0.0)
 
     def forward(self, input_data):
-        return self.linear_layer(input_data)
+        return self.linear_layer(input_data).float()
 
     def sample(self, q_values):
         """ Sample from epsilon-greedy strategy with given q-values """
@@ -15,4 +15,4 @@ class ValueHead(nn.Module):
         init.constant_(self.linear_layer.bias, 0.0)
 
     def forward(self, input_data):
-        return self.linear_layer(input_data)[:, 0]
+        return self.linear_layer(input_data)[:, 0].float()
@@ -0,0 +1,450 @@
+import attr
+import numpy as np
+import queue
+import sys
+import time
+import torch
+import torch.multiprocessing as mp
+import torch.nn.functional as F
+import tqdm
+
+from vel.api.base import Model, ModelFactory, Schedule
+from vel.api.info import EpochInfo, BatchInfo
+from vel.api.metrics import AveragingNamedMetric
+from vel.exceptions import VelException
+from vel.rl.api.base import ReinforcerBase, ReinforcerFactory, EnvFactory, AlgoBase
+from vel.rl.buffers.prioritized_multi_actor_backend import PrioritizedMultiActorBackend
+from vel.rl.metrics import (
+    FPSMetric, EpisodeLengthMetric, EpisodeRewardMetricQuantile,
+    EpisodeRewardMetric, FramesMetric
+)
+from vel.util.shared_weights import SharedWeights
+
+
+@attr.s(auto_attribs=True)
+class ApexReinforcerSettings:
+    """ Settings dataclass for the Ape-X reinforcer """
+    discount_factor: float
+    batch_size: int
+
+    buffer_capacity: int
+    buffer_initial_size: int
+    frame_stack: int
+
+    priority_exponent: float
+    priority_weight: Schedule
+    priority_epsilon: float
+
+    actors: int = 4
+    epsilon: float = 0.4
+    epsilon_alpha: float = 7.0
+    chunk_size: int = 50
+    batch_training_rounds: int = 1
+    weight_broadcast_frequency: int = 50
+    queue_size: int = 16
+
+    # Frames are in (channels, height, width) layout
+    channels_first: bool = False
+
+    def actor_epsilon(self, actor_idx):
+        """ Exploration rate of given actor - exponentially spaced between the actors as in the paper """
+        if self.actors == 1:
+            return self.epsilon
+
+        return self.epsilon ** (1.0 + self.epsilon_alpha * actor_idx / (self.actors - 1))
+
+
+def _put(chunk_queue, message, stop_event):
+    """ Put message into the queue unless the actor is asked to stop in the meantime """
+    while not stop_event.is_set():
+        try:
+            chunk_queue.put(message, timeout=1.0)
+            return
+        except queue.Full:
+            pass
+
+
+def actor_loop(actor_idx: int, env_factory: EnvFactory, seed: int, settings: ApexReinforcerSettings,
+               shared_weights: SharedWeights, chunk_queue, stop_event):
+    """
+    Body of the actor process - roll out the environment with epsilon-greedy policy and send chunks
+    of transitions with their initial priorities to the learner
+    """
+    # Actors share the cores between themselves
+    torch.set_num_threads(1)
+
+    environment = env_factory.instantiate(seed=seed, serial_id=actor_idx + 1)
+    epsilon = settings.actor_epsilon(actor_idx)
+    random_state = np.random.RandomState(seed)
+
+    model = shared_weights.local_copy()
+    model.eval()
+
+    local_version = shared_weights.refresh(model, None)
+
+    observation = environment.reset()
+
+    channel_axis = -observation.ndim if settings.channels_first else -1
+    channels = observation.shape[channel_axis]
+    older_channels = np.arange(channels, channels * settings.frame_stack)
+
+    # Frame stack is kept in the same way as the replay buffer reconstructs it - zeros before the episode start
+    history = np.concatenate([
+        np.zeros_like(observation).repeat(settings.frame_stack - 1, axis=channel_axis), observation
+    ], axis=channel_axis)
+
+    chunk = {'frames': [], 'actions': [], 'rewards': [], 'dones': [], 'q_selected': [], 'next_values': []}
+    episode_information = []
+
+    with torch.no_grad():
+        q_values = model(torch.from_numpy(history[None]))[0]
+
+        while not stop_event.is_set():
+            if random_state.rand() < epsilon:
+                action = random_state.randint(environment.action_space.n)
+            else:
+                action = q_values.argmax().item()
+
+            new_observation, reward, done, info = environment.step(action)
+
+            chunk['frames'].append(observation)
+            chunk['actions'].append(action)
+            chunk['rewards'].append(reward)
+            chunk['dones'].append(done)
+            chunk['q_selected'].append(q_values[action].item())
+
+            if done:
+                maybe_episode_info = info.get('episode')
+
+                if maybe_episode_info:
+                    episode_information.append(maybe_episode_info)
+
+                new_observation = environment.reset()
+                history[:] = 0
+
+            history = np.concatenate(
+                [history.take(older_channels, axis=channel_axis), new_observation], axis=channel_axis
+            )
+            observation = new_observation
+
+            q_values = model(torch.from_numpy(history[None]))[0]
+            chunk['next_values'].append(0.0 if done else q_values.max().item())
+
+            if len(chunk['frames']) == settings.chunk_size:
+                rewards = np.array(chunk['rewards'], dtype=np.float32)
+
+                # Initial priorities are the same function of the one-step TD errors as the one learner uses
+                expected_q = rewards + settings.discount_factor * np.array(chunk['next_values'], dtype=np.float32)
+                errors = F.smooth_l1_loss(
+                    torch.tensor(chunk['q_selected']), torch.from_numpy(expected_q), reduction='none'
+                ).numpy()
+
+                message = {
+                    'actor': actor_idx,
+                    'version': local_version,
+                    'frames': np.stack(chunk['frames']),
+                    'actions': np.array(chunk['actions'], dtype=environment.action_space.dtype),
+                    'rewards': rewards,
+                    'dones': np.array(chunk['dones'], dtype=bool),
+                    'priorities': (errors + settings.priority_epsilon) ** settings.priority_exponent,
+                    'episode_infos': episode_information
+                }
+
+                _put(chunk_queue, message, stop_event)
+
+                chunk = {name: [] for name in chunk}
+                episode_information = []
+
+                local_version = shared_weights.refresh(model, local_version)
+
+    environment.close()
+
+
+class ApexReinforcer(ReinforcerBase):
+    """
+    Distributed Prioritized Experience Replay (Ape-X) - https://arxiv.org/abs/1803.00933
+
+    Actor processes roll out their own environments using CPU copies of the Q network, each with a different
+    exploration rate. They compute initial priorities of the transitions from one-step TD errors of their own network
+    and send the transitions in chunks to the learner, which owns the prioritized replay buffer.
+    Learner trains the algo on prioritized samples, updates the priorities in the buffer and publishes its weights
+    to the actors every `weight_broadcast_frequency` updates.
+    """
+    def __init__(self, device: torch.device, settings: ApexReinforcerSettings, env_factory: EnvFactory,
+                 model_factory: ModelFactory, algo: AlgoBase, seed: int) -> None:
+        self.device = device
+        self.settings = settings
+        self.env_factory = env_factory
+        self.algo = algo
+        self.seed = seed
+
+        # Environments are rolled out in the actor processes, this one only describes the spaces
+        self.environment = env_factory.instantiate(seed=seed, serial_id=0)
+
+        self._trained_model = model_factory.instantiate(action_space=self.environment.action_space).to(self.device)
+
+        self.buffer = PrioritizedMultiActorBackend(
+            buffer_capacity=self.settings.buffer_capacity,
+            observation_space=self.environment.observation_space,
+            action_space=self.environment.action_space,
+            actors=self.settings.actors,
+            channels_first=self.settings.channels_first
+        )
+
+        # Actors inherit the shared objects from the learner
+        self.context = mp.get_context('fork')
+
+        # Weights published to the actors
+        self.shared_weights = SharedWeights(self.context, self._trained_model)
+
+        self.chunk_queue = None
+        self.stop_event = None
+        self.actors = []
+        self.updates = 0
+        self.policy_lag = 0.0
+
+    def metrics(self) -> list:
+        """ List of metrics to track for this learning process """
+        my_metrics = [
+            FramesMetric("frames"),
+            FPSMetric("fps"),
+            EpisodeRewardMetric('PMM:episode_rewards'),
+            EpisodeRewardMetricQuantile('P09:episode_rewards', quantile=0.9),
+            EpisodeRewardMetricQuantile('P01:episode_rewards', quantile=0.1),
+            EpisodeLengthMetric("episode_length"),
+            AveragingNamedMetric("policy_lag"),
+            AveragingNamedMetric("queue_wait_time"),
+        ]
+
+        return my_metrics + self.algo.metrics()
+
+    @property
+    def model(self) -> Model:
+        """ Model trained by this reinforcer """
+        return self._trained_model
+
+    def initialize_training(self, training_info):
+        """ Prepare models for training and start the actors """
+        self.model.reset_weights()
+
+        self.algo.initialize(
+            self.settings, model=self.model, environment=self.environment, device=self.device
+        )
+
+        self.broadcast_weights()
+        self.start_actors()
+
+    def finalize_training(self, training_info):
+        """ Stop the actor processes """
+        self.stop_actors()
+
+    def start_actors(self):
+        """ Start actor processes """
+        self.chunk_queue = self.context.Queue(maxsize=self.settings.queue_size)
+        self.stop_event = self.context.Event()
+
+        for actor_idx in range(self.settings.actors):
+            process = self.context.Process(
+                target=actor_loop,
+                args=(
+                    actor_idx, self.env_factory, self.seed + actor_idx + 1, self.settings,
+                    self.shared_weights, self.chunk_queue, self.stop_event
+                ),
+                daemon=True
+            )
+            process.start()
+            self.actors.append(process)
+
+    def stop_actors(self):
+        """ Ask the actors to finish and wait for them """
+        self.stop_event.set()
+
+        deadline = time.perf_counter() + 10.0
+
+        while any(process.is_alive() for process in self.actors) and time.perf_counter() < deadline:
+            # Actors cannot exit before everything they have put into the queue is consumed
+            try:
+                self.chunk_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+        for process in self.actors:
+            if process.is_alive():
+                process.terminate()
+
+            process.join()
+
+        self.actors = []
+
+    def broadcast_weights(self):
+        """ Publish current weights of the trained model to the actors """
+        self.shared_weights.publish(self.model, self.updates)
+
+    def train_epoch(self, epoch_info: EpochInfo) -> None:
+        """ Train model on an epoch of a fixed number of batch updates """
+        epoch_info.on_epoch_begin()
+
+        for batch_idx in tqdm.trange(epoch_info.batches_per_epoch, file=sys.stdout, desc="Training", unit="batch"):
+            batch_info = BatchInfo(epoch_info, batch_idx)
+
+            batch_info.on_batch_begin()
+            self.train_batch(batch_info)
+            batch_info.on_batch_end()
+
+        epoch_info.result_accumulator.freeze_results()
+        epoch_info.on_epoch_end()
+
+    def train_batch(self, batch_info: BatchInfo) -> None:
+        """
+        Batch - the most atomic unit of learning.
+
+        For this reinforcer, that involves:
+
+        1. Store chunks of experience sent by the actors in the replay buffer
+        2. Sample the buffer, train the algo on sample batches and update their priorities
+        3. Possibly publish the new weights to the actors
+        """
+        start = time.perf_counter()
+        chunks = self._receive_chunks()
+        batch_info['queue_wait_time'] = time.perf_counter() - start
+
+        if chunks:
+            self.policy_lag = float(np.mean([self.updates - chunk['version'] for chunk in chunks]))
+
+        batch_info['policy_lag'] = self.policy_lag
+        batch_info['frames'] = sum(chunk['rewards'].shape[0] for chunk in chunks)
+        batch_info['episode_infos'] = [info for chunk in chunks for info in chunk['episode_infos']]
+
+        self.model.train()
+
+        # Algo will aggregate data into this list:
+        batch_info['sub_batch_data'] = []
+
+        for i in range(self.settings.batch_training_rounds):
+            batch_sample = self._sample(batch_info)
+
+            batch_result = self.algo.optimizer_step(
+                batch_info=batch_info,
+                device=self.device,
+                model=self.model,
+                rollout=batch_sample
+            )
+
+            self._update_priorities(batch_sample, batch_result)
+
+            self.updates += 1
+
+            if self.updates % self.settings.weight_broadcast_frequency == 0:
+                self.broadcast_weights()
+
+            batch_info['sub_batch_data'].append(batch_result)
+
+        batch_info.aggregate_key('sub_batch_data')
+
+    def _receive_chunks(self) -> list:
+        """ Store chunks that have arrived from the actors, waiting for them while the buffer is not ready yet """
+        chunks = []
+
+        # Upper bound, so that fast actors cannot keep the learner busy with receiving
+        while len(chunks) < self.settings.queue_size:
+            waiting = self.buffer.current_size < self.settings.buffer_initial_size
+
+            try:
+                chunk = self.chunk_queue.get(block=waiting, timeout=1.0 if waiting else None)
+            except queue.Empty:
+                if not waiting:
+                    break
+                elif not all(process.is_alive() for process in self.actors):
+                    raise VelException("Ape-X actor process has died")
+                else:
+                    continue
+
+            self.buffer.store_transitions(
+                chunk['actor'], chunk['frames'], chunk['actions'], chunk['rewards'], chunk['dones'],
+                chunk['priorities']
+            )
+
+            chunks.append(chunk)
+
+        return chunks
+
+    def _sample(self, batch_info) -> dict:
+        """ Sample experience from replay buffer and return a batch """
+        probs, indexes, tree_idxs = self.buffer.sample_batch_prioritized(
+            self.settings.batch_size, self.settings.frame_stack
+        )
+
+        batch = self.buffer.get_batch(indexes, self.settings.frame_stack)
+
+        # Normalize weights properly
+        priority_weight = self.settings.priority_weight.value(batch_info['progress'])
+
+        probs = probs / self.buffer.total()
+        capacity = self.buffer.current_size
+        weights = (capacity * probs) ** (-priority_weight)
+        weights = weights / weights.max()
+
+        return {
+            'size': self.settings.batch_size,
+            'observations': torch.from_numpy(batch['states']).to(self.device),
+            'observations+1': torch.from_numpy(batch['states+1']).to(self.device),
+            'dones': torch.from_numpy(batch['dones'].astype(np.float32)).to(self.device),
+            'rewards': torch.from_numpy(batch['rewards'].astype(np.float32)).to(self.device),
+            'actions': torch.from_numpy(batch['actions']).to(self.device),
+            'weights': torch.from_numpy(weights.astype(np.float32)).to(self.device),
+            'tree_idxs': tree_idxs
+        }
+
+    def _update_priorities(self, sample, batch_result):
+        """ Update priorities of the sampled transitions with their new TD errors """
+        priorities = (batch_result['errors'] + self.settings.priority_epsilon) ** self.settings.priority_exponent
+
+        for tree_idx, priority in zip(sample['tree_idxs'], priorities):
+            self.buffer.update_priority(tree_idx, priority)
+
+
+class ApexReinforcerFactory(ReinforcerFactory):
+    """ Factory class for the Ape-X reinforcer """
+    def __init__(self, settings, env_factory: EnvFactory, model_factory: ModelFactory, algo: AlgoBase, seed: int):
+        self.settings = settings
+
+        self.env_factory = env_factory
+        self.model_factory = model_factory
+        self.algo = algo
+        self.seed = seed
+
+    def instantiate(self, device: torch.device) -> ReinforcerBase:
+        return ApexReinforcer(device, self.settings, self.env_factory, self.model_factory, self.algo, self.seed)
+
+
+def create(model_config, env, model, algo, batch_size: int, discount_factor: float, buffer_capacity: int,
+           buffer_initial_size: int, frame_stack: int, priority_exponent: float, priority_weight: Schedule,
+           priority_epsilon: float, actors=4, epsilon=0.4, epsilon_alpha=7.0, chunk_size=50, batch_training_rounds=1,
+           weight_broadcast_frequency=50, queue_size=16, channels_first=False):
+    """ Create an Ape-X reinforcer - factory """
+    settings = ApexReinforcerSettings(
+        discount_factor=discount_factor,
+        batch_size=batch_size,
+        buffer_capacity=buffer_capacity,
+        buffer_initial_size=buffer_initial_size,
+        frame_stack=frame_stack,
+        priority_exponent=priority_exponent,
+        priority_weight=priority_weight,
+        priority_epsilon=priority_epsilon,
+        actors=actors,
+        epsilon=epsilon,
+        epsilon_alpha=epsilon_alpha,
+        chunk_size=chunk_size,
+        batch_training_rounds=batch_training_rounds,
+        weight_broadcast_frequency=weight_broadcast_frequency,
+        queue_size=queue_size,
+        channels_first=channels_first
+    )
+
+    return ApexReinforcerFactory(
+        settings=settings,
+        env_factory=env,
+        model_factory=model,
+        algo=algo,
+        seed=model_config.seed
+    )
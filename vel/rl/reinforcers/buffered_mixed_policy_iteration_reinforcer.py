@@ -8,10 +8,11 @@ from vel.api import EpochInfo, BatchInfo
 from vel.api.base import Model, ModelFactory
 from vel.openai.baselines.common.vec_env import VecEnv
 from vel.rl.api.base import ReinforcerBase, ReinforcerFactory, VecEnvFactory, ReplayEnvRollerBase, AlgoBase
+from vel.rl.env.wrappers.env_normalize import environment_state_dict
 from vel.rl.api.base.env_roller import ReplayEnvRollerFactory
 from vel.rl.metrics import (
     FPSMetric, EpisodeLengthMetric, EpisodeRewardMetricQuantile,
-    EpisodeRewardMetric, FramesMetric
+    EpisodeRewardMetric, FramesMetric, environment_metrics
 )
 
 
@@ -49,7 +50,14 @@ class BufferedMixedPolicyIterationReinforcer(ReinforcerBase):
             EpisodeLengthMetric("episode_length")
         ]
 
-        return my_metrics + self.algo.metrics() + self.env_roller.metrics()
+        return (
+            my_metrics + self.algo.metrics() + self.env_roller.metrics() +
+            environment_metrics(self.env_roller.environment)
+        )
+
+    def state_dict(self) -> dict:
+        """ State of the learning process, other than model weights, to be stored in the checkpoint """
+        return {'environment': environment_state_dict(self.env_roller.environment)}
 
     @property
     def model(self) -> Model:
@@ -5,14 +5,20 @@ import tqdm
 
 import gym
 import torch
+import typing
 
 from vel.api import BatchInfo, EpochInfo
 from vel.api.base import Model, ModelFactory
 from vel.api.metrics import AveragingNamedMetric
-from vel.rl.api.base import ReinforcerBase, ReinforcerFactory, EnvFactory, ReplayEnvRollerBase, AlgoBase
+from vel.openai.baselines.common.vec_env import VecEnv
+from vel.rl.api.base import (
+    ReinforcerBase, ReinforcerFactory, EnvFactory, VecEnvFactory, ReplayEnvRollerBase, AlgoBase
+)
 from vel.rl.api.base.env_roller import ReplayEnvRollerFactory
+from vel.rl.env.wrappers.env_normalize import environment_state_dict
 from vel.rl.metrics import (
     FPSMetric, EpisodeLengthMetric, EpisodeRewardMetricQuantile, EpisodeRewardMetric, FramesMetric,
+    environment_metrics
 )
 
 
@@ -25,14 +31,23 @@ class BufferedSingleOffPolicyIterationReinforcerSettings:
     batch_size: int
     discount_factor: float
 
+    # Sample batches of all the training rounds at once
+    fused_sampling: bool = False
+
 
 class BufferedSingleOffPolicyIterationReinforcer(ReinforcerBase):
     """
     An off-policy reinforcer that rolls out **single** environment and stores transitions in a buffer.
     Afterwards, it samples batches experience from this buffer to train the policy.
+
+    Environment may also be a vector environment, if the env roller supports it.
+
+    With `fused_sampling`, batches for all the training rounds of a single batch are drawn, assembled and transferred
+    to the device together, and then used by consecutive optimizer steps.
     """
     def __init__(self, device: torch.device, settings: BufferedSingleOffPolicyIterationReinforcerSettings,
-                 environment: gym.Env, model: Model, algo: AlgoBase, env_roller: ReplayEnvRollerBase):
+                 environment: typing.Union[gym.Env, VecEnv], model: Model, algo: AlgoBase,
+                 env_roller: ReplayEnvRollerBase):
         self.device = device
         self.settings = settings
         self.environment = environment
@@ -56,7 +71,14 @@ class BufferedSingleOffPolicyIterationReinforcer(ReinforcerBase):
             AveragingNamedMetric("rollout_value_mean")
         ]
 
-        return my_metrics + self.algo.metrics() + self.env_roller.metrics()
+        return (
+            my_metrics + self.algo.metrics() + self.env_roller.metrics() +
+            environment_metrics(self.env_roller.environment)
+        )
+
+    def state_dict(self) -> dict:
+        """ State of the learning process, other than model weights, to be stored in the checkpoint """
+        return {'environment': environment_state_dict(self.env_roller.environment)}
 
     @property
     def model(self) -> Model:
@@ -104,25 +126,11 @@ class BufferedSingleOffPolicyIterationReinforcer(ReinforcerBase):
             if not self.env_roller.is_ready_for_sampling():
                 while not self.env_roller.is_ready_for_sampling():
                     rollout = self.env_roller.rollout(batch_info, self.model)
-                    maybe_episode_info = rollout['episode_information']
-
-                    if maybe_episode_info is not None:
-                        episode_information.append(maybe_episode_info)
-
-                    frames += 1
-                    rollout_actions.append(rollout['action'].detach().cpu().numpy())
-                    rollout_values.append(rollout['value'].detach().cpu().numpy())
+                    frames += self._record_rollout(rollout, episode_information, rollout_actions, rollout_values)
             else:
                 for i in range(self.settings.batch_rollout_rounds):
                     rollout = self.env_roller.rollout(batch_info, self.model)
-                    maybe_episode_info = rollout['episode_information']
-
-                    if maybe_episode_info is not None:
-                        episode_information.append(maybe_episode_info)
-
-                    frames += 1
-                    rollout_actions.append(rollout['action'].detach().cpu().numpy())
-                    rollout_values.append(rollout['value'].detach().cpu().numpy())
+                    frames += self._record_rollout(rollout, episode_information, rollout_actions, rollout_values)
 
         batch_info['rollout_action_mean'] = np.mean(rollout_actions)
         batch_info['rollout_action_std'] = np.std(rollout_actions)
@@ -137,9 +145,16 @@ class BufferedSingleOffPolicyIterationReinforcer(ReinforcerBase):
         # Algo will aggregate data into this list:
         batch_info['sub_batch_data'] = []
 
-        for i in range(self.settings.batch_training_rounds):
-            batch_sample = self.env_roller.sample(batch_info, self.model)
+        if self.settings.fused_sampling:
+            batch_samples = self.env_roller.sample_rounds(
+                batch_info, self.model, self.settings.batch_training_rounds
+            )
+        else:
+            batch_samples = (
+                self.env_roller.sample(batch_info, self.model) for _ in range(self.settings.batch_training_rounds)
+            )
 
+        for batch_sample in batch_samples:
             batch_result = self.algo.optimizer_step(
                 batch_info=batch_info,
                 device=self.device,
@@ -153,22 +168,45 @@ class BufferedSingleOffPolicyIterationReinforcer(ReinforcerBase):
 
         batch_info.aggregate_key('sub_batch_data')
 
+    @staticmethod
+    def _record_rollout(rollout, episode_information, rollout_actions, rollout_values) -> int:
+        """
+        Gather information from a single rollout, return number of frames it has taken.
+        Rollers of vector environments report all finished episodes and number of frames in a rollout.
+        """
+        if 'episode_infos' in rollout:
+            episode_information.extend(rollout['episode_infos'])
+        elif rollout['episode_information'] is not None:
+            episode_information.append(rollout['episode_information'])
+
+        rollout_actions.append(rollout['action'].detach().cpu().numpy())
+        rollout_values.append(rollout['value'].detach().cpu().numpy())
+
+        return rollout.get('frames', 1)
+
 
 class BufferedSingleOffPolicyIterationReinforcerFactory(ReinforcerFactory):
     """ Factory class for the DQN reinforcer """
 
     def __init__(self, settings, env_factory: EnvFactory, model_factory: ModelFactory,
-                 algo: AlgoBase, env_roller_factory: ReplayEnvRollerFactory, seed: int):
+                 algo: AlgoBase, env_roller_factory: ReplayEnvRollerFactory, seed: int,
+                 vec_env_factory: typing.Optional[VecEnvFactory] = None, parallel_envs: int = 1):
         self.settings = settings
 
         self.env_factory = env_factory
+        self.vec_env_factory = vec_env_factory
+        self.parallel_envs = parallel_envs
         self.model_factory = model_factory
         self.algo = algo
         self.env_roller_factory = env_roller_factory
         self.seed = seed
 
     def instantiate(self, device: torch.device) -> BufferedSingleOffPolicyIterationReinforcer:
-        env = self.env_factory.instantiate(seed=self.seed)
+        if self.vec_env_factory is not None:
+            env = self.vec_env_factory.instantiate(parallel_envs=self.parallel_envs, seed=self.seed)
+        else:
+            env = self.env_factory.instantiate(seed=self.seed)
+
         env_roller = self.env_roller_factory.instantiate(env, device, self.settings)
         model = self.model_factory.instantiate(action_space=env.action_space)
 
@@ -183,13 +221,14 @@ class BufferedSingleOffPolicyIterationReinforcerFactory(ReinforcerFactory):
 
 
 def create(model_config, env, model, algo, env_roller, batch_size: int, discount_factor: float,
-           batch_rollout_rounds=1, batch_training_rounds=1):
+           batch_rollout_rounds=1, batch_training_rounds=1, vec_env=None, parallel_envs=1, fused_sampling=False):
     """ Vel creation function for DqnReinforcerFactory """
     settings = BufferedSingleOffPolicyIterationReinforcerSettings(
         batch_rollout_rounds=batch_rollout_rounds,
         batch_training_rounds=batch_training_rounds,
         batch_size=batch_size,
-        discount_factor=discount_factor
+        discount_factor=discount_factor,
+        fused_sampling=fused_sampling
     )
 
     return BufferedSingleOffPolicyIterationReinforcerFactory(
@@ -198,5 +237,7 @@ def create(model_config, env, model, algo, env_roller, batch_size: int, discount
         model_factory=model,
         algo=algo,
         env_roller_factory=env_roller,
-        seed=model_config.seed
+        seed=model_config.seed,
+        vec_env_factory=vec_env,
+        parallel_envs=parallel_envs
     )
@@ -0,0 +1,406 @@
+import attr
+import gym
+import numpy as np
+import queue
+import sys
+import time
+import torch
+import torch.multiprocessing as mp
+import tqdm
+
+from vel.api.base import Model, ModelFactory
+from vel.api.info import EpochInfo, BatchInfo
+from vel.api.metrics import AveragingNamedMetric
+from vel.exceptions import VelException
+from vel.rl.api.base import ReinforcerBase, ReinforcerFactory, VecEnvFactory, AlgoBase
+from vel.rl.env_roller.inference_server import InferenceServer, InferenceClient
+from vel.rl.metrics import (
+    FPSMetric, EpisodeLengthMetric, EpisodeRewardMetricQuantile,
+    EpisodeRewardMetric, FramesMetric
+)
+from vel.util.shared_weights import SharedWeights
+
+
+@attr.s(auto_attribs=True)
+class ImpalaReinforcerSettings:
+    """ Settings dataclass for the IMPALA reinforcer """
+    discount_factor: float
+    number_of_steps: int
+    actors: int = 2
+    parallel_envs: int = 1
+    batch_size: int = 2
+    weight_broadcast_frequency: int = 1
+    queue_size: int = None
+    inference_batch_size: int = None
+    inference_timeout: float = 0.002
+
+
+def _action_dtype(action_space):
+    """ Torch type of the actions sampled from the policy """
+    if isinstance(action_space, gym.spaces.Discrete):
+        return torch.int64
+    else:
+        return torch.float32
+
+
+class TrajectoryPool:
+    """
+    Preallocated trajectory buffers in shared memory. Processes exchange only indices of the buffers,
+    the free ones travel from the learner to the actors and the filled ones back to the learner.
+    """
+
+    def __init__(self, context, size, number_of_steps, num_envs, observation_space, action_space):
+        self.size = size
+
+        observation_dtype = torch.from_numpy(np.zeros(0, dtype=observation_space.dtype)).dtype
+
+        def allocate(shape, dtype):
+            return torch.zeros(shape, dtype=dtype).share_memory_()
+
+        self.buffers = [
+            {
+                # One more observation to bootstrap the value of the last state from
+                'observations': allocate(
+                    (number_of_steps + 1, num_envs) + observation_space.shape, observation_dtype
+                ),
+                'actions': allocate((number_of_steps, num_envs) + action_space.shape, _action_dtype(action_space)),
+                'rewards': allocate((number_of_steps, num_envs), torch.float32),
+                'dones': allocate((number_of_steps, num_envs), torch.uint8),
+                'logprobs': allocate((number_of_steps, num_envs), torch.float32),
+            } for _ in range(size)
+        ]
+
+        self.free_queue = context.SimpleQueue()
+        self.full_queue = context.Queue()
+
+        for idx in range(size):
+            self.free_queue.put(idx)
+
+
+def actor_loop(env_factory: VecEnvFactory, parallel_envs: int, seed: int, shared_weights: SharedWeights,
+               pool: TrajectoryPool, number_of_steps: int, inference_client: InferenceClient = None):
+    """
+    Body of the actor process - roll out the environment with the most recent policy weights,
+    either evaluating a local copy of the policy or sending the observations to the inference server
+    """
+    # Actors share the cores between themselves
+    torch.set_num_threads(1)
+
+    environment = env_factory.instantiate(parallel_envs=parallel_envs, seed=seed)
+
+    if inference_client is None:
+        model = shared_weights.local_copy()
+        model.eval()
+        policy_step = model.step
+    else:
+        model = None
+        policy_step = inference_client.step
+
+    local_version = None
+    observation = torch.from_numpy(environment.reset())
+
+    while True:
+        slot_idx = pool.free_queue.get()
+
+        if slot_idx is None:
+            break
+
+        if model is not None:
+            local_version = shared_weights.refresh(model, local_version)
+
+        buffers = pool.buffers[slot_idx]
+        episode_information = []
+
+        with torch.no_grad():
+            buffers['observations'][0].copy_(observation)
+
+            for step_idx in range(number_of_steps):
+                step = policy_step(buffers['observations'][step_idx])
+
+                if model is None and step_idx == 0:
+                    # Weights of the server may change during the rollout, the oldest version counts
+                    local_version = inference_client.version
+
+                buffers['actions'][step_idx].copy_(step['actions'])
+                buffers['logprobs'][step_idx].copy_(step['logprob'])
+
+                new_obs, new_rewards, new_dones, new_infos = environment.step(step['actions'].numpy())
+
+                buffers['observations'][step_idx + 1].copy_(torch.from_numpy(new_obs))
+                buffers['rewards'][step_idx].copy_(torch.from_numpy(new_rewards))
+                buffers['dones'][step_idx].copy_(torch.from_numpy(new_dones.astype(np.uint8)))
+
+                for info in new_infos:
+                    maybe_episode_info = info.get('episode')
+
+                    if maybe_episode_info:
+                        episode_information.append(maybe_episode_info)
+
+            observation = buffers['observations'][-1].clone()
+
+        pool.full_queue.put((slot_idx, local_version, episode_information))
+
+    environment.close()
+
+
+class ImpalaReinforcer(ReinforcerBase):
+    """
+    Importance Weighted Actor-Learner Architecture - https://arxiv.org/abs/1802.01561
+
+    Actor processes roll out their own vector environments using CPU copies of the policy and pass trajectories
+    to the learner through shared memory. Learner trains on batches of trajectories using the off-policy correction
+    of the algo (V-trace) and publishes its weights to the actors every `weight_broadcast_frequency` updates.
+    Policy lag is the number of learner updates between the weights that generated a trajectory and the current ones.
+
+    When `inference_batch_size` is set, actors do not evaluate the policy themselves, but send their observations
+    to a single inference server process, which batches requests of all the actors together.
+
+    Actors are daemonic processes, which cannot start their own subprocesses, therefore their environments should be
+    created with `vel.rl.vecenv.dummy`.
+    """
+    def __init__(self, device: torch.device, settings: ImpalaReinforcerSettings, env_factory: VecEnvFactory,
+                 model_factory: ModelFactory, algo: AlgoBase, seed: int) -> None:
+        self.device = device
+        self.settings = settings
+        self.env_factory = env_factory
+        self.algo = algo
+        self.seed = seed
+
+        # Environments are rolled out in the actor processes, this one only describes the spaces
+        self.environment = env_factory.instantiate_single(seed=seed, preset='raw')
+
+        self._trained_model = model_factory.instantiate(action_space=self.environment.action_space).to(self.device)
+
+        # Actors inherit the shared objects from the learner
+        self.context = mp.get_context('fork')
+
+        # Weights published to the actors
+        self.shared_weights = SharedWeights(self.context, self._trained_model)
+
+        self.pool = None
+        self.inference_server = None
+        self.actors = []
+        self.updates = 0
+
+    def metrics(self) -> list:
+        """ List of metrics to track for this learning process """
+        my_metrics = [
+            FramesMetric("frames"),
+            FPSMetric("fps"),
+            EpisodeRewardMetric('PMM:episode_rewards'),
+            EpisodeRewardMetricQuantile('P09:episode_rewards', quantile=0.9),
+            EpisodeRewardMetricQuantile('P01:episode_rewards', quantile=0.1),
+            EpisodeLengthMetric("episode_length"),
+            AveragingNamedMetric("policy_lag"),
+            AveragingNamedMetric("queue_wait_time"),
+        ]
+
+        if self.settings.inference_batch_size is not None:
+            my_metrics += InferenceServer.metrics()
+
+        return my_metrics + self.algo.metrics()
+
+    @property
+    def model(self) -> Model:
+        """ Model trained by this reinforcer """
+        return self._trained_model
+
+    def initialize_training(self, training_info):
+        """ Prepare models for training and start the actors """
+        self.model.reset_weights()
+
+        self.algo.initialize(
+            self.settings, model=self.model, environment=self.environment, device=self.device
+        )
+
+        self.broadcast_weights()
+        self.start_actors()
+
+    def finalize_training(self, training_info):
+        """ Stop the actor processes """
+        self.stop_actors()
+
+    def start_actors(self):
+        """ Start actor processes """
+        pool_size = self.settings.queue_size or 2 * max(self.settings.actors, self.settings.batch_size)
+
+        self.pool = TrajectoryPool(
+            self.context, pool_size, self.settings.number_of_steps, self.settings.parallel_envs,
+            self.environment.observation_space, self.environment.action_space
+        )
+
+        if self.settings.inference_batch_size is not None:
+            self.inference_server = InferenceServer(
+                self.context, self.shared_weights, self.environment.observation_space,
+                clients=self.settings.actors, rows_per_client=self.settings.parallel_envs,
+                max_batch_size=self.settings.inference_batch_size, timeout=self.settings.inference_timeout
+            )
+            self.inference_server.start()
+
+        for actor_idx in range(self.settings.actors):
+            inference_client = None if self.inference_server is None else self.inference_server.clients[actor_idx]
+
+            process = self.context.Process(
+                target=actor_loop,
+                args=(
+                    self.env_factory, self.settings.parallel_envs,
+                    self.seed + actor_idx * self.settings.parallel_envs,
+                    self.shared_weights, self.pool, self.settings.number_of_steps, inference_client
+                ),
+                daemon=True
+            )
+            process.start()
+            self.actors.append(process)
+
+    def stop_actors(self):
+        """ Ask the actors to finish and wait for them """
+        for _ in self.actors:
+            self.pool.free_queue.put(None)
+
+        for process in self.actors:
+            process.join(timeout=10.0)
+
+            if process.is_alive():
+                process.terminate()
+
+        self.actors = []
+
+        if self.inference_server is not None:
+            self.inference_server.stop()
+            self.inference_server = None
+
+    def broadcast_weights(self):
+        """ Publish current weights of the trained model to the actors """
+        self.shared_weights.publish(self.model, self.updates)
+
+    def train_epoch(self, epoch_info: EpochInfo) -> None:
+        """ Train model on an epoch of a fixed number of batch updates """
+        epoch_info.on_epoch_begin()
+
+        for batch_idx in tqdm.trange(epoch_info.batches_per_epoch, file=sys.stdout, desc="Training", unit="batch"):
+            batch_info = BatchInfo(epoch_info, batch_idx)
+
+            batch_info.on_batch_begin()
+            self.train_batch(batch_info)
+            batch_info.on_batch_end()
+
+        epoch_info.result_accumulator.freeze_results()
+        epoch_info.on_epoch_end()
+
+    def train_batch(self, batch_info: BatchInfo) -> None:
+        """
+        Batch - the most atomic unit of learning.
+
+        For this reinforcer, that involves:
+
+        1. Gather a batch of trajectories from the actors
+        2. Use them to train the policy with off-policy correction
+        3. Possibly publish the new weights to the actors
+        """
+        start = time.perf_counter()
+        trajectories = [self._next_trajectory() for _ in range(self.settings.batch_size)]
+        batch_info['queue_wait_time'] = time.perf_counter() - start
+
+        slots = [slot_idx for slot_idx, _, _ in trajectories]
+
+        # Environments of all trajectories go side by side, this copies data out of the shared buffers
+        batch = {
+            name: torch.cat([self.pool.buffers[idx][name] for idx in slots], dim=1).to(self.device)
+            for name in self.pool.buffers[0]
+        }
+
+        for slot_idx in slots:
+            self.pool.free_queue.put(slot_idx)
+
+        self.model.eval()
+
+        with torch.no_grad():
+            final_values = self.model.value(batch['observations'][-1])
+
+        rollout_size = batch['rewards'].numel()
+        observations = batch['observations'][:-1]
+
+        rollout = {
+            'observations': observations.reshape((rollout_size,) + observations.shape[2:]),
+            'actions': batch['actions'].reshape((rollout_size,) + batch['actions'].shape[2:]),
+            'rewards': batch['rewards'].flatten(),
+            'dones': batch['dones'].flatten(),
+            'logprobs': batch['logprobs'].flatten(),
+            'final_values': final_values
+        }
+
+        self.model.train()
+
+        batch_result = self.algo.optimizer_step(
+            batch_info=batch_info,
+            device=self.device,
+            model=self.model,
+            rollout=rollout
+        )
+
+        self.updates += 1
+
+        if self.updates % self.settings.weight_broadcast_frequency == 0:
+            self.broadcast_weights()
+
+        batch_info['sub_batch_data'] = [batch_result]
+        batch_info['policy_lag'] = float(np.mean([self.updates - 1 - version for _, version, _ in trajectories]))
+        batch_info['frames'] = rollout_size
+        batch_info['episode_infos'] = [info for _, _, infos in trajectories for info in infos]
+
+        if self.inference_server is not None:
+            for name, value in self.inference_server.statistics().items():
+                batch_info[name] = value
+
+        batch_info.aggregate_key('sub_batch_data')
+
+    def _next_trajectory(self):
+        """ Wait for the next trajectory, making sure the actors are still there """
+        while True:
+            try:
+                return self.pool.full_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.actors):
+                    raise VelException("IMPALA actor process has died")
+
+                if self.inference_server is not None and not self.inference_server.is_alive():
+                    raise VelException("IMPALA inference server process has died")
+
+
+class ImpalaReinforcerFactory(ReinforcerFactory):
+    """ Factory class for the IMPALA reinforcer """
+    def __init__(self, settings, env_factory: VecEnvFactory, model_factory: ModelFactory, algo: AlgoBase, seed: int):
+        self.settings = settings
+
+        self.env_factory = env_factory
+        self.model_factory = model_factory
+        self.algo = algo
+        self.seed = seed
+
+    def instantiate(self, device: torch.device) -> ReinforcerBase:
+        return ImpalaReinforcer(device, self.settings, self.env_factory, self.model_factory, self.algo, self.seed)
+
+
+def create(model_config, model, vec_env, algo, number_of_steps, discount_factor, actors=2, parallel_envs=1,
+           batch_size=2, weight_broadcast_frequency=1, queue_size=None, inference_batch_size=None,
+           inference_timeout=0.002):
+    """ Create an IMPALA reinforcer - factory """
+    settings = ImpalaReinforcerSettings(
+        discount_factor=discount_factor,
+        number_of_steps=number_of_steps,
+        actors=actors,
+        parallel_envs=parallel_envs,
+        batch_size=batch_size,
+        weight_broadcast_frequency=weight_broadcast_frequency,
+        queue_size=queue_size,
+        inference_batch_size=inference_batch_size,
+        inference_timeout=inference_timeout
+    )
+
+    return ImpalaReinforcerFactory(
+        settings=settings,
+        env_factory=vec_env,
+        model_factory=model,
+        algo=algo,
+        seed=model_config.seed
+    )
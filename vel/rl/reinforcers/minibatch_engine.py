@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+import torch
+
+
+class MinibatchEngine:
+    """
+    Iteration over minibatches of a rollout for several epochs of training.
+
+    Once per epoch the whole rollout is gathered in a new random order into preallocated contiguous buffers,
+    and the minibatches are then returned as contiguous slices - views - of these buffers, without further copies.
+    Buffers are reused between rollouts of the same shape, therefore minibatches are valid only until the next epoch.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+        self.copy_bytes = 0
+        self.copy_seconds = 0.0
+
+    def _buffer(self, name: str, tensor: torch.Tensor) -> torch.Tensor:
+        """ Scratch buffer for given rollout tensor, allocated again only if the tensor layout changes """
+        buffer = self.buffers.get(name)
+
+        if buffer is None or buffer.shape != tensor.shape or buffer.dtype != tensor.dtype or \
+                buffer.device != tensor.device:
+            buffer = torch.empty_like(tensor, memory_format=torch.contiguous_format)
+            self.buffers[name] = buffer
+
+        return buffer
+
+    def _permute(self, tensors: dict, indices: np.ndarray) -> dict:
+        """ Gather all the rollout tensors in the order of given indices """
+        start = time.perf_counter()
+
+        permuted = {}
+        index_tensors = {}
+
+        for name, tensor in tensors.items():
+            if tensor.device not in index_tensors:
+                index_tensors[tensor.device] = torch.from_numpy(indices).to(tensor.device)
+
+            buffer = self._buffer(name, tensor)
+            torch.index_select(tensor, 0, index_tensors[tensor.device], out=buffer)
+
+            permuted[name] = buffer
+            self.copy_bytes += buffer.numel() * buffer.element_size()
+
+        self.copy_seconds += time.perf_counter() - start
+
+        return permuted
+
+    def minibatches(self, tensors: dict, size: int, batch_splits: int, epochs: int):
+        """
+        Generate dictionaries of minibatch tensors - `batch_splits` nearly equal parts of the rollout of given size -
+        for a number of epochs, each in a different random order.
+        """
+        indices = np.arange(size)
+
+        # Same boundaries as numpy.array_split
+        part_size, larger_parts = divmod(size, batch_splits)
+        part_sizes = [part_size + 1] * larger_parts + [part_size] * (batch_splits - larger_parts)
+        boundaries = np.cumsum([0] + part_sizes)
+
+        for _ in range(epochs):
+            np.random.shuffle(indices)
+            permuted = self._permute(tensors, indices)
+
+            for start, end in zip(boundaries[:-1], boundaries[1:]):
+                yield {name: tensor[start:end] for name, tensor in permuted.items()}
+
+    def reset(self) -> (int, float):
+        """ Return number of bytes copied and time spent copying since the last reset and start counting from zero """
+        copy_bytes, copy_seconds = self.copy_bytes, self.copy_seconds
+        self.copy_bytes, self.copy_seconds = 0, 0.0
+        return copy_bytes, copy_seconds
@@ -1,5 +1,4 @@
 import attr
-import numpy as np
 import sys
 import torch
 import tqdm
@@ -8,11 +7,14 @@ import vel.util.math as math_util
 
 from vel.api.base import Model, ModelFactory
 from vel.api.info import EpochInfo, BatchInfo
+from vel.api.metrics import AveragingNamedMetric
 from vel.rl.api.base import ReinforcerBase, ReinforcerFactory, VecEnvFactory, EnvRollerFactory, EnvRollerBase, AlgoBase
+from vel.rl.env.wrappers.env_normalize import environment_state_dict
 from vel.rl.metrics import (
     FPSMetric, EpisodeLengthMetric, EpisodeRewardMetricQuantile,
-    EpisodeRewardMetric, FramesMetric
+    EpisodeRewardMetric, FramesMetric, environment_metrics
 )
+from vel.rl.reinforcers.minibatch_engine import MinibatchEngine
 
 
 @attr.s(auto_attribs=True)
@@ -39,6 +41,8 @@ class OnPolicyIterationReinforcer(ReinforcerBase):
         self.env_roller = env_roller
         self.algo = algo
 
+        self.minibatch_engine = MinibatchEngine()
+
     def metrics(self) -> list:
         """ List of metrics to track for this learning process """
         my_metrics = [
@@ -48,9 +52,18 @@ class OnPolicyIterationReinforcer(ReinforcerBase):
             EpisodeRewardMetricQuantile('P09:episode_rewards', quantile=0.9),
             EpisodeRewardMetricQuantile('P01:episode_rewards', quantile=0.1),
             EpisodeLengthMetric("episode_length"),
+            AveragingNamedMetric("minibatch_copy_megabytes"),
+            AveragingNamedMetric("minibatch_copy_time"),
         ]
 
-        return my_metrics + self.algo.metrics() + self.env_roller.metrics()
+        return (
+            my_metrics + self.algo.metrics() + self.env_roller.metrics() +
+            environment_metrics(self.env_roller.environment)
+        )
+
+    def state_dict(self) -> dict:
+        """ State of the learning process, other than model weights, to be stored in the checkpoint """
+        return {'environment': environment_state_dict(self.env_roller.environment)}
 
     @property
     def model(self) -> Model:
@@ -93,7 +106,6 @@ class OnPolicyIterationReinforcer(ReinforcerBase):
         rollout = self.env_roller.rollout(batch_info, self.model)
 
         rollout_size = rollout['size']
-        indices = np.arange(rollout_size)
 
         # We may potentially need to split rollout into multiple batches
         batch_splits = math_util.divide_ceiling(rollout_size, self.settings.batch_size)
@@ -106,21 +118,24 @@ class OnPolicyIterationReinforcer(ReinforcerBase):
 
         rollout_tensors = {k: v for k, v in rollout.items() if isinstance(v, torch.Tensor)}
 
-        for i in range(self.settings.experience_replay):
-            # Repeat the experience N times
-            np.random.shuffle(indices)
+        # Repeat the experience N times, each time in a different order
+        minibatches = self.minibatch_engine.minibatches(
+            rollout_tensors, rollout_size, batch_splits, self.settings.experience_replay
+        )
 
-            for sub_indices in np.array_split(indices, batch_splits):
-                batch_rollout = {k: v[sub_indices] for k, v in rollout_tensors.items()}
+        for batch_rollout in minibatches:
+            batch_result = self.algo.optimizer_step(
+                batch_info=batch_info,
+                device=self.device,
+                model=self.model,
+                rollout=batch_rollout
+            )
 
-                batch_result = self.algo.optimizer_step(
-                    batch_info=batch_info,
-                    device=self.device,
-                    model=self.model,
-                    rollout=batch_rollout
-                )
+            batch_info['sub_batch_data'].append(batch_result)
 
-                batch_info['sub_batch_data'].append(batch_result)
+        copy_bytes, copy_seconds = self.minibatch_engine.reset()
+        batch_info['minibatch_copy_megabytes'] = copy_bytes / 2 ** 20
+        batch_info['minibatch_copy_time'] = copy_seconds
 
         batch_info['frames'] = rollout_size
         batch_info['episode_infos'] = rollout['episode_information']
@@ -0,0 +1,39 @@
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+import torch
+
+from vel.rl.reinforcers.minibatch_engine import MinibatchEngine
+
+
+def test_minibatches_follow_shuffled_splits():
+    """ Minibatches are contiguous and equal to fancy indexing with shuffled and split indices """
+    tensors = {
+        'observations': torch.arange(30, dtype=torch.float32).view(10, 3),
+        'actions': torch.arange(10),
+    }
+
+    engine = MinibatchEngine()
+
+    np.random.seed(0)
+    minibatches = list(engine.minibatches(tensors, size=10, batch_splits=3, epochs=2))
+
+    np.random.seed(0)
+    indices = np.arange(10)
+    expected = []
+
+    for _ in range(2):
+        np.random.shuffle(indices)
+        expected.extend({k: v[sub_indices] for k, v in tensors.items()} for sub_indices in np.array_split(indices, 3))
+
+    t.assert_equal(len(minibatches), len(expected))
+
+    # Minibatches of the last epoch are views of the scratch buffers
+    for minibatch, expected_minibatch in zip(minibatches[3:], expected[3:]):
+        for name, tensor in minibatch.items():
+            t.assert_true(tensor.is_contiguous())
+            nt.assert_array_equal(tensor.numpy(), expected_minibatch[name].numpy())
+
+    copy_bytes, _ = engine.reset()
+    t.assert_equal(copy_bytes, 2 * (30 * 4 + 10 * 8))
+    t.assert_equal(engine.reset()[0], 0)
@@ -0,0 +1,66 @@
+import collections
+
+import numpy as np
+
+
+class VecEnvStatistics:
+    """
+    Rolling window of latency and traffic samples recorded by an instrumented vector environment.
+
+    Step and reset latencies are kept separately for each worker, time spent by the parent process waiting in
+    `step_wait` and number of bytes transferred through the pipes are kept per step of the whole vector environment.
+    """
+
+    WORKER_KEYS = ('step_ms', 'reset_ms')
+    GLOBAL_KEYS = ('wait_ms', 'bytes')
+    KEYS = WORKER_KEYS + GLOBAL_KEYS
+
+    def __init__(self, num_envs, window=1000):
+        self.num_envs = num_envs
+        self.window = window
+
+        self.worker_samples = {
+            key: [collections.deque(maxlen=window) for _ in range(num_envs)] for key in self.WORKER_KEYS
+        }
+
+        self.global_samples = {
+            key: collections.deque(maxlen=window) for key in self.GLOBAL_KEYS
+        }
+
+    def record_step(self, worker_idx, seconds):
+        """ Record duration of a single env.step call in given worker """
+        self.worker_samples['step_ms'][worker_idx].append(seconds * 1000.0)
+
+    def record_reset(self, worker_idx, seconds):
+        """ Record duration of a single env.reset call in given worker """
+        self.worker_samples['reset_ms'][worker_idx].append(seconds * 1000.0)
+
+    def record_wait(self, seconds):
+        """ Record time the parent process spent waiting for the results of a step """
+        self.global_samples['wait_ms'].append(seconds * 1000.0)
+
+    def record_bytes(self, nbytes):
+        """ Record number of bytes transferred between processes during a step """
+        self.global_samples['bytes'].append(nbytes)
+
+    def samples(self, key) -> np.ndarray:
+        """ All samples currently in the window for given key """
+        if key in self.worker_samples:
+            return np.array([x for worker in self.worker_samples[key] for x in worker])
+        else:
+            return np.array(self.global_samples[key])
+
+    def quantile(self, key, quantile) -> float:
+        """ Quantile of the samples for given key, across all the workers """
+        data = self.samples(key)
+
+        if data.size == 0:
+            return 0.0
+        else:
+            return float(np.quantile(data, quantile))
+
+    def worker_quantile(self, key, quantile) -> np.ndarray:
+        """ Quantile of the samples for given key, separately for each worker """
+        return np.array([
+            np.quantile(worker, quantile) if worker else 0.0 for worker in self.worker_samples[key]
+        ])
@@ -1,29 +1,44 @@
 from vel.openai.baselines.common.vec_env import VecEnv
-from vel.openai.baselines.common.atari_wrappers import FrameStack
 from vel.openai.baselines.common.vec_env.subproc_vec_env import SubprocVecEnv
 from vel.openai.baselines.common.vec_env.vec_normalize import VecNormalize
 from vel.openai.baselines.common.vec_env.vec_frame_stack import VecFrameStack
+from vel.openai.baselines.common.vec_env.vec_monitor import VecMonitor
+from vel.openai.baselines import logger
 
 from vel.rl.api.base import VecEnvFactory
+from vel.rl.env.wrappers.env_normalize import EnvNormalize
+from vel.rl.env.wrappers.buffered_frame_stack import BufferedFrameStack
+from vel.rl.vecenv.statistics import VecEnvStatistics
 
 
 class SubprocVecEnvWrapper(VecEnvFactory):
     """ Wrapper for an environment to create sub-process vector environment """
 
-    def __init__(self, env, frame_history=None, normalize=False):
+    def __init__(self, env, frame_history=None, normalize=False, normalize_update_frequency=1, instrument=False,
+                 monitor=False, channels_first=False):
         self.env = env
         self.frame_history = frame_history
         self.normalize = normalize
+        self.normalize_update_frequency = normalize_update_frequency
+        self.instrument = instrument
+        self.monitor = monitor
+        self.channels_first = channels_first
 
     def instantiate(self, parallel_envs, seed=0, preset='default') -> VecEnv:
         """ Make parallel environments """
-        envs = SubprocVecEnv([self._creation_function(i, seed, preset) for i in range(parallel_envs)])
+        statistics = VecEnvStatistics(parallel_envs) if self.instrument else None
+        envs = SubprocVecEnv(
+            [self._creation_function(i, seed, preset) for i in range(parallel_envs)], statistics=statistics
+        )
+
+        if self.monitor:
+            envs = VecMonitor(envs, logger.get_dir())
 
         if self.normalize:
-            envs = VecNormalize(envs)
+            envs = VecNormalize(envs, update_frequency=self.normalize_update_frequency)
 
         if self.frame_history is not None:
-            envs = VecFrameStack(envs, self.frame_history)
+            envs = VecFrameStack(envs, self.frame_history, channels_first=self.channels_first)
 
         return envs
 
@@ -32,10 +47,10 @@ class SubprocVecEnvWrapper(VecEnvFactory):
         env = self.env.instantiate(seed=seed, serial_id=0, preset=preset)
 
         if self.normalize:
-            raise NotImplementedError
+            env = EnvNormalize(env, update_frequency=self.normalize_update_frequency)
 
         if self.frame_history is not None:
-            env = FrameStack(env, self.frame_history)
+            env = BufferedFrameStack(env, self.frame_history, channels_first=self.channels_first)
 
         return env
 
@@ -44,5 +59,10 @@ class SubprocVecEnvWrapper(VecEnvFactory):
         return lambda: self.env.instantiate(seed=seed, serial_id=idx, preset=preset)
 
 
-def create(env, frame_history, normalize=False):
-    return SubprocVecEnvWrapper(env, frame_history=frame_history, normalize=normalize)
+def create(env, frame_history=None, normalize=False, normalize_update_frequency=1, instrument=False,
+           monitor=False, channels_first=False):
+    return SubprocVecEnvWrapper(
+        env, frame_history=frame_history, normalize=normalize,
+        normalize_update_frequency=normalize_update_frequency, instrument=instrument, monitor=monitor,
+        channels_first=channels_first
+    )
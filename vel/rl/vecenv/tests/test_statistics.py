@@ -0,0 +1,85 @@
+import time
+
+import gym
+import nose.tools as t
+import numpy as np
+import numpy.testing as nt
+
+from vel.openai.baselines.common.vec_env.dummy_vec_env import DummyVecEnv
+from vel.rl.metrics import environment_metrics
+from vel.rl.vecenv.statistics import VecEnvStatistics
+
+
+class SleepingEnv(gym.Env):
+    """ Environment sleeping for given time in every step, done every third step """
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(2,), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(2)
+
+    def __init__(self, sleep):
+        self.sleep = sleep
+        self.counter = 0
+
+    def reset(self):
+        self.counter = 0
+        return np.zeros(2, dtype=np.uint8)
+
+    def step(self, action):
+        time.sleep(self.sleep)
+        self.counter += 1
+        return np.full(2, self.counter, dtype=np.uint8), 1.0, self.counter == 3, {}
+
+
+def test_statistics_window_and_quantiles():
+    """ Samples are kept in a rolling window, pooled and per worker """
+    statistics = VecEnvStatistics(num_envs=2, window=3)
+
+    for seconds in [0.010, 0.001, 0.002, 0.003]:
+        statistics.record_step(0, seconds)
+
+    statistics.record_step(1, 0.100)
+    statistics.record_bytes(10)
+    statistics.record_bytes(30)
+
+    nt.assert_allclose(np.sort(statistics.samples('step_ms')), [1.0, 2.0, 3.0, 100.0])
+    nt.assert_allclose(statistics.quantile('step_ms', 1.0), 100.0)
+    nt.assert_allclose(statistics.quantile('bytes', 0.5), 20.0)
+    nt.assert_allclose(statistics.worker_quantile('step_ms', 0.5), [2.0, 100.0])
+
+    # Missing samples are reported as zero
+    t.assert_equal(statistics.quantile('wait_ms', 0.5), 0.0)
+    nt.assert_allclose(statistics.worker_quantile('reset_ms', 0.5), [0.0, 0.0])
+
+
+def test_dummy_vec_env_records_latencies():
+    """ Instrumented environment records steps, resets and waits and exposes the slowest worker """
+    statistics = VecEnvStatistics(num_envs=2)
+    env = DummyVecEnv([lambda: SleepingEnv(0.0), lambda: SleepingEnv(0.005)], statistics=statistics)
+
+    env.reset()
+
+    for worker in statistics.worker_samples['reset_ms']:
+        t.assert_equal(len(worker), 1)
+
+    for _ in range(4):
+        env.step(np.zeros(2, dtype=np.int64))
+
+    # Each worker stepped 4 times and was reset again after the third step
+    for key, count in [('step_ms', 4), ('reset_ms', 2)]:
+        for worker in statistics.worker_samples[key]:
+            t.assert_equal(len(worker), count)
+
+    t.assert_equal(len(statistics.global_samples['wait_ms']), 4)
+
+    metrics = {metric.name: metric.value() for metric in environment_metrics(env)}
+
+    t.assert_greater_equal(metrics['env:step_ms_worst_p50'], 5.0)
+    t.assert_less(metrics['env:step_ms_p50'], metrics['env:step_ms_worst_p50'])
+
+
+def test_uninstrumented_dummy_vec_env():
+    """ Without statistics there are no environment metrics """
+    env = DummyVecEnv([lambda: SleepingEnv(0.0)])
+    env.reset()
+    env.step(np.zeros(1, dtype=np.int64))
+
+    t.assert_equal(environment_metrics(env), [])
@@ -0,0 +1,151 @@
+import atexit
+import csv
+import os.path as osp
+import shutil
+import tempfile
+import time
+
+import gym
+import nose.tools as t
+import numpy as np
+
+from vel.openai.baselines.common.vec_env import VecEnv
+from vel.openai.baselines.common.vec_env.vec_monitor import VecMonitor
+
+
+class RecordingInfos(list):
+    """ List of infos remembering which of them were looked at """
+    def __init__(self, items):
+        super().__init__(items)
+        self.accessed = set()
+
+    def __getitem__(self, idx):
+        self.accessed.add(idx)
+        return super().__getitem__(idx)
+
+
+class ScriptedVecEnv(VecEnv):
+    """ Vector environment where env 0 finishes an episode on every step, and other envs never do """
+    def __init__(self, num_envs=3):
+        super().__init__(num_envs, gym.spaces.Box(0, 1, shape=(1,), dtype=np.float32), gym.spaces.Discrete(2))
+        self.steps = 0
+        self.last_infos = None
+
+    def reset(self):
+        return np.zeros((self.num_envs, 1), dtype=np.float32)
+
+    def step_async(self, actions):
+        pass
+
+    def step_wait(self):
+        self.steps += 1
+
+        dones = np.zeros(self.num_envs, dtype=bool)
+        dones[0] = True
+
+        # Not done environments carry episode information as well, that should not be looked at
+        self.last_infos = RecordingInfos([
+            {'episode': {'r': float(self.steps), 'l': self.steps, 't': 0.5}} for _ in range(self.num_envs)
+        ])
+
+        return self.reset(), np.zeros(self.num_envs, dtype=np.float32), dones, self.last_infos
+
+    def close(self):
+        pass
+
+
+class TestVecMonitor:
+    def setup_method(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        shutil.rmtree(self.directory)
+
+    def _records(self, expected=None):
+        """ Rows of the monitor file, waiting for the writer thread to write the expected number of them """
+        deadline = time.time() + 5.0
+
+        while True:
+            with open(osp.join(self.directory, 'monitor.csv'), 'rt') as f:
+                rows = list(csv.DictReader(f.readlines()[1:]))
+
+            if expected is None or len(rows) >= expected or time.time() > deadline:
+                return rows
+
+            time.sleep(0.01)
+
+    def _step(self, env, count):
+        for _ in range(count):
+            env.step(np.zeros(env.num_envs, dtype=np.int64))
+
+    def test_records_are_written_in_batches(self):
+        """ Records are handed over to the writer when a batch fills up, and the rest on close """
+        env = VecMonitor(ScriptedVecEnv(), self.directory, batch_size=2, flush_interval=1000.0)
+
+        self._step(env, 1)
+        t.assert_equal(env.count, 1)
+        t.assert_equal(self._records(), [])
+
+        self._step(env, 2)
+        t.assert_equal(env.count, 1)
+
+        rows = self._records(expected=2)
+        t.assert_equal([(float(r['r']), int(r['l']), int(r['env'])) for r in rows], [(1.0, 1, 0), (2.0, 2, 0)])
+
+        env.close()
+
+        t.assert_equal(len(self._records()), 3)
+        t.assert_equal(env.total_episodes, 3)
+
+    def test_records_are_written_after_flush_interval(self):
+        """ Pending records are flushed once the interval passes, even if the batch is not full """
+        env = VecMonitor(ScriptedVecEnv(), self.directory, batch_size=100, flush_interval=0.05)
+
+        self._step(env, 1)
+        t.assert_equal(env.count, 1)
+
+        time.sleep(0.1)
+        self._step(env, 1)
+        t.assert_equal(env.count, 0)
+
+        t.assert_equal(len(self._records(expected=2)), 2)
+
+        env.close()
+
+    def test_infos_pass_through_and_only_done_envs_are_scanned(self):
+        """ Infos are returned unchanged and only those of finished episodes are looked at """
+        venv = ScriptedVecEnv(num_envs=4)
+        env = VecMonitor(venv, self.directory, batch_size=100)
+
+        _, _, _, infos = env.step(np.zeros(4, dtype=np.int64))
+
+        t.assert_is(infos, venv.last_infos)
+        t.assert_equal(infos[1], {'episode': {'r': 1.0, 'l': 1, 't': 0.5}})
+        t.assert_equal(venv.last_infos.accessed, {0, 1})
+
+        venv.last_infos.accessed.clear()
+        env.step(np.zeros(4, dtype=np.int64))
+        t.assert_equal(venv.last_infos.accessed, {0})
+        t.assert_equal(env.total_episodes, 2)
+
+        env.close()
+
+    def test_close_unregisters_exit_handler(self):
+        """ Closed monitor is not kept alive by the exit handler """
+        env = VecMonitor(ScriptedVecEnv(), self.directory)
+
+        unregistered = []
+        original = atexit.unregister
+
+        def record(function):
+            unregistered.append(function)
+            original(function)
+
+        atexit.unregister = record
+
+        try:
+            env.close()
+        finally:
+            atexit.unregister = original
+
+        t.assert_equal(unregistered, [env._close_writer])
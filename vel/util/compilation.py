@@ -0,0 +1,147 @@
+"""
+Compiled execution of the hot methods of a model - TorchScript or torch.compile - with a fallback to eager
+execution whenever the compilation fails.
+"""
+import itertools
+import time
+import types
+import warnings
+
+import torch
+import torch.nn as nn
+
+from vel.exceptions import VelException
+
+
+COMPILATIONS = ('torchscript', 'torch_compile')
+
+# Methods called for every rollout step and training batch
+HOT_METHODS = ('forward', 'step', 'value')
+
+# Time spent in the warm-up calls of compiled methods, that is not yet accounted for
+_warmup_seconds = 0.0
+
+
+def pop_warmup_seconds() -> float:
+    """ Return time spent warming up the compiled methods since the last call and start counting from zero """
+    global _warmup_seconds
+    seconds, _warmup_seconds = _warmup_seconds, 0.0
+    return seconds
+
+
+def _is_compiling() -> bool:
+    """ If the code is being traced by torch.compile at the moment """
+    compiler = getattr(torch, 'compiler', None)
+    return compiler is not None and hasattr(compiler, 'is_compiling') and compiler.is_compiling()
+
+
+def _module_tensors(model: nn.Module) -> list:
+    """ Parameters and buffers of the model """
+    return list(itertools.chain(model.parameters(), model.buffers()))
+
+
+class CompiledMethod:
+    """
+    Compiled version of a model method, stored on the model instance in place of the original one.
+
+    First `warmup_calls` calls - the ones that compile the code - are timed, so that the compilation time may be
+    excluded from the training time. If a compiled call fails the method falls back to eager execution for good.
+    Inside of other compiled code and in deep copies of the model the method is executed eagerly.
+
+    Scripted module keeps its own references to the model parameters. When they are temporarily replaced, like in
+    `torch.func.functional_call` used for stacked evaluation, the scripted module would not see the replacement,
+    therefore in that case the method is executed eagerly as well.
+    """
+
+    def __init__(self, model: nn.Module, name: str, compiled, warmup_calls: int=2):
+        self.model = model
+        self.name = name
+        self.compiled = compiled
+        self.warmup_calls = warmup_calls
+        self.calls = 0
+
+        self.tensors = _module_tensors(model) if isinstance(compiled, nn.Module) else None
+
+    def eager(self, model: nn.Module):
+        """ Original method bound to given model """
+        return types.MethodType(getattr(type(model), self.name), model)
+
+    def __call__(self, *args, **kwargs):
+        if self.compiled is None or _is_compiling() or self._is_reparametrized():
+            return self.eager(self.model)(*args, **kwargs)
+
+        if self.calls >= self.warmup_calls:
+            return self._call_compiled(*args, **kwargs)
+
+        global _warmup_seconds
+
+        start = time.perf_counter()
+        result = self._call_compiled(*args, **kwargs)
+        _warmup_seconds += time.perf_counter() - start
+
+        self.calls += 1
+
+        return result
+
+    def _is_reparametrized(self) -> bool:
+        """ If parameters or buffers of the model are not the ones the scripted module was created with """
+        if self.tensors is None:
+            return False
+
+        current = _module_tensors(self.model)
+
+        return len(current) != len(self.tensors) or any(a is not b for a, b in zip(current, self.tensors))
+
+    def _call_compiled(self, *args, **kwargs):
+        """ Call the compiled method, falling back to the eager one if it fails """
+        if isinstance(self.compiled, nn.Module) and self.compiled.training != self.model.training:
+            # Scripted module keeps its own copy of train/eval flags
+            self.compiled.train(self.model.training)
+
+        try:
+            return self.compiled(*args, **kwargs)
+        except Exception as e:
+            warnings.warn("Compiled '{}' of {} failed, falling back to eager execution: {}".format(
+                self.name, type(self.model).__name__, e
+            ))
+            self.compiled = None
+            return self.eager(self.model)(*args, **kwargs)
+
+    def __deepcopy__(self, memo):
+        # Model being copied is already in the memo, copies execute eagerly
+        return self.eager(memo.get(id(self.model), self.model))
+
+
+def compile_model(model: nn.Module, compilation: str=None) -> nn.Module:
+    """
+    Replace hot methods of the model with their compiled versions, in place. Model parameters are not affected.
+
+    With 'torchscript' the whole model is scripted and the scripted forward is used, with 'torch_compile' the methods
+    `forward`, `step` and `value` that the model defines are compiled separately. Model is left eager if it cannot be
+    compiled.
+    """
+    if compilation is None:
+        return model
+
+    if compilation not in COMPILATIONS:
+        raise VelException("Unknown compilation '{}', available: {}".format(compilation, ', '.join(COMPILATIONS)))
+
+    if compilation == 'torchscript':
+        try:
+            compiled_methods = {'forward': torch.jit.script(model)}
+        except Exception as e:
+            warnings.warn("Cannot script {}, using eager execution: {}".format(type(model).__name__, e))
+            return model
+    else:
+        if not hasattr(torch, 'compile'):
+            warnings.warn("This version of pytorch does not support torch.compile, using eager execution")
+            return model
+
+        compiled_methods = {
+            name: torch.compile(getattr(model, name)) for name in HOT_METHODS if hasattr(type(model), name)
+        }
+
+    for name, compiled in compiled_methods.items():
+        setattr(model, name, CompiledMethod(model, name, compiled))
+
+    return model
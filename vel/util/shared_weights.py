@@ -0,0 +1,39 @@
+import copy
+
+import torch.nn as nn
+
+
+class SharedWeights:
+    """
+    Copy of the model weights in shared memory, published by the learner and picked up by processes forked from it.
+    Every publication is tagged with a version, so that the readers reload the weights only when they change.
+    """
+
+    def __init__(self, context, model: nn.Module):
+        self.model = copy.deepcopy(model).cpu()
+        self.model.share_memory()
+
+        self.version = context.Value('l', 0)
+        self.lock = context.Lock()
+
+    def publish(self, model: nn.Module, version: int) -> None:
+        """ Copy weights of the model into shared memory """
+        with self.lock:
+            for shared, current in zip(self.model.state_dict().values(), model.state_dict().values()):
+                shared.copy_(current)
+
+            self.version.value = version
+
+    def local_copy(self) -> nn.Module:
+        """ Process-local copy of the shared model """
+        with self.lock:
+            return copy.deepcopy(self.model)
+
+    def refresh(self, model: nn.Module, local_version) -> int:
+        """ Load the latest weights into the local model if they are newer than local_version, return their version """
+        if local_version != self.version.value:
+            with self.lock:
+                model.load_state_dict(self.model.state_dict())
+                local_version = self.version.value
+
+        return local_version
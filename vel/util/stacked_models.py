@@ -0,0 +1,111 @@
+"""
+Evaluation of several copies of the same network with different weights - like online and target networks -
+in a single vectorized call over their stacked parameters.
+"""
+import torch
+import torch.nn as nn
+
+from vel.exceptions import VelException
+
+try:
+    import torch.func as torch_func
+except ImportError:
+    # Older versions of pytorch do not support functional calls
+    torch_func = None
+
+
+def _stack(tensor_lists, trainable):
+    """ Stack corresponding tensors of the modules, cutting the gradient of the ones that are not trained """
+    return torch.stack([
+        tensor if is_trainable else tensor.detach() for tensor, is_trainable in zip(tensor_lists, trainable)
+    ])
+
+
+def _detach(output):
+    """ Detach output of a module call, which may be a tuple of tensors """
+    if isinstance(output, tuple):
+        return tuple(element.detach() for element in output)
+    else:
+        return output.detach()
+
+
+def _stack_outputs(outputs):
+    """ Stack outputs of separate module calls, which may be tuples of tensors """
+    if isinstance(outputs[0], tuple):
+        return tuple(torch.stack(elements) for elements in zip(*outputs))
+    else:
+        return torch.stack(outputs)
+
+
+# Layers behaving differently in train and eval mode
+MODE_DEPENDENT_LAYERS = (
+    nn.modules.batchnorm._BatchNorm, nn.modules.instancenorm._InstanceNorm, nn.modules.dropout._DropoutNd
+)
+
+
+def _check_modules(modules: list) -> None:
+    """
+    Vectorized call runs all the modules in the mode of the first one and cannot update their buffers, therefore
+    batch normalization is not supported and other mode dependent layers require all modules to be in the same mode
+    """
+    for module in modules:
+        for layer in module.modules():
+            if isinstance(layer, nn.modules.batchnorm._BatchNorm):
+                raise VelException("Stacked evaluation does not support batch normalization")
+
+    if any(module.training != modules[0].training for module in modules):
+        for module in modules:
+            for layer in module.modules():
+                if isinstance(layer, MODE_DEPENDENT_LAYERS):
+                    raise VelException(
+                        "Stacked evaluation of modules in different train/eval modes requires them to behave the same "
+                        "in both, {} does not".format(type(layer).__name__)
+                    )
+
+
+def stacked_forward(modules: list, inputs: torch.Tensor, shared_input: bool = False, trainable: list = None):
+    """
+    Evaluate modules of the same architecture with a single vectorized call.
+
+    Inputs are either a tensor given to all the modules (if `shared_input` is set) or module inputs stacked along
+    the first dimension. Outputs are stacked along the first dimension in the same order as the modules.
+    Only parameters of the modules marked as `trainable` (by default all of them) propagate gradients.
+
+    All the modules are evaluated in the train/eval mode of the first one, therefore modules in different modes
+    may not contain layers depending on the mode. Batch normalization is not supported at all.
+    """
+    if trainable is None:
+        trainable = [True] * len(modules)
+
+    if torch_func is None:
+        if shared_input:
+            outputs = [module(inputs) for module in modules]
+        else:
+            outputs = [module(module_inputs) for module, module_inputs in zip(modules, inputs)]
+
+        return _stack_outputs([
+            output if is_trainable else _detach(output) for output, is_trainable in zip(outputs, trainable)
+        ])
+
+    _check_modules(modules)
+
+    named_parameters = [dict(module.named_parameters()) for module in modules]
+    named_buffers = [dict(module.named_buffers()) for module in modules]
+
+    stacked_tensors = {
+        name: _stack([parameters[name] for parameters in named_parameters], trainable)
+        for name in named_parameters[0]
+    }
+
+    stacked_tensors.update({
+        name: _stack([buffers[name] for buffers in named_buffers], [False] * len(modules))
+        for name in named_buffers[0]
+    })
+
+    def evaluate(tensors, module_inputs):
+        return torch_func.functional_call(modules[0], tensors, (module_inputs,))
+
+    # Random layers, like dropout, draw independently for each module
+    return torch_func.vmap(
+        evaluate, in_dims=(0, None if shared_input else 0), randomness='different'
+    )(stacked_tensors, inputs)
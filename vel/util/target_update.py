@@ -0,0 +1,65 @@
+"""
+Updates of target (or average) networks from the weights of the online network.
+
+Both functions process parameters and buffers of the modules together, as flat lists of tensors,
+using multi-tensor kernels where pytorch provides them. Floating point buffers (like running statistics of batch
+normalization) are treated in the same way as the parameters, while the others (like batch counters) are copied.
+"""
+import itertools as it
+
+import torch
+import torch.nn as nn
+
+
+def _tensor_lists(target: nn.Module, source: nn.Module):
+    """ Matching lists of floating point and other tensors of the two modules """
+    floating_targets, floating_sources = [], []
+    other_targets, other_sources = [], []
+
+    target_tensors = it.chain(target.parameters(), target.buffers())
+    source_tensors = it.chain(source.parameters(), source.buffers())
+
+    for target_tensor, source_tensor in zip(target_tensors, source_tensors):
+        if target_tensor.is_floating_point():
+            floating_targets.append(target_tensor)
+            floating_sources.append(source_tensor)
+        else:
+            other_targets.append(target_tensor)
+            other_sources.append(source_tensor)
+
+    return floating_targets, floating_sources, other_targets, other_sources
+
+
+def _copy(targets, sources):
+    """ Copy values of a list of tensors into another one """
+    if not targets:
+        return
+
+    if hasattr(torch, '_foreach_copy_'):
+        torch._foreach_copy_(targets, sources)
+    else:
+        for target, source in zip(targets, sources):
+            target.copy_(source)
+
+
+def hard_update(target: nn.Module, source: nn.Module) -> None:
+    """ Copy weights of the source module into the target module """
+    floating_targets, floating_sources, other_targets, other_sources = _tensor_lists(target, source)
+
+    with torch.no_grad():
+        _copy(floating_targets + other_targets, floating_sources + other_sources)
+
+
+def polyak_update(target: nn.Module, source: nn.Module, tau: float) -> None:
+    """ Move the target module towards the source - target = (1 - tau) * target + tau * source """
+    floating_targets, floating_sources, other_targets, other_sources = _tensor_lists(target, source)
+
+    with torch.no_grad():
+        if floating_targets and hasattr(torch, '_foreach_mul_'):
+            torch._foreach_mul_(floating_targets, 1.0 - tau)
+            torch._foreach_add_(floating_targets, floating_sources, alpha=tau)
+        else:
+            for target_tensor, source_tensor in zip(floating_targets, floating_sources):
+                target_tensor.mul_(1.0 - tau).add_(source_tensor * tau)
+
+        _copy(other_targets, other_sources)
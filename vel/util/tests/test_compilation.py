@@ -0,0 +1,100 @@
+import copy
+import warnings
+
+import gym
+import nose.tools as t
+import numpy.testing as nt
+import torch
+
+import vel.util.compilation as compilation
+
+from vel.exceptions import VelException
+from vel.rl.models.backbone.mlp import MLP
+from vel.rl.models.policy_gradient_model import PolicyGradientModel
+from vel.rl.models.q_model import QModel
+from vel.util.compilation import CompiledMethod, compile_model
+from vel.util.stacked_models import stacked_forward
+
+
+def _model():
+    torch.manual_seed(0)
+
+    model = PolicyGradientModel(MLP(input_length=8, hidden_units=16), gym.spaces.Discrete(4))
+    model.reset_weights()
+    return model
+
+
+def test_scripted_model_matches_eager():
+    """ Scripted forward gives the same results, shares the parameters and is excluded from the state dict """
+    reference = _model()
+    model = compile_model(_model(), 'torchscript')
+    observations = torch.randn(5, 8)
+
+    t.assert_is_instance(model.forward, CompiledMethod)
+    t.assert_equal(list(model.state_dict().keys()), list(reference.state_dict().keys()))
+
+    compilation.pop_warmup_seconds()
+
+    for expected, result in zip(reference(observations), model(observations)):
+        nt.assert_allclose(result.detach().numpy(), expected.detach().numpy(), rtol=1e-5, atol=1e-6)
+
+    t.assert_greater(compilation.pop_warmup_seconds(), 0.0)
+
+    with torch.no_grad():
+        model.value_head.linear_layer.bias.add_(1.0)
+        reference.value_head.linear_layer.bias.add_(1.0)
+
+    nt.assert_allclose(model.value(observations).detach().numpy(), reference.value(observations).detach().numpy(),
+                       rtol=1e-5, atol=1e-6)
+
+    # Copies, for example quantized actors, execute eagerly
+    model_copy = copy.deepcopy(model)
+    t.assert_not_is_instance(model_copy.forward, CompiledMethod)
+    nt.assert_allclose(model_copy(observations)[1].detach().numpy(), reference(observations)[1].detach().numpy(),
+                       rtol=1e-5, atol=1e-6)
+
+
+def test_failing_compilation_falls_back_to_eager():
+    """ If the compiled method raises an error the model keeps working eagerly """
+    def failing(*args, **kwargs):
+        raise RuntimeError("Compilation failed")
+
+    reference = _model()
+    model = _model()
+    model.forward = CompiledMethod(model, 'forward', failing)
+
+    observations = torch.randn(5, 8)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        result = model(observations)
+
+    t.assert_equal(len(caught), 1)
+    t.assert_is_none(model.forward.compiled)
+    nt.assert_allclose(result[0].detach().numpy(), reference(observations)[0].detach().numpy())
+
+
+@t.raises(VelException)
+def test_unknown_compilation():
+    compile_model(_model(), 'jit')
+
+
+def test_scripted_models_in_stacked_evaluation():
+    """ Stacked evaluation of scripted models uses the weights of each of them, not the ones of the first model """
+    torch.manual_seed(0)
+
+    online = compile_model(QModel(MLP(input_length=8, hidden_units=16), gym.spaces.Discrete(4)), 'torchscript')
+    target = compile_model(QModel(MLP(input_length=8, hidden_units=16), gym.spaces.Discrete(4)), 'torchscript')
+    online.reset_weights()
+    target.reset_weights()
+    target.eval()
+
+    observations = torch.randn(5, 8)
+    stacked = stacked_forward([online, target], observations, shared_input=True, trainable=[True, False])
+
+    for idx, model in enumerate([online, target]):
+        nt.assert_allclose(stacked[idx].detach().numpy(), model(observations).detach().numpy(), rtol=1e-5, atol=1e-6)
+
+    # Models are still executed by the scripted module outside of the stacked evaluation
+    t.assert_is_not_none(online.forward.compiled)
+    t.assert_false(online.forward._is_reparametrized())
@@ -0,0 +1,76 @@
+import nose.tools as t
+import numpy.testing as nt
+import torch
+import torch.nn as nn
+
+from vel.exceptions import VelException
+from vel.util.stacked_models import stacked_forward
+
+
+class TwoHeads(nn.Module):
+    """ Small network with two outputs """
+
+    def __init__(self):
+        super().__init__()
+        self.body = nn.Sequential(nn.Conv2d(2, 3, kernel_size=2), nn.ReLU(), nn.Flatten(), nn.Linear(12, 5))
+        self.head = nn.Linear(5, 2)
+
+    def forward(self, x):
+        hidden = self.body(x)
+        return hidden, self.head(hidden)
+
+
+def test_stacked_forward_matches_separate_calls():
+    """ Outputs equal separate calls and only the trainable module receives gradients """
+    torch.manual_seed(0)
+
+    online, target = TwoHeads(), TwoHeads()
+    inputs = torch.randn(2, 4, 2, 3, 3)
+
+    hidden, heads = stacked_forward([online, target], inputs, trainable=[True, False])
+
+    for idx, module in enumerate([online, target]):
+        expected_hidden, expected_heads = module(inputs[idx])
+        nt.assert_allclose(hidden[idx].detach().numpy(), expected_hidden.detach().numpy(), rtol=1e-5, atol=1e-6)
+        nt.assert_allclose(heads[idx].detach().numpy(), expected_heads.detach().numpy(), rtol=1e-5, atol=1e-6)
+
+    (heads.sum() + hidden.sum()).backward()
+
+    online_reference = TwoHeads()
+    online_reference.load_state_dict(online.state_dict())
+    reference_hidden, reference_heads = online_reference(inputs[0])
+    (reference_heads.sum() + reference_hidden.sum()).backward()
+
+    for parameter, reference in zip(online.parameters(), online_reference.parameters()):
+        nt.assert_allclose(parameter.grad.numpy(), reference.grad.numpy(), rtol=1e-5, atol=1e-6)
+
+    t.assert_true(all(parameter.grad is None for parameter in target.parameters()))
+
+    _, shared_heads = stacked_forward([online, target], inputs[1], shared_input=True)
+    nt.assert_allclose(shared_heads[1].detach().numpy(), heads[1].detach().numpy(), rtol=1e-5, atol=1e-6)
+
+
+def test_stacked_forward_rejects_mode_dependent_layers():
+    """ Batch norm is never supported, dropout only if all the modules are in the same mode """
+    inputs = torch.randn(4, 3)
+
+    online, target = nn.Sequential(nn.Linear(3, 2), nn.Dropout(0.5)), nn.Sequential(nn.Linear(3, 2), nn.Dropout(0.5))
+    target.eval()
+
+    with t.assert_raises(VelException):
+        stacked_forward([online, target], inputs, shared_input=True)
+
+    target.train()
+    t.assert_equal(stacked_forward([online, target], inputs, shared_input=True).shape, (2, 4, 2))
+
+    with t.assert_raises(VelException):
+        stacked_forward([nn.BatchNorm1d(3), nn.BatchNorm1d(3)], inputs, shared_input=True)
+
+    # Layers that do not depend on the mode may be evaluated in different modes, like the DQN target network
+    online, target = nn.Linear(3, 2), nn.Linear(3, 2)
+    target.eval()
+
+    nt.assert_allclose(
+        stacked_forward([online, target], inputs, shared_input=True)[1].detach().numpy(),
+        target(inputs).detach().numpy(), rtol=1e-5, atol=1e-6
+    )
@@ -0,0 +1,46 @@
+import nose.tools as t
+import numpy.testing as nt
+import torch
+import torch.nn as nn
+
+from vel.util.target_update import hard_update, polyak_update
+
+
+def _model():
+    """ Small model with both floating point and integer buffers """
+    return nn.Sequential(nn.Linear(3, 4), nn.BatchNorm1d(4), nn.Linear(4, 2))
+
+
+def test_polyak_update_matches_per_tensor_loop():
+    """ Parameters and running statistics are averaged, batch counters copied """
+    torch.manual_seed(0)
+
+    source, target = _model(), _model()
+    source.train()
+    source(torch.randn(8, 3))
+
+    expected = {
+        name: (1.0 - 0.1) * value + 0.1 * source.state_dict()[name] if value.is_floating_point()
+        else source.state_dict()[name].clone()
+        for name, value in target.state_dict().items()
+    }
+
+    polyak_update(target, source, 0.1)
+
+    for name, value in target.state_dict().items():
+        nt.assert_allclose(value.numpy(), expected[name].numpy(), rtol=1e-6, atol=1e-7)
+
+    t.assert_equal(target.state_dict()['1.num_batches_tracked'].item(), 1)
+
+
+def test_hard_update_copies_everything():
+    """ After a hard update both models have identical state """
+    torch.manual_seed(0)
+
+    source, target = _model(), _model()
+    source(torch.randn(8, 3))
+
+    hard_update(target, source)
+
+    for name, value in source.state_dict().items():
+        nt.assert_array_equal(target.state_dict()[name].numpy(), value.numpy())